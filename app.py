@@ -30,7 +30,10 @@ from twitclone.utils import (
     make_clickable_links,
     resize_image,
 )
+from twitclone.counters import get_pending_report_count, get_user_counts
 from twitclone.scheduling import publish_due_tweets
+from twitclone.sidebar import get_sidebar_data
+from twitclone.trending import refresh_trending_hashtags
 
 
 Config.validate()
@@ -41,10 +44,20 @@ init_extensions(app)
 
 
 def post_scheduled_tweets():
-    return publish_due_tweets()
+    with app.app_context():
+        return publish_due_tweets()
+
+
+def refresh_trending():
+    with app.app_context():
+        return refresh_trending_hashtags()
 
 
 scheduler = BackgroundScheduler()
+if Config.SCHEDULER_ENABLED:
+    scheduler.add_job(post_scheduled_tweets, "interval", seconds=Config.SCHEDULER_INTERVAL_SECONDS, id="publish_due_tweets")
+    scheduler.add_job(refresh_trending, "interval", seconds=Config.TRENDING_REFRESH_SECONDS, id="refresh_trending_hashtags")
+    scheduler.start()
 
 
 @app.context_processor
@@ -53,17 +66,25 @@ def utility_processor():
     unread_message_count = 0
     pending_moderation_count = 0
     followed_hashtags = []
+    followed_user_ids = set()
+    sidebar = get_sidebar_data()
     if current_user.is_authenticated:
-        unread_notification_count = Notification.query.filter_by(user_id=current_user.id, read=False).count()
-        unread_message_count = DirectMessage.query.filter_by(receiver_id=current_user.id, read=False, deleted_by_receiver=False).count()
-        followed_hashtags = HashtagFollow.query.filter_by(user_id=current_user.id).order_by(HashtagFollow.hashtag.asc()).all()
+        counts = get_user_counts(current_user.id)
+        unread_notification_count = counts.unread_notifications
+        unread_message_count = counts.unread_messages
+        if counts.followed_hashtags:
+            followed_hashtags = HashtagFollow.query.filter_by(user_id=current_user.id).order_by(HashtagFollow.hashtag.asc()).all()
+        sidebar_user_ids = [user.id for user in sidebar.newest_users]
+        if sidebar_user_ids:
+            followed_user_ids = set(db.session.scalars(db.select(Follows.followed_id).where(Follows.follower_id == current_user.id, Follows.followed_id.in_(sidebar_user_ids))))
         if current_user.is_admin or current_user.is_super_admin:
-            pending_moderation_count = PostReport.query.filter_by(status='pending').count()
+            pending_moderation_count = get_pending_report_count()
 
     return {
         "gravatar": gravatar,
-        "trending_hashtags": get_trending_hashtags(),
-        "newest_users": get_newest_users(),
+        "trending_hashtags": sidebar.trending_hashtags,
+        "newest_users": sidebar.newest_users,
+        "followed_user_ids": followed_user_ids,
         "unread_notification_count": unread_notification_count,
         "unread_message_count": unread_message_count,
         "pending_moderation_count": pending_moderation_count,
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import os
+import tempfile
 from pathlib import Path
 
 
@@ -15,6 +16,10 @@ def _as_bool(value: str | None, *, default: bool = False) -> bool:
     return value.strip().lower() in {"1", "true", "yes", "on"}
 
 
+def _as_list(value: str) -> tuple[str, ...]:
+    return tuple(item.strip().lower() for item in value.split(",") if item.strip())
+
+
 def _database_uri() -> str:
     configured = os.getenv("DATABASE_URL")
     if configured:
@@ -40,9 +45,43 @@ class Config:
     MEDIA_S3_REGION = os.getenv("MEDIA_S3_REGION")
     MEDIA_S3_ENDPOINT_URL = os.getenv("MEDIA_S3_ENDPOINT_URL")
     MEDIA_S3_PREFIX = os.getenv("MEDIA_S3_PREFIX", "media").strip("/")
+    MEDIA_S3_DELIVERY = os.getenv("MEDIA_S3_DELIVERY", "proxy").strip().lower()
+    MEDIA_S3_URL_EXPIRES_SECONDS = int(os.getenv("MEDIA_S3_URL_EXPIRES_SECONDS", "900"))
+    MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_BYTES", "0" if ENVIRONMENT == "testing" else str(256 * 1024 * 1024)))
+    MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR") or str(Path(tempfile.gettempdir()) / "twitclone-media-cache")
+    IMAGE_PIPELINE_WORKERS = int(os.getenv("IMAGE_PIPELINE_WORKERS", "0" if ENVIRONMENT == "testing" else "2"))
+    IMAGE_PIPELINE_MAX_PENDING = int(os.getenv("IMAGE_PIPELINE_MAX_PENDING", "8"))
+    IMAGE_PIPELINE_TIMEOUT_SECONDS = int(os.getenv("IMAGE_PIPELINE_TIMEOUT_SECONDS", "30"))
+    IMAGE_THUMBNAIL_ASYNC = _as_bool(os.getenv("IMAGE_THUMBNAIL_ASYNC"), default=False)
+    IMAGE_RENDITION_WIDTHS = tuple(int(width) for width in _as_list(os.getenv("IMAGE_RENDITION_WIDTHS", "320,640,1080")))
+    IMAGE_RENDITION_FORMATS = _as_list(os.getenv("IMAGE_RENDITION_FORMATS", "avif,webp"))
     SCHEDULER_ENABLED = _as_bool(os.getenv("SCHEDULER_ENABLED"), default=True)
     SCHEDULER_INTERVAL_SECONDS = int(os.getenv("SCHEDULER_INTERVAL_SECONDS", "60"))
     TESTING = ENVIRONMENT == "testing"
+    TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "6"))
+    TRENDING_WINDOW_HOURS = int(os.getenv("TRENDING_WINDOW_HOURS", "48"))
+    TRENDING_SIZE = int(os.getenv("TRENDING_SIZE", "10"))
+    TRENDING_REFRESH_SECONDS = int(os.getenv("TRENDING_REFRESH_SECONDS", "300"))
+    SIDEBAR_CACHE_TTL_SECONDS = int(os.getenv("SIDEBAR_CACHE_TTL_SECONDS", "0" if ENVIRONMENT == "testing" else "60"))
+    NOTIFICATION_COALESCE_MINUTES = int(os.getenv("NOTIFICATION_COALESCE_MINUTES", "60"))
+    NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "90"))
+    NOTIFICATION_RETENTION_MODE = os.getenv("NOTIFICATION_RETENTION_MODE", "delete").strip().lower()
+    NOTIFICATION_RETENTION_INTERVAL_SECONDS = int(os.getenv("NOTIFICATION_RETENTION_INTERVAL_SECONDS", "3600"))
+    USERNAME_INDEX_MAX_ENTRIES = int(os.getenv("USERNAME_INDEX_MAX_ENTRIES", "0" if ENVIRONMENT == "testing" else "1000000"))
+    HOME_TIMELINE_FANOUT_MAX_FOLLOWERS = int(os.getenv("HOME_TIMELINE_FANOUT_MAX_FOLLOWERS", "10000"))
+    HOME_TIMELINE_BACKFILL_LIMIT = int(os.getenv("HOME_TIMELINE_BACKFILL_LIMIT", "50"))
+    TIMELINE_CACHE_BACKEND = os.getenv("TIMELINE_CACHE_BACKEND", "none" if ENVIRONMENT == "testing" else "memory").strip().lower()
+    TIMELINE_CACHE_TTL_SECONDS = int(os.getenv("TIMELINE_CACHE_TTL_SECONDS", "15"))
+    TIMELINE_CACHE_MAX_ENTRIES = int(os.getenv("TIMELINE_CACHE_MAX_ENTRIES", "2000"))
+    TIMELINE_CACHE_DIR = os.getenv("TIMELINE_CACHE_DIR") or str(Path(tempfile.gettempdir()) / "twitclone-timeline-cache")
+    REALTIME_BROKER = os.getenv("REALTIME_BROKER", "memory").strip()
+    REALTIME_MAX_CONNECTIONS = int(os.getenv("REALTIME_MAX_CONNECTIONS", "1"))
+    REALTIME_STREAM_SECONDS = int(os.getenv("REALTIME_STREAM_SECONDS", "120"))
+    REALTIME_HEARTBEAT_SECONDS = int(os.getenv("REALTIME_HEARTBEAT_SECONDS", "15"))
+    REALTIME_MAX_PENDING_EVENTS = int(os.getenv("REALTIME_MAX_PENDING_EVENTS", "100"))
+    HOME_TIMELINE_FANOUT_MODE = os.getenv("HOME_TIMELINE_FANOUT_MODE", "hybrid").strip().lower()
+    HOME_TIMELINE_RECENT_POSTS_PER_AUTHOR = int(os.getenv("HOME_TIMELINE_RECENT_POSTS_PER_AUTHOR", "100"))
+    HOME_TIMELINE_RECENT_POSTS_TTL_SECONDS = int(os.getenv("HOME_TIMELINE_RECENT_POSTS_TTL_SECONDS", "0" if ENVIRONMENT == "testing" else "30"))
 
     PASSWORD_RESET_MAX_AGE_SECONDS = int(os.getenv("PASSWORD_RESET_MAX_AGE_SECONDS", "3600"))
     MAIL_SERVER = os.getenv("MAIL_SERVER", "localhost")
@@ -66,6 +105,40 @@ class Config:
             raise RuntimeError("SECRET_KEY is required for every TwitClone environment. Set it outside source control before starting the application.")
         if cls.SCHEDULER_INTERVAL_SECONDS < 1:
             raise RuntimeError("SCHEDULER_INTERVAL_SECONDS must be at least 1")
+        if cls.TRENDING_HALF_LIFE_HOURS <= 0:
+            raise RuntimeError("TRENDING_HALF_LIFE_HOURS must be greater than zero")
+        if min(cls.TRENDING_WINDOW_HOURS, cls.TRENDING_SIZE, cls.TRENDING_REFRESH_SECONDS) < 1:
+            raise RuntimeError("TRENDING_WINDOW_HOURS, TRENDING_SIZE, and TRENDING_REFRESH_SECONDS must be at least 1")
+        if cls.SIDEBAR_CACHE_TTL_SECONDS < 0:
+            raise RuntimeError("SIDEBAR_CACHE_TTL_SECONDS must be zero or greater")
+        if cls.NOTIFICATION_COALESCE_MINUTES < 0:
+            raise RuntimeError("NOTIFICATION_COALESCE_MINUTES must be zero or greater")
+        if cls.NOTIFICATION_RETENTION_DAYS < 0:
+            raise RuntimeError("NOTIFICATION_RETENTION_DAYS must be zero or greater")
+        if cls.NOTIFICATION_RETENTION_MODE not in {"delete", "archive"}:
+            raise RuntimeError("NOTIFICATION_RETENTION_MODE must be delete or archive")
+        if cls.NOTIFICATION_RETENTION_INTERVAL_SECONDS < 1:
+            raise RuntimeError("NOTIFICATION_RETENTION_INTERVAL_SECONDS must be at least 1")
+        if cls.USERNAME_INDEX_MAX_ENTRIES < 0:
+            raise RuntimeError("USERNAME_INDEX_MAX_ENTRIES must be zero or greater")
+        if cls.TIMELINE_CACHE_BACKEND not in {"none", "memory", "filesystem"}:
+            raise RuntimeError("TIMELINE_CACHE_BACKEND must be none, memory, or filesystem")
+        if cls.TIMELINE_CACHE_TTL_SECONDS < 1 or cls.TIMELINE_CACHE_MAX_ENTRIES < 1:
+            raise RuntimeError("TIMELINE_CACHE_TTL_SECONDS and TIMELINE_CACHE_MAX_ENTRIES must be at least 1")
+        if cls.REALTIME_BROKER not in {"none", "memory"} and ":" not in cls.REALTIME_BROKER:
+            raise RuntimeError("REALTIME_BROKER must be none, memory, or a module:factory path")
+        if min(cls.REALTIME_MAX_CONNECTIONS, cls.REALTIME_STREAM_SECONDS, cls.REALTIME_HEARTBEAT_SECONDS, cls.REALTIME_MAX_PENDING_EVENTS) < 1:
+            raise RuntimeError("REALTIME_MAX_CONNECTIONS, REALTIME_STREAM_SECONDS, REALTIME_HEARTBEAT_SECONDS, and REALTIME_MAX_PENDING_EVENTS must be at least 1")
+        if cls.HOME_TIMELINE_FANOUT_MAX_FOLLOWERS < 0:
+            raise RuntimeError("HOME_TIMELINE_FANOUT_MAX_FOLLOWERS must be zero or greater")
+        if cls.HOME_TIMELINE_BACKFILL_LIMIT < 0:
+            raise RuntimeError("HOME_TIMELINE_BACKFILL_LIMIT must be zero or greater")
+        if cls.HOME_TIMELINE_FANOUT_MODE not in {"hybrid", "push"}:
+            raise RuntimeError("HOME_TIMELINE_FANOUT_MODE must be hybrid or push")
+        if cls.HOME_TIMELINE_RECENT_POSTS_PER_AUTHOR < 1:
+            raise RuntimeError("HOME_TIMELINE_RECENT_POSTS_PER_AUTHOR must be at least 1")
+        if cls.HOME_TIMELINE_RECENT_POSTS_TTL_SECONDS < 0:
+            raise RuntimeError("HOME_TIMELINE_RECENT_POSTS_TTL_SECONDS must be zero or greater")
         if cls.PASSWORD_RESET_MAX_AGE_SECONDS < 60:
             raise RuntimeError("PASSWORD_RESET_MAX_AGE_SECONDS must be at least 60")
         if cls.MAIL_USE_TLS and cls.MAIL_USE_SSL:
@@ -76,6 +149,20 @@ class Config:
             raise RuntimeError("MEDIA_STORAGE_BACKEND must be filesystem or s3")
         if cls.MEDIA_STORAGE_BACKEND == "s3" and (not cls.MEDIA_S3_BUCKET or not cls.MEDIA_S3_REGION):
             raise RuntimeError("S3 media storage requires MEDIA_S3_BUCKET and MEDIA_S3_REGION")
+        if cls.MEDIA_S3_DELIVERY not in {"proxy", "redirect"}:
+            raise RuntimeError("MEDIA_S3_DELIVERY must be proxy or redirect")
+        if not 60 <= cls.MEDIA_S3_URL_EXPIRES_SECONDS <= 604800:
+            raise RuntimeError("MEDIA_S3_URL_EXPIRES_SECONDS must be between 60 and 604800")
+        if cls.MEDIA_CACHE_MAX_BYTES < 0:
+            raise RuntimeError("MEDIA_CACHE_MAX_BYTES must be zero or greater")
+        if cls.IMAGE_PIPELINE_WORKERS < 0:
+            raise RuntimeError("IMAGE_PIPELINE_WORKERS must be zero or greater")
+        if cls.IMAGE_PIPELINE_MAX_PENDING < 1 or cls.IMAGE_PIPELINE_TIMEOUT_SECONDS < 1:
+            raise RuntimeError("IMAGE_PIPELINE_MAX_PENDING and IMAGE_PIPELINE_TIMEOUT_SECONDS must be at least 1")
+        if any(width < 1 for width in cls.IMAGE_RENDITION_WIDTHS):
+            raise RuntimeError("IMAGE_RENDITION_WIDTHS must be positive pixel widths")
+        if not set(cls.IMAGE_RENDITION_FORMATS) <= {"avif", "webp"}:
+            raise RuntimeError("IMAGE_RENDITION_FORMATS may only contain avif and webp")
         if cls.ENVIRONMENT == "production" and cls.MEDIA_STORAGE_BACKEND != "s3":
             raise RuntimeError("Production requires MEDIA_STORAGE_BACKEND=s3")
         if cls.ENVIRONMENT == "production" and cls.SQLALCHEMY_DATABASE_URI.startswith("sqlite:"):
@@ -0,0 +1,31 @@
+"""Add timeline ordering indexes.
+
+Revision ID: 20261018_0016
+Revises: 20260819_0015
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_0016"
+down_revision = "20260819_0015"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_tweet_timeline_timestamp",
+        "tweet",
+        [sa.text("coalesce(scheduled_at, timestamp)"), "id"],
+    )
+    op.create_index("ix_retweet_timestamp_id", "retweet", ["timestamp", "id"])
+    op.create_index("ix_quote_timestamp_id", "quote", ["timestamp", "id"])
+    op.create_index("ix_poll_created_at_id", "poll", ["created_at", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_poll_created_at_id", table_name="poll")
+    op.drop_index("ix_quote_timestamp_id", table_name="quote")
+    op.drop_index("ix_retweet_timestamp_id", table_name="retweet")
+    op.drop_index("ix_tweet_timeline_timestamp", table_name="tweet")
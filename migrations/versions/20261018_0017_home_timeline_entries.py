@@ -0,0 +1,53 @@
+"""Add materialized home timeline entries.
+
+Revision ID: 20261018_0017
+Revises: 20261018_0016
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_0017"
+down_revision = "20261018_0016"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "home_timeline_entry",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("post_type", sa.String(length=20), nullable=False),
+        sa.Column("source_id", sa.Integer(), nullable=False),
+        sa.Column("author_id", sa.Integer(), nullable=False),
+        sa.Column("timestamp", sa.DateTime(), nullable=False),
+        sa.Column("priority", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["author_id"], ["user.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id", "post_type", "source_id", name="uq_home_timeline_entry_user_post"),
+    )
+    op.create_index(
+        "ix_home_timeline_entry_user_order",
+        "home_timeline_entry",
+        ["user_id", sa.text("timestamp DESC"), "priority", sa.text("source_id DESC")],
+    )
+    op.create_index("ix_home_timeline_entry_user_author", "home_timeline_entry", ["user_id", "author_id"])
+    op.create_table(
+        "fanout_exempt_author",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("follower_count", sa.Integer(), nullable=False),
+        sa.Column("exempted_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.create_index("ix_follows_followed_id", "follows", ["followed_id"])
+
+
+def downgrade():
+    op.drop_index("ix_follows_followed_id", table_name="follows")
+    op.drop_table("fanout_exempt_author")
+    op.drop_index("ix_home_timeline_entry_user_author", table_name="home_timeline_entry")
+    op.drop_index("ix_home_timeline_entry_user_order", table_name="home_timeline_entry")
+    op.drop_table("home_timeline_entry")
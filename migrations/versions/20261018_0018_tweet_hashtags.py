@@ -0,0 +1,37 @@
+"""Add the normalized tweet and quote hashtag index.
+
+Revision ID: 20261018_0018
+Revises: 20261018_0017
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_0018"
+down_revision = "20261018_0017"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "tweet_hashtag",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("tweet_id", sa.Integer(), nullable=True),
+        sa.Column("quote_id", sa.Integer(), nullable=True),
+        sa.Column("tag", sa.String(length=144), nullable=False),
+        sa.Column("timestamp", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["quote_id"], ["quote.id"]),
+        sa.ForeignKeyConstraint(["tweet_id"], ["tweet.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("quote_id", "tag", name="uq_tweet_hashtag_quote_tag"),
+        sa.UniqueConstraint("tweet_id", "tag", name="uq_tweet_hashtag_tweet_tag"),
+    )
+    op.create_index("ix_tweet_hashtag_tag_timestamp", "tweet_hashtag", ["tag", sa.text("timestamp DESC")])
+    op.create_index("ix_tweet_hashtag_timestamp", "tweet_hashtag", ["timestamp"])
+
+
+def downgrade():
+    op.drop_index("ix_tweet_hashtag_timestamp", table_name="tweet_hashtag")
+    op.drop_index("ix_tweet_hashtag_tag_timestamp", table_name="tweet_hashtag")
+    op.drop_table("tweet_hashtag")
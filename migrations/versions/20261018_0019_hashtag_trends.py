@@ -0,0 +1,38 @@
+"""Add hourly hashtag trend buckets and the precomputed trending ranking.
+
+Revision ID: 20261018_0019
+Revises: 20261018_0018
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_0019"
+down_revision = "20261018_0018"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "hashtag_trend_bucket",
+        sa.Column("tag", sa.String(length=144), nullable=False),
+        sa.Column("bucket_start", sa.DateTime(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("tag", "bucket_start"),
+    )
+    op.create_index("ix_hashtag_trend_bucket_bucket_start", "hashtag_trend_bucket", ["bucket_start"])
+    op.create_table(
+        "trending_hashtag",
+        sa.Column("rank", sa.Integer(), nullable=False),
+        sa.Column("tag", sa.String(length=144), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("rank"),
+    )
+
+
+def downgrade():
+    op.drop_table("trending_hashtag")
+    op.drop_index("ix_hashtag_trend_bucket_bucket_start", table_name="hashtag_trend_bucket")
+    op.drop_table("hashtag_trend_bucket")
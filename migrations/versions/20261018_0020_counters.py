@@ -0,0 +1,48 @@
+"""Add maintained per-user unread counters and site-wide counters.
+
+Revision ID: 20261018_0020
+Revises: 20261018_0019
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_0020"
+down_revision = "20261018_0019"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "user_counters",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("unread_notifications", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("unread_messages", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("followed_hashtags", sa.Integer(), server_default="0", nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.create_table(
+        "site_counter",
+        sa.Column("name", sa.String(length=40), nullable=False),
+        sa.Column("value", sa.Integer(), server_default="0", nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    # Seed the counters from the existing rows; `flask reconcile-counters` repairs later drift.
+    op.execute(
+        """
+        INSERT INTO user_counters (user_id, unread_notifications, unread_messages, followed_hashtags)
+        SELECT u.id,
+               (SELECT COUNT(*) FROM notification n WHERE n.user_id = u.id AND n.read = false),
+               (SELECT COUNT(*) FROM direct_message m WHERE m.receiver_id = u.id AND m.read = false AND m.deleted_by_receiver = false),
+               (SELECT COUNT(*) FROM hashtag_follow h WHERE h.user_id = u.id)
+        FROM "user" u
+        """
+    )
+    op.execute("INSERT INTO site_counter (name, value) SELECT 'pending_reports', COUNT(*) FROM post_report WHERE status = 'pending'")
+
+
+def downgrade():
+    op.drop_table("site_counter")
+    op.drop_table("user_counters")
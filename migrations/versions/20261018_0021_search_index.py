@@ -0,0 +1,44 @@
+"""Add the full-text search index for tweets, quotes, and usernames.
+
+SQLite uses an FTS5 virtual table; PostgreSQL uses a generated ``tsvector``
+column with a GIN index. Document ids are ``record_id * 4 + kind`` with kinds
+tweet=1, quote=2, and user=3.
+
+Revision ID: 20261018_0021
+Revises: 20261018_0020
+"""
+
+from alembic import op
+
+revision = "20261018_0021"
+down_revision = "20261018_0020"
+branch_labels = None
+depends_on = None
+
+
+def _index_table():
+    return "search_document" if op.get_bind().dialect.name == "postgresql" else "search_index"
+
+
+def upgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(
+            "CREATE TABLE search_document (doc_id BIGINT PRIMARY KEY, body TEXT NOT NULL, "
+            "document TSVECTOR GENERATED ALWAYS AS (to_tsvector('simple', body)) STORED)"
+        )
+        op.execute("CREATE INDEX ix_search_document_document ON search_document USING GIN (document)")
+        columns = "doc_id, body"
+    else:
+        op.execute("CREATE VIRTUAL TABLE search_index USING fts5(body, tokenize='unicode61')")
+        columns = "rowid, body"
+    table = _index_table()
+    op.execute(f"INSERT INTO {table} ({columns}) SELECT id * 4 + 1, content FROM tweet WHERE is_removed = false AND scheduled_at IS NULL")
+    op.execute(
+        f"INSERT INTO {table} ({columns}) SELECT quote.id * 4 + 2, quote.content FROM quote "
+        "JOIN tweet ON tweet.id = quote.tweet_id WHERE quote.is_removed = false AND tweet.is_removed = false"
+    )
+    op.execute(f'INSERT INTO {table} ({columns}) SELECT id * 4 + 3, username FROM "user"')
+
+
+def downgrade():
+    op.execute(f"DROP TABLE {_index_table()}")
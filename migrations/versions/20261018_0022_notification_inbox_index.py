@@ -0,0 +1,40 @@
+"""Index the notification inbox for keyset pagination.
+
+Notification timestamps become required so every row has a position in the
+``(timestamp, id)`` order. Rows without one could only come from raw SQL; they
+take the migration time.
+
+Revision ID: 20261018_0022
+Revises: 20261018_0021
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_0022"
+down_revision = "20261018_0021"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("UPDATE notification SET timestamp = CURRENT_TIMESTAMP WHERE timestamp IS NULL")
+    with op.batch_alter_table("notification") as batch_op:
+        batch_op.alter_column(
+            "timestamp",
+            existing_type=sa.DateTime(),
+            nullable=False,
+            server_default=sa.func.current_timestamp(),
+        )
+    op.create_index("ix_notification_user_timestamp_id", "notification", ["user_id", "timestamp", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_notification_user_timestamp_id", table_name="notification")
+    with op.batch_alter_table("notification") as batch_op:
+        batch_op.alter_column(
+            "timestamp",
+            existing_type=sa.DateTime(),
+            nullable=True,
+            server_default=None,
+        )
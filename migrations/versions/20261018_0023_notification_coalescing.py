@@ -0,0 +1,29 @@
+"""Let activity notifications coalesce by recipient, kind, and post.
+
+Revision ID: 20261018_0023
+Revises: 20261018_0022
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_0023"
+down_revision = "20261018_0022"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("notification") as batch_op:
+        batch_op.add_column(sa.Column("kind", sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column("actor_count", sa.Integer(), nullable=False, server_default="1"))
+        batch_op.add_column(sa.Column("actor_ids", sa.JSON(), nullable=True))
+    op.create_index("ix_notification_user_kind_tweet_timestamp", "notification", ["user_id", "kind", "tweet_id", "timestamp"])
+
+
+def downgrade():
+    op.drop_index("ix_notification_user_kind_tweet_timestamp", table_name="notification")
+    with op.batch_alter_table("notification") as batch_op:
+        batch_op.drop_column("actor_ids")
+        batch_op.drop_column("actor_count")
+        batch_op.drop_column("kind")
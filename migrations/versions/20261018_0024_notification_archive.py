@@ -0,0 +1,38 @@
+"""Add the notification archive and the retention lookup index.
+
+Revision ID: 20261018_0024
+Revises: 20261018_0023
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_0024"
+down_revision = "20261018_0023"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "notification_archive",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("message", sa.String(length=200), nullable=False),
+        sa.Column("timestamp", sa.DateTime(), nullable=False),
+        sa.Column("tweet_id", sa.Integer(), nullable=True),
+        sa.Column("kind", sa.String(length=20), nullable=True),
+        sa.Column("actor_count", sa.Integer(), server_default="1", nullable=False),
+        sa.Column("archived_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["tweet_id"], ["tweet.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_notification_archive_user_timestamp", "notification_archive", ["user_id", "timestamp"])
+    op.create_index("ix_notification_read_timestamp", "notification", ["read", "timestamp"])
+
+
+def downgrade():
+    op.drop_index("ix_notification_read_timestamp", table_name="notification")
+    op.drop_index("ix_notification_archive_user_timestamp", table_name="notification_archive")
+    op.drop_table("notification_archive")
@@ -0,0 +1,89 @@
+"""Group direct messages into conversations.
+
+Each existing pair of users gets one conversation holding its newest message
+and both participants' unread counts, and every message is attached to its
+pair's conversation. Messages without a timestamp could only come from raw
+SQL; they take the migration time.
+
+Revision ID: 20261018_0025
+Revises: 20261018_0024
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_0025"
+down_revision = "20261018_0024"
+branch_labels = None
+depends_on = None
+
+FIRST = "CASE WHEN m.sender_id < m.receiver_id THEN m.sender_id ELSE m.receiver_id END"
+SECOND = "CASE WHEN m.sender_id < m.receiver_id THEN m.receiver_id ELSE m.sender_id END"
+UNREAD = (
+    "(SELECT COUNT(*) FROM direct_message m WHERE m.conversation_id = conversation.id "
+    "AND m.receiver_id = conversation.{column} AND m.read = false AND m.deleted_by_receiver = false)"
+)
+
+
+def upgrade():
+    op.create_table(
+        "conversation",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("first_user_id", sa.Integer(), nullable=False),
+        sa.Column("second_user_id", sa.Integer(), nullable=False),
+        sa.Column("last_message_id", sa.Integer(), nullable=True),
+        sa.Column("last_message_at", sa.DateTime(), nullable=False),
+        sa.Column("first_unread", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("second_unread", sa.Integer(), server_default="0", nullable=False),
+        sa.CheckConstraint("first_user_id <= second_user_id", name="ck_conversation_participant_order"),
+        sa.ForeignKeyConstraint(["first_user_id"], ["user.id"]),
+        sa.ForeignKeyConstraint(["second_user_id"], ["user.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("first_user_id", "second_user_id", name="uq_conversation_participants"),
+    )
+    op.execute("UPDATE direct_message SET timestamp = CURRENT_TIMESTAMP WHERE timestamp IS NULL")
+    op.execute(
+        f"""
+        INSERT INTO conversation (first_user_id, second_user_id, last_message_at)
+        SELECT {FIRST}, {SECOND}, MAX(m.timestamp)
+        FROM direct_message m
+        GROUP BY {FIRST}, {SECOND}
+        """
+    )
+    with op.batch_alter_table("direct_message") as batch_op:
+        batch_op.add_column(sa.Column("conversation_id", sa.Integer(), nullable=True))
+    op.execute(
+        f"""
+        UPDATE direct_message SET conversation_id = (
+            SELECT c.id FROM conversation c, direct_message m
+            WHERE m.id = direct_message.id AND c.first_user_id = {FIRST} AND c.second_user_id = {SECOND}
+        )
+        """
+    )
+    op.execute(
+        f"""
+        UPDATE conversation SET
+            last_message_id = (
+                SELECT m.id FROM direct_message m WHERE m.conversation_id = conversation.id
+                ORDER BY m.timestamp DESC, m.id DESC LIMIT 1
+            ),
+            first_unread = {UNREAD.format(column="first_user_id")},
+            second_unread = {UNREAD.format(column="second_user_id")}
+        """
+    )
+    with op.batch_alter_table("direct_message") as batch_op:
+        batch_op.alter_column("conversation_id", existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key("fk_direct_message_conversation", "conversation", ["conversation_id"], ["id"])
+    op.create_index("ix_direct_message_conversation_timestamp_id", "direct_message", ["conversation_id", "timestamp", "id"])
+    op.create_index("ix_conversation_first_user_activity", "conversation", ["first_user_id", "last_message_at", "id"])
+    op.create_index("ix_conversation_second_user_activity", "conversation", ["second_user_id", "last_message_at", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_conversation_second_user_activity", table_name="conversation")
+    op.drop_index("ix_conversation_first_user_activity", table_name="conversation")
+    op.drop_index("ix_direct_message_conversation_timestamp_id", table_name="direct_message")
+    with op.batch_alter_table("direct_message") as batch_op:
+        batch_op.drop_constraint("fk_direct_message_conversation", type_="foreignkey")
+        batch_op.drop_column("conversation_id")
+    op.drop_table("conversation")
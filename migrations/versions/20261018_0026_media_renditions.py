@@ -0,0 +1,34 @@
+"""Add the media rendition table.
+
+Revision ID: 20261018_0026
+Revises: 20261018_0025
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_0026"
+down_revision = "20261018_0025"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "media_rendition",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("source", sa.String(length=100), nullable=False),
+        sa.Column("name", sa.String(length=120), nullable=False),
+        sa.Column("width", sa.Integer(), nullable=False),
+        sa.Column("height", sa.Integer(), nullable=False),
+        sa.Column("format", sa.String(length=10), nullable=False),
+        sa.Column("size_bytes", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+        sa.UniqueConstraint("source", "format", "width", name="uq_media_rendition_source_format_width"),
+    )
+
+
+def downgrade():
+    op.drop_table("media_rendition")
@@ -0,0 +1,43 @@
+"""Record every distinct actor folded into a coalesced notification.
+
+Existing notifications only kept a sample of their newest actors, so the
+backfill records that sample; an older actor outside it who acts again
+before the notification is read is still counted twice.
+
+Revision ID: 20261018_0027
+Revises: 20261018_0026
+"""
+
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261018_0027"
+down_revision = "20261018_0026"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    notification_actor = op.create_table(
+        "notification_actor",
+        sa.Column("notification_id", sa.Integer(), nullable=False),
+        sa.Column("actor_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["actor_id"], ["user.id"]),
+        sa.ForeignKeyConstraint(["notification_id"], ["notification.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("notification_id", "actor_id"),
+    )
+    connection = op.get_bind()
+    rows = connection.execute(sa.text("SELECT id, actor_ids FROM notification WHERE actor_ids IS NOT NULL")).all()
+    actors = []
+    for notification_id, actor_ids in rows:
+        if isinstance(actor_ids, str):
+            actor_ids = json.loads(actor_ids)
+        actors.extend({"notification_id": notification_id, "actor_id": actor_id} for actor_id in dict.fromkeys(actor_ids or []))
+    if actors:
+        op.bulk_insert(notification_actor, actors)
+
+
+def downgrade():
+    op.drop_table("notification_actor")
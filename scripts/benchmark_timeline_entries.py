@@ -0,0 +1,80 @@
+"""Compare the memory held by timeline posts as dicts and as ``TimelineEntry`` objects."""
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+# Importing the package loads the validated configuration; no app or database is used.
+os.environ.setdefault("SECRET_KEY", "benchmark-only")
+
+from twitclone.timeline.service import TimelineEntry  # noqa: E402
+
+POST_TYPES = ("tweet", "retweet", "quote", "poll")
+
+
+def build_fixtures(count: int):
+    """Return ``count`` lightweight stand-ins for loaded rows, sharing users as a real page does."""
+    users = [SimpleNamespace(id=index, username=f"user{index}") for index in range(1, 1001)]
+    started_at = datetime(2026, 10, 18, 12, 0)
+    fixtures = []
+    for index in range(count):
+        user = users[index % len(users)]
+        original = SimpleNamespace(id=index, user=users[(index + 1) % len(users)], user_id=users[(index + 1) % len(users)].id)
+        poll = SimpleNamespace(id=index)
+        fixtures.append((POST_TYPES[index % 4], index, started_at - timedelta(seconds=index), user, f"Post {index}", original, poll))
+    return fixtures
+
+
+def as_dict(post_type, source_id, timestamp, user, content, original, poll):
+    """The 18-key dict each timeline post used to be built as."""
+    return {
+        "id": source_id, "source_id": source_id, "action_tweet_id": None if post_type == "poll" else original.id, "content": content,
+        "timestamp": timestamp, "type": post_type, "user": user, "image": None,
+        "original_tweet": original if post_type in ("retweet", "quote") else None, "original_user": original.user if post_type in ("retweet", "quote") else None,
+        "poll": poll if post_type == "poll" else None, "poll_id": poll.id if post_type == "poll" else None, "has_voted": False, "poll_is_active": post_type == "poll",
+        "report_type": "tweet" if post_type in ("tweet", "retweet") else post_type, "report_id": source_id, "report_author_id": user.id,
+    }
+
+
+def as_entry(post_type, source_id, timestamp, user, content, original, poll):
+    return TimelineEntry(
+        post_type, source_id, timestamp, user, content, None if post_type == "poll" else original.id,
+        original_tweet=original if post_type in ("retweet", "quote") else None, poll=poll if post_type == "poll" else None, poll_is_active=post_type == "poll",
+    )
+
+
+def measure(build, fixtures) -> int:
+    """Return the bytes still allocated after building one post per fixture."""
+    gc.collect()
+    tracemalloc.start()
+    posts = [build(*fixture) for fixture in fixtures]
+    allocated, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del posts
+    return allocated
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--posts", type=int, default=100_000, help="number of timeline posts to build")
+    args = parser.parse_args()
+
+    fixtures = build_fixtures(args.posts)
+    dict_bytes = measure(as_dict, fixtures)
+    entry_bytes = measure(as_entry, fixtures)
+    print(f"{args.posts} posts")
+    print(f"dict:          {dict_bytes / 1_048_576:8.1f} MiB ({dict_bytes / args.posts:6.0f} B/post)")
+    print(f"TimelineEntry: {entry_bytes / 1_048_576:8.1f} MiB ({entry_bytes / args.posts:6.0f} B/post)")
+    print(f"saved:         {(dict_bytes - entry_bytes) / dict_bytes:8.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,54 @@
+"""Measure prefix lookup latency and memory of ``UsernameIndex`` at a given user count."""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+# Importing the package loads the validated configuration; no app or database is used.
+os.environ.setdefault("SECRET_KEY", "benchmark-only")
+
+from twitclone.username_index import AUTOCOMPLETE_LIMIT, UsernameIndex  # noqa: E402
+
+
+def build_usernames(count: int, rng: random.Random):
+    alphabet = string.ascii_lowercase + string.digits + "_"
+    names = {"".join(rng.choices(alphabet, k=rng.randint(4, 15))) for _ in range(count)}
+    return [(user_id, name.capitalize() if user_id % 5 == 0 else name) for user_id, name in enumerate(sorted(names), start=1)]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1_000_000, help="number of usernames to index")
+    parser.add_argument("--lookups", type=int, default=100_000, help="number of prefix lookups to time")
+    args = parser.parse_args()
+    rng = random.Random(18)
+
+    rows = build_usernames(args.users, rng)
+    tracemalloc.start()
+    index = UsernameIndex(max_entries=len(rows))
+    index.ensure_loaded(lambda _limit: rows)
+    allocated, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    prefixes = [rows[rng.randrange(len(rows))][1][: rng.randint(1, 4)].lower() for _ in range(args.lookups)]
+    timings = []
+    for prefix in prefixes:
+        started_at = time.perf_counter_ns()
+        index.lookup(prefix, AUTOCOMPLETE_LIMIT)
+        timings.append(time.perf_counter_ns() - started_at)
+    timings.sort()
+    print(f"{len(index)} usernames, {allocated / 1_048_576:.1f} MiB")
+    for label, quantile in (("p50", 0.5), ("p99", 0.99), ("max", 1.0)):
+        print(f"{label}: {timings[min(int(len(timings) * quantile), len(timings) - 1)] / 1000:8.1f} µs")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,8 +1,10 @@
 """Shared pytest fixtures for an isolated TwitClone test environment."""
 
 import os
+from contextlib import contextmanager
 
 import pytest
+from sqlalchemy import event
 
 
 # These values must be set before importing the configured application because
@@ -46,3 +48,33 @@ def app():
 def client(app):
     """Return Flask's test client for the isolated application."""
     return app.test_client()
+
+
+@pytest.fixture()
+def assert_max_queries(app):
+    """Return a context manager failing when its block issues too many SQL statements.
+
+    The yielded list collects each executed statement so tests can also assert
+    that two differently shaped workloads cost the same number of queries.
+    """
+    with app.app_context():
+        engine = db.engine
+
+    @contextmanager
+    def checker(limit):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        assert len(statements) <= limit, (
+            f"Expected at most {limit} queries, executed {len(statements)}:\n"
+            + "\n".join(statements)
+        )
+
+    return checker
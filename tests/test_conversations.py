@@ -0,0 +1,134 @@
+"""Conversation-threaded direct messages and the paginated inbox."""
+
+from datetime import UTC, datetime, timedelta
+
+from twitclone.counters import get_user_counts
+from twitclone.extensions import db
+from twitclone.messaging.conversations import inbox_page, thread_page
+from twitclone.models import Conversation, DirectMessage, User
+
+
+def _users(app, *usernames):
+    with app.app_context():
+        users = [User(username=username, email=f"{username}@example.com", password="hash") for username in usernames]
+        db.session.add_all(users)
+        db.session.commit()
+        return [user.id for user in users]
+
+
+def _login(client, user_id):
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+
+def _send(sender_id, receiver_id, content, timestamp=None):
+    message = DirectMessage(sender_id=sender_id, receiver_id=receiver_id, content=content, timestamp=timestamp)
+    db.session.add(message)
+    db.session.commit()
+    return message
+
+
+def test_both_directions_share_one_conversation_with_per_participant_unread(client, app):
+    alice_id, bob_id = _users(app, "alice", "bob")
+    with app.app_context():
+        _send(alice_id, bob_id, "hi bob")
+        _send(alice_id, bob_id, "are you there?")
+        latest = _send(bob_id, alice_id, "yes")
+
+        conversation = Conversation.query.one()
+        assert (conversation.first_user_id, conversation.second_user_id) == (alice_id, bob_id)
+        assert conversation.last_message_id == latest.id
+        assert (conversation.unread_for(alice_id), conversation.unread_for(bob_id)) == (1, 2)
+        conversation_id = conversation.id
+    _login(client, bob_id)
+
+    response = client.get(f"/messages/{conversation_id}")
+
+    assert response.status_code == 200
+    assert response.data.index(b"hi bob") < response.data.index(b"are you there?") < response.data.index(b"yes")
+    with app.app_context():
+        conversation = db.session.get(Conversation, conversation_id)
+        assert (conversation.unread_for(alice_id), conversation.unread_for(bob_id)) == (1, 0)
+        assert get_user_counts(bob_id).unread_messages == 0
+        assert get_user_counts(alice_id).unread_messages == 1
+
+
+def test_inbox_orders_by_activity_and_marks_only_the_displayed_page_read(client, app, assert_max_queries):
+    viewer_id, *other_ids = _users(app, "viewer", "ann", "ben", "cat")
+    start = datetime.now(UTC).replace(tzinfo=None) - timedelta(hours=1)
+    with app.app_context():
+        for offset, other_id in enumerate(other_ids):
+            _send(other_id, viewer_id, f"note {offset}", start + timedelta(minutes=offset))
+        # A reply moves the oldest conversation back to the top.
+        _send(viewer_id, other_ids[0], "reply", start + timedelta(minutes=10))
+
+        first = inbox_page(viewer_id, per_page=2)
+        assert [conversation.other_user(viewer_id).username for conversation in first.items] == ["ann", "cat"]
+        second = inbox_page(viewer_id, before=first.next_cursor, per_page=2)
+        assert [conversation.other_user(viewer_id).username for conversation in second.items] == ["ben"]
+        assert not second.has_next
+    _login(client, viewer_id)
+
+    with assert_max_queries(20):
+        response = client.get("/messages")
+
+    assert b"1 new" in response.data and b"To @ann:" in response.data
+    with app.app_context():
+        assert DirectMessage.query.filter_by(receiver_id=viewer_id, read=False).count() == 0
+        assert get_user_counts(viewer_id).unread_messages == 0
+
+
+def test_deleting_every_message_keeps_the_conversation_activity_time(app):
+    alice_id, bob_id = _users(app, "alice", "bob")
+    sent_at = datetime.now(UTC).replace(tzinfo=None) - timedelta(days=1)
+    with app.app_context():
+        message = _send(alice_id, bob_id, "only line", sent_at)
+        db.session.delete(message)
+        db.session.commit()
+
+        conversation = Conversation.query.one()
+        assert (conversation.last_message_id, conversation.last_message_at) == (None, sent_at)
+
+
+def test_thread_pages_visible_messages_and_repoints_after_deletion(client, app):
+    alice_id, bob_id, carol_id = _users(app, "alice", "bob", "carol")
+    start = datetime.now(UTC).replace(tzinfo=None) - timedelta(hours=1)
+    with app.app_context():
+        messages = [_send(alice_id, bob_id, f"line {index}", start + timedelta(minutes=index)) for index in range(4)]
+        hidden = messages[1]
+        hidden.deleted_by_receiver = True
+        hidden.read = True
+        db.session.commit()
+        conversation = Conversation.query.one()
+        conversation_id = conversation.id
+
+        newest = thread_page(bob_id, conversation, per_page=2)
+        assert [message.content for message in newest.messages] == ["line 2", "line 3"]
+        older = thread_page(bob_id, conversation, before=newest.next_cursor, per_page=2)
+        assert [message.content for message in older.messages] == ["line 0"]
+        assert conversation.unread_for(bob_id) == 3
+
+        last = messages[3]
+        last.deleted_by_sender = last.deleted_by_receiver = last.read = True
+        db.session.commit()
+        db.session.delete(last)
+        db.session.commit()
+        repointed = db.session.get(Conversation, conversation_id)
+        assert (repointed.last_message_id, repointed.last_message_at) == (messages[2].id, messages[2].timestamp)
+
+        last_active = messages[2].timestamp
+        db.session.delete(messages[0])
+        db.session.commit()
+        assert db.session.get(Conversation, conversation_id).last_message_at == last_active
+    _login(client, carol_id)
+    assert client.get(f"/messages/{conversation_id}").status_code == 404
+
+    _login(client, bob_id)
+    response = client.post(f"/messages/{conversation_id}", data={"content": "got it"})
+
+    assert response.headers["Location"] == f"/messages/{conversation_id}"
+    with app.app_context():
+        reply = DirectMessage.query.filter_by(content="got it").one()
+        assert (reply.conversation_id, reply.receiver_id) == (conversation_id, alice_id)
+        assert db.session.get(Conversation, conversation_id).last_message_id == reply.id
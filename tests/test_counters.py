@@ -0,0 +1,111 @@
+"""Maintained unread and moderation counters behind the page chrome."""
+
+from twitclone.counters import get_pending_report_count, get_user_counts
+from twitclone.extensions import db
+from twitclone.models import DirectMessage, HashtagFollow, Notification, PostReport, Tweet, User, UserCounters
+
+
+def _create_user(app, username):
+    with app.app_context():
+        user = User(username=username, email=f"{username}@example.com", password="hash")
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def _login(client, user_id):
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+
+def test_notification_writes_maintain_the_unread_counter(client, app):
+    user_id = _create_user(app, "alice")
+    with app.app_context():
+        db.session.add_all([Notification(user_id=user_id, message="one"), Notification(user_id=user_id, message="two"), Notification(user_id=user_id, message="seen", read=True)])
+        db.session.commit()
+        assert get_user_counts(user_id).unread_notifications == 2
+        db.session.delete(Notification.query.filter_by(message="one").one())
+        db.session.commit()
+        assert get_user_counts(user_id).unread_notifications == 1
+    _login(client, user_id)
+
+    client.get("/notifications")
+
+    with app.app_context():
+        assert get_user_counts(user_id).unread_notifications == 0
+
+
+def test_message_counter_follows_reads_and_receiver_deletion(client, app):
+    alice_id = _create_user(app, "alice")
+    bob_id = _create_user(app, "bob")
+    with app.app_context():
+        db.session.add_all([DirectMessage(sender_id=bob_id, receiver_id=alice_id, content=text) for text in ("hi", "there")])
+        db.session.commit()
+        message = DirectMessage.query.filter_by(content="hi").one()
+        message.deleted_by_sender = True
+        db.session.commit()
+        message_id = message.id
+        assert get_user_counts(alice_id).unread_messages == 2
+    _login(client, alice_id)
+
+    client.post(f"/messages/{message_id}/delete")
+    with app.app_context():
+        assert db.session.get(DirectMessage, message_id) is None
+        assert get_user_counts(alice_id).unread_messages == 1
+
+    client.get("/messages")
+    with app.app_context():
+        assert get_user_counts(alice_id).unread_messages == 0
+
+
+def test_pending_report_counter_follows_review(app):
+    reporter_id = _create_user(app, "reporter")
+    author_id = _create_user(app, "author")
+    with app.app_context():
+        tweet = Tweet(content="reported", user_id=author_id)
+        db.session.add(tweet)
+        db.session.flush()
+        report = PostReport(reporter_id=reporter_id, author_id=author_id, content_type="tweet", content_id=tweet.id, category="spam")
+        db.session.add(report)
+        db.session.commit()
+        assert get_pending_report_count() == 1
+
+        report.status = "dismissed"
+        db.session.commit()
+
+        assert get_pending_report_count() == 0
+
+
+def test_page_chrome_reads_counters_instead_of_counting_rows(client, app, assert_max_queries):
+    user_id = _create_user(app, "alice")
+    with app.app_context():
+        db.session.add(Notification(user_id=user_id, message="hello"))
+        db.session.commit()
+    _login(client, user_id)
+
+    with assert_max_queries(40) as statements:
+        page = client.get("/about")
+
+    assert b"1 unread notifications" in page.data
+    assert not [statement for statement in statements if "count(" in statement.lower()]
+    assert not [statement for statement in statements if "FROM hashtag_follow" in statement]
+
+
+def test_reconcile_command_repairs_drift(app):
+    user_id = _create_user(app, "alice")
+    with app.app_context():
+        db.session.add_all([Notification(user_id=user_id, message="hello"), HashtagFollow(user_id=user_id, hashtag="rv")])
+        db.session.commit()
+        counters = db.session.get(UserCounters, user_id)
+        counters.unread_notifications = 7
+        counters.followed_hashtags = 0
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["reconcile-counters", "--batch-size", "1"])
+
+    assert result.exit_code == 0
+    assert "1 users checked, 1 repaired; pending reports unchanged" in result.output
+    with app.app_context():
+        assert get_user_counts(user_id).unread_notifications == 1
+        assert get_user_counts(user_id).followed_hashtags == 1
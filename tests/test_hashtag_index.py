@@ -0,0 +1,134 @@
+"""Normalized hashtag index maintenance and the readers built on it."""
+
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from twitclone.discovery.hashtags import HASHTAG_PAGE_SIZE, tagged_tweets_page
+from twitclone.extensions import db
+from twitclone.models import Quote, Tweet, TweetHashtag, User
+from twitclone.scheduling import publish_due_tweets
+from twitclone.trending import refresh_trending_hashtags
+from twitclone.utils import get_trending_hashtags
+
+
+def _now():
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+def _author(app):
+    with app.app_context():
+        user = User(username="author", email="author@example.com", password="hash")
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def _index():
+    return sorted(((row.tweet_id, row.quote_id, row.tag) for row in TweetHashtag.query.all()), key=lambda row: (row[0] or 0, row[1] or 0, row[2]))
+
+
+def test_posts_and_quotes_are_indexed_with_lowercase_distinct_tags(app):
+    author_id = _author(app)
+    with app.app_context():
+        tweet = Tweet(content="Road #RV trip #rv #Travel", user_id=author_id)
+        db.session.add(tweet)
+        db.session.flush()
+        quote = Quote(content="Same #camping", user_id=author_id, tweet_id=tweet.id)
+        db.session.add(quote)
+        db.session.commit()
+
+        assert _index() == [(None, quote.id, "camping"), (tweet.id, None, "rv"), (tweet.id, None, "travel")]
+        assert TweetHashtag.query.filter_by(quote_id=quote.id).one().timestamp == quote.timestamp
+
+
+def test_scheduled_tweets_are_indexed_when_published(app):
+    author_id = _author(app)
+    with app.app_context():
+        tweet = Tweet(content="Later #launch", user_id=author_id, scheduled_at=_now() + timedelta(minutes=5))
+        db.session.add(tweet)
+        db.session.commit()
+        assert _index() == []
+
+        publish_due_tweets(now=_now() + timedelta(minutes=10))
+
+        assert _index() == [(tweet.id, None, "launch")]
+        refresh_trending_hashtags()
+        assert get_trending_hashtags() == ["launch"]
+
+
+def test_moderation_removal_drops_the_post_and_its_quotes(app):
+    author_id = _author(app)
+    with app.app_context():
+        tweet = Tweet(content="Original #rv", user_id=author_id)
+        kept = Tweet(content="Other #rv", user_id=author_id)
+        db.session.add_all([tweet, kept])
+        db.session.flush()
+        db.session.add(Quote(content="Quoted #rv", user_id=author_id, tweet_id=tweet.id))
+        db.session.commit()
+
+        tweet.is_removed = True
+        db.session.commit()
+
+        assert _index() == [(kept.id, None, "rv")]
+
+
+def test_backfill_command_rebuilds_the_index(app):
+    author_id = _author(app)
+    with app.app_context():
+        tweets = [Tweet(content=f"Post {index} #rv", user_id=author_id) for index in range(3)]
+        db.session.add_all(tweets)
+        db.session.commit()
+        expected = _index()
+        TweetHashtag.query.delete()
+        db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=["backfill-hashtag-index", "--batch-size", "2"])
+
+        assert result.exit_code == 0
+        assert "3 posts scanned, 3 hashtags indexed" in result.output
+        assert _index() == expected
+
+
+def test_hashtag_page_and_search_read_the_index(client, app):
+    author_id = _author(app)
+    with app.app_context():
+        db.session.add_all([Tweet(content="Exact #rv", user_id=author_id), Tweet(content="Longer #rvlife", user_id=author_id)])
+        db.session.commit()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(author_id)
+        session["_fresh"] = True
+
+    hashtag_page = client.get("/hashtag/RV")
+    search_page = client.post("/search", data={"search_query": "#rv"})
+
+    assert b"Exact" in hashtag_page.data and b"Longer" not in hashtag_page.data
+    assert b"Exact" in search_page.data and b"Longer" in search_page.data
+
+
+def test_hashtag_page_walks_the_index_by_keyset(client, app, assert_max_queries):
+    author_id = _author(app)
+    start = datetime.now(UTC).replace(tzinfo=None) - timedelta(hours=1)
+    with app.app_context():
+        tweets = [Tweet(content=f"Post {index} #rv #RV", user_id=author_id, timestamp=start + timedelta(minutes=index // 2)) for index in range(HASHTAG_PAGE_SIZE + 5)]
+        db.session.add_all(tweets)
+        db.session.commit()
+        expected = [tweet.id for tweet in sorted(tweets, key=lambda tweet: (tweet.timestamp, tweet.id), reverse=True)]
+
+        with assert_max_queries(1) as statements:
+            first = tagged_tweets_page("rv")
+        second = tagged_tweets_page("rv", before=first.next_cursor)
+
+        assert "DISTINCT" not in statements[0]
+        assert [tweet.id for tweet in first.items + second.items] == expected
+        assert second.next_cursor is None
+        with pytest.raises(ValueError):
+            tagged_tweets_page("rv", before="not-a-cursor")
+    with client.session_transaction() as session:
+        session["_user_id"] = str(author_id)
+        session["_fresh"] = True
+
+    page = client.get("/hashtag/rv").data.decode()
+    assert page.count('class="list-group-item px-0"') == HASHTAG_PAGE_SIZE
+    assert f"/hashtag/rv?before={first.next_cursor}" in page
+    assert client.get("/hashtag/rv?before=bad").headers["Location"] == "/hashtag/rv"
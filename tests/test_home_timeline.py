@@ -0,0 +1,348 @@
+"""Materialized home timeline fan-out and read coverage."""
+
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from twitclone.extensions import db
+from twitclone.models import FanoutExemptAuthor, Follows, HashtagFollow, HomeTimelineEntry, Tweet, User
+from twitclone.scheduling import publish_due_tweets
+from twitclone.timeline.home import build_home_timeline_page, fetch_home_timeline_rows
+from twitclone.timeline.service import TimelineCursor
+
+
+def _now():
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+def _login(client, user_id):
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+
+def _users(app, *names):
+    with app.app_context():
+        users = [User(username=name, email=f"{name}@example.com", password="hash") for name in names]
+        db.session.add_all(users)
+        db.session.commit()
+        return [user.id for user in users]
+
+
+def _follow(app, follower_id, followed_id):
+    with app.app_context():
+        db.session.add(Follows(follower_id=follower_id, followed_id=followed_id))
+        db.session.commit()
+
+
+def _home_sources(app, user_id):
+    with app.app_context():
+        return [(row.type, row.source_id) for row in fetch_home_timeline_rows(user_id, now=_now(), limit=100)]
+
+
+@pytest.fixture()
+def fanout_limit(app):
+    original = app.config["HOME_TIMELINE_FANOUT_MAX_FOLLOWERS"]
+    yield lambda value: app.config.update(HOME_TIMELINE_FANOUT_MAX_FOLLOWERS=value)
+    app.config["HOME_TIMELINE_FANOUT_MAX_FOLLOWERS"] = original
+
+
+def test_posts_fan_out_to_author_followers_and_hashtag_followers_only(client, app):
+    author_id, follower_id, tag_fan_id, stranger_id = _users(app, "author", "follower", "tagfan", "stranger")
+    _follow(app, follower_id, author_id)
+    with app.app_context():
+        db.session.add(HashtagFollow(user_id=tag_fan_id, hashtag="camping"))
+        db.session.commit()
+    _login(client, author_id)
+
+    client.post("/tweet", data={"content": "Off to the woods #Camping"})
+    client.post("/tweet", data={"content": "Plain update"})
+
+    with app.app_context():
+        tagged, plain = [tweet.id for tweet in Tweet.query.order_by(Tweet.id)]
+    assert _home_sources(app, author_id) == [("tweet", plain), ("tweet", tagged)]
+    assert _home_sources(app, follower_id) == [("tweet", plain), ("tweet", tagged)]
+    assert _home_sources(app, tag_fan_id) == [("tweet", tagged)]
+    assert _home_sources(app, stranger_id) == []
+
+
+def test_retweets_quotes_and_polls_fan_out(client, app):
+    author_id, follower_id, other_id = _users(app, "author", "follower", "other")
+    _follow(app, follower_id, author_id)
+    with app.app_context():
+        original = Tweet(content="Original", user_id=other_id)
+        db.session.add(original)
+        db.session.commit()
+        original_id = original.id
+    _login(client, author_id)
+
+    client.post(f"/retweet/{original_id}")
+    client.post(f"/quote/{original_id}", data={"content": "Worth reading"})
+    client.post("/create_poll", data={"question": "Which?", "options-0-option_text": "A", "options-1-option_text": "B", "duration_days": "1", "duration_hours": "0", "duration_minutes": "0"})
+
+    assert [post_type for post_type, _ in _home_sources(app, follower_id)] == ["poll", "quote", "retweet"]
+    assert _home_sources(app, other_id) == []
+
+
+def test_scheduled_tweets_fan_out_when_published(client, app):
+    author_id, follower_id = _users(app, "author", "follower")
+    _follow(app, follower_id, author_id)
+    _login(client, author_id)
+    future = _now() + timedelta(hours=1)
+
+    client.post("/tweet", data={"content": "Later", "scheduled_date": future.strftime("%Y-%m-%d"), "scheduled_time": future.strftime("%H:%M")})
+    assert _home_sources(app, follower_id) == []
+
+    with app.app_context():
+        assert publish_due_tweets(now=future + timedelta(minutes=1)) == 1
+        tweet_id = Tweet.query.one().id
+    assert _home_sources(app, follower_id) == [("tweet", tweet_id)]
+
+
+def test_follow_backfills_recent_posts_and_unfollow_removes_them(client, app):
+    author_id, reader_id = _users(app, "author", "reader")
+    with app.app_context():
+        base = _now() - timedelta(hours=1)
+        tweets = [Tweet(content=f"Post {index}", user_id=author_id, timestamp=base + timedelta(minutes=index)) for index in range(3)]
+        db.session.add_all(tweets)
+        db.session.commit()
+        tweet_ids = [tweet.id for tweet in tweets]
+    _login(client, reader_id)
+
+    client.post("/follow/author")
+    client.post("/follow/author")
+    assert _home_sources(app, reader_id) == [("tweet", tweet_id) for tweet_id in reversed(tweet_ids)]
+
+    client.post("/unfollow/author")
+    assert _home_sources(app, reader_id) == []
+
+
+
+def test_hashtag_unfollow_removes_its_posts_unless_still_followed_otherwise(client, app):
+    author_id, friend_id, reader_id = _users(app, "author", "friend", "reader")
+    _follow(app, reader_id, friend_id)
+    with app.app_context():
+        stranger = Tweet(content="Trip #rv", user_id=author_id)
+        friend = Tweet(content="Also #rv", user_id=friend_id)
+        both = Tweet(content="Trip #rv #camping", user_id=author_id)
+        db.session.add_all([stranger, friend, both])
+        db.session.commit()
+        stranger_id, friend_tweet_id, both_id = stranger.id, friend.id, both.id
+    _login(client, reader_id)
+
+    client.post("/hashtag/camping/follow")
+    client.post("/hashtag/rv/follow")
+    assert {source for _type, source in _home_sources(app, reader_id)} == {stranger_id, friend_tweet_id, both_id}
+
+    client.post("/hashtag/rv/unfollow")
+    assert _home_sources(app, reader_id) == [("tweet", both_id), ("tweet", friend_tweet_id)]
+
+
+def test_author_unfollow_keeps_posts_carrying_a_followed_hashtag(client, app):
+    author_id, reader_id = _users(app, "author", "reader")
+    with app.app_context():
+        tagged = Tweet(content="Trip #rv", user_id=author_id)
+        plain = Tweet(content="Plain update", user_id=author_id)
+        db.session.add_all([tagged, plain])
+        db.session.commit()
+        tagged_id = tagged.id
+    _login(client, reader_id)
+
+    client.post("/hashtag/rv/follow")
+    client.post("/follow/author")
+    assert len(_home_sources(app, reader_id)) == 2
+
+    client.post("/unfollow/author")
+    assert _home_sources(app, reader_id) == [("tweet", tagged_id)]
+
+def test_hashtag_follow_backfills_exact_tag_matches(client, app):
+    author_id, reader_id = _users(app, "author", "reader")
+    with app.app_context():
+        tagged = Tweet(content="Trip #rv", user_id=author_id)
+        longer = Tweet(content="Trip #rvlife", user_id=author_id)
+        db.session.add_all([tagged, longer])
+        db.session.commit()
+        tagged_id = tagged.id
+    _login(client, reader_id)
+
+    client.post("/hashtag/rv/follow")
+
+    assert _home_sources(app, reader_id) == [("tweet", tagged_id)]
+
+
+def test_authors_over_the_fanout_limit_are_merged_at_read_time(client, app, fanout_limit):
+    fanout_limit(1)
+    celebrity_id, first_id, second_id = _users(app, "celebrity", "first", "second")
+    _follow(app, first_id, celebrity_id)
+    _follow(app, second_id, celebrity_id)
+    _login(client, celebrity_id)
+
+    client.post("/tweet", data={"content": "Hello everyone"})
+
+    with app.app_context():
+        tweet_id = Tweet.query.one().id
+        assert db.session.get(FanoutExemptAuthor, celebrity_id).follower_count == 2
+        assert HomeTimelineEntry.query.filter(HomeTimelineEntry.user_id != celebrity_id).count() == 0
+    assert _home_sources(app, first_id) == [("tweet", tweet_id)]
+    assert _home_sources(app, second_id) == [("tweet", tweet_id)]
+
+
+def test_exempt_authors_back_under_the_fanout_limit_are_pushed_again(client, app, fanout_limit, caplog):
+    fanout_limit(1)
+    celebrity_id, first_id, second_id, third_id = _users(app, "celebrity", "first", "second", "third")
+    for follower_id in (first_id, second_id, third_id):
+        _follow(app, follower_id, celebrity_id)
+    _login(client, celebrity_id)
+
+    client.post("/tweet", data={"content": "While famous"})
+    with app.app_context():
+        assert db.session.get(FanoutExemptAuthor, celebrity_id).follower_count == 3
+        Follows.query.filter_by(follower_id=third_id).delete()
+        db.session.commit()
+    client.post("/tweet", data={"content": "Still famous"})
+    with app.app_context():
+        assert db.session.get(FanoutExemptAuthor, celebrity_id).follower_count == 2
+        Follows.query.filter_by(follower_id=second_id).delete()
+        db.session.commit()
+
+    with caplog.at_level("INFO", logger="twitclone.timeline"):
+        client.post("/tweet", data={"content": "Back to normal"})
+
+    with app.app_context():
+        tweet_ids = [tweet.id for tweet in Tweet.query.order_by(Tweet.id.desc())]
+        assert db.session.get(FanoutExemptAuthor, celebrity_id) is None
+        assert HomeTimelineEntry.query.filter_by(user_id=first_id).count() == 3
+    assert [source_id for _type, source_id in _home_sources(app, first_id)] == tweet_ids
+    assert [record.follower_count for record in caplog.records if record.msg == "home_timeline_author_unexempted"] == [1]
+
+
+def test_home_pages_merge_entries_and_exempt_authors_without_gaps(app, fanout_limit):
+    fanout_limit(0)
+    reader_id, celebrity_id, friend_id = _users(app, "reader", "celebrity", "friend")
+    _follow(app, reader_id, celebrity_id)
+    _follow(app, reader_id, friend_id)
+    with app.app_context():
+        base = _now() - timedelta(hours=1)
+        db.session.add(FanoutExemptAuthor(user_id=celebrity_id, follower_count=1))
+        celebrity_posts = [Tweet(content=f"Celebrity {index}", user_id=celebrity_id, timestamp=base + timedelta(minutes=2 * index)) for index in range(5)]
+        friend_posts = [Tweet(content=f"Friend {index}", user_id=friend_id, timestamp=base + timedelta(minutes=2 * index + 1)) for index in range(5)]
+        db.session.add_all(celebrity_posts + friend_posts)
+        db.session.flush()
+        db.session.add_all([HomeTimelineEntry(user_id=reader_id, post_type="tweet", source_id=tweet.id, author_id=friend_id, timestamp=tweet.timestamp, priority=0) for tweet in friend_posts])
+        db.session.commit()
+        expected = [tweet.id for tweet in sorted(celebrity_posts + friend_posts, key=lambda tweet: tweet.timestamp, reverse=True)]
+
+        reader = db.session.get(User, reader_id)
+        seen, before = [], None
+        while True:
+            page = build_home_timeline_page(reader, now=_now(), before=before, per_page=3)
+            seen.extend(post["source_id"] for post in page.items)
+            if not page.has_next:
+                break
+            before = page.next_cursor
+
+    assert seen == expected
+
+
+def test_home_route_renders_followed_posts_and_requires_login(client, app):
+    author_id, reader_id, stranger_id = _users(app, "author", "reader", "stranger")
+    _follow(app, reader_id, author_id)
+    with app.app_context():
+        db.session.add_all([Tweet(content="Followed voice", user_id=author_id), Tweet(content="Unfollowed voice", user_id=stranger_id)])
+        db.session.commit()
+
+    assert client.get("/home").headers["Location"].startswith("/login?")
+
+    _login(client, reader_id)
+    client.post("/unfollow/author")
+    client.post("/follow/author")
+    response = client.get("/home")
+    invalid_cursor = client.get("/home?before=" + TimelineCursor(_now(), 9, 1).encode()[:-2])
+
+    assert response.status_code == 200
+    assert b"Followed voice" in response.data
+    assert b"Unfollowed voice" not in response.data
+    assert invalid_cursor.status_code == 200
+
+
+@pytest.fixture()
+def recent_posts_cache(app):
+    from twitclone.timeline.home import RecentAuthorPosts
+
+    cache = app.extensions["home_timeline_recent_posts"] = RecentAuthorPosts(per_author=3, ttl_seconds=60)
+    yield cache
+    app.extensions.pop("home_timeline_recent_posts")
+
+
+def test_recent_author_posts_expire_and_evict_least_recently_read():
+    from twitclone.timeline.home import RecentAuthorPosts
+
+    now = [0.0]
+    cache = RecentAuthorPosts(per_author=2, ttl_seconds=10, max_authors=2, clock=lambda: now[0])
+    cache.put(1, ["a"]); cache.put(2, ["b"])
+    assert cache.get(1) == ("a",)
+    cache.put(3, ["c"])
+    assert (cache.get(1), cache.get(2), cache.get(3)) == (("a",), None, ("c",))
+
+    now[0] = 10.0
+    assert cache.get(1) is None
+
+    disabled = RecentAuthorPosts(per_author=2, ttl_seconds=0)
+    disabled.put(1, ["a"])
+    assert disabled.get(1) is None
+
+
+def test_celebrity_merge_reads_recent_posts_from_the_cache(app, fanout_limit, recent_posts_cache, assert_max_queries, caplog):
+    fanout_limit(0)
+    reader_id, celebrity_id = _users(app, "reader", "celebrity")
+    _follow(app, reader_id, celebrity_id)
+    with app.app_context():
+        base = _now() - timedelta(hours=1)
+        db.session.add(FanoutExemptAuthor(user_id=celebrity_id, follower_count=1))
+        tweets = [Tweet(content=f"Celebrity {index}", user_id=celebrity_id, timestamp=base + timedelta(minutes=index)) for index in range(5)]
+        db.session.add_all(tweets)
+        db.session.commit()
+        newest = [tweet.id for tweet in reversed(tweets)]
+
+        with caplog.at_level("INFO", logger="twitclone.timeline"):
+            first = fetch_home_timeline_rows(reader_id, now=_now(), limit=2)
+            with assert_max_queries(2):
+                second = fetch_home_timeline_rows(reader_id, now=_now(), limit=2)
+            deep = fetch_home_timeline_rows(reader_id, now=_now(), before=TimelineCursor.for_row(second[-1]), limit=4)
+
+    assert [row.source_id for row in first] == [row.source_id for row in second] == newest[:2]
+    assert [row.source_id for row in deep] == newest[2:]
+    merges = [record for record in caplog.records if record.event == "home_timeline_merge"]
+    assert [(record.cache_hits, record.cache_misses) for record in merges] == [(0, 1), (1, 0), (1, 0)]
+
+
+def test_celebrity_posts_invalidate_their_cached_recent_posts(client, app, fanout_limit, recent_posts_cache, caplog):
+    fanout_limit(0)
+    celebrity_id, reader_id = _users(app, "celebrity", "reader")
+    _follow(app, reader_id, celebrity_id)
+    _login(client, celebrity_id)
+    client.post("/tweet", data={"content": "First"})
+    assert len(_home_sources(app, reader_id)) == 1
+
+    with caplog.at_level("INFO", logger="twitclone.timeline"):
+        client.post("/tweet", data={"content": "Second"})
+
+    assert len(_home_sources(app, reader_id)) == 2
+    fanout = [record for record in caplog.records if record.event == "home_timeline_fanout"][-1]
+    assert (fanout.fanout_strategy, fanout.follower_count, fanout.recipient_count) == ("pull", 1, 1)
+
+
+def test_push_mode_fans_out_to_every_follower(client, app, fanout_limit):
+    fanout_limit(0)
+    app.config["HOME_TIMELINE_FANOUT_MODE"] = "push"
+    try:
+        author_id, follower_id = _users(app, "author", "follower")
+        _follow(app, follower_id, author_id)
+        _login(client, author_id)
+        client.post("/tweet", data={"content": "Everyone gets this"})
+
+        with app.app_context():
+            assert FanoutExemptAuthor.query.count() == 0
+            assert HomeTimelineEntry.query.filter_by(user_id=follower_id).count() == 1
+    finally:
+        app.config["HOME_TIMELINE_FANOUT_MODE"] = "hybrid"
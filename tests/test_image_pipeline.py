@@ -0,0 +1,144 @@
+"""Process-pool image pipeline and asynchronous thumbnails."""
+
+from concurrent.futures import Future
+from io import BytesIO
+from pathlib import Path
+import time
+
+from PIL import Image
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from twitclone.extensions import db
+from twitclone.image_pipeline import ImagePipeline, ImagePipelineBusy, ImagePipelineTimeout
+from twitclone.models import MediaRendition, Tweet, User
+from twitclone.timeline.media import PIPELINE_TIMEOUT_MESSAGE, THUMBNAIL_PLACEHOLDER, store_image_upload
+from twitclone.utils.images import resize_image
+
+
+def png_bytes(size=(400, 300)):
+    payload = BytesIO()
+    Image.new("RGB", size, "blue").save(payload, format="PNG")
+    return payload.getvalue()
+
+
+class DeferredPipeline:
+    """Holds submitted jobs until the test runs them."""
+
+    def __init__(self): self.jobs = []
+
+    def submit(self, job, *args):
+        future = Future()
+        self.jobs.append((future, job, args))
+        return future
+
+    def finish(self):
+        for future, job, args in self.jobs:
+            future.set_result(job(*args))
+
+    def fail(self):
+        for future, _job, _args in self.jobs:
+            future.set_exception(OSError("worker died"))
+
+
+class StalledPipeline:
+    """Gives up on every job while its worker is still running."""
+
+    def __init__(self): self.future = Future()
+
+    def run(self, job, *args):
+        raise ImagePipelineTimeout("Image processing timed out", self.future)
+
+
+def log_in(client, app):
+    with app.app_context():
+        user = User(username="alice", email="alice@example.com", password="hash")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+
+def test_pool_resizes_in_worker_processes_within_its_bounds(tmp_path):
+    original = tmp_path / "original.png"
+    original.write_bytes(png_bytes())
+    pipeline = ImagePipeline(workers=1, max_pending=1, timeout_seconds=30)
+    try:
+        pipeline.run(resize_image, original, tmp_path / "thumb.png")
+        with Image.open(tmp_path / "thumb.png") as thumbnail:
+            assert thumbnail.size == (200, 150)
+
+        running = pipeline.submit(time.sleep, 0.5)
+        with pytest.raises(ImagePipelineBusy):
+            pipeline.submit(time.sleep, 0)
+        running.result(timeout=30)
+        pipeline.timeout_seconds = 0.05
+        with pytest.raises(ImagePipelineTimeout):
+            pipeline.run(time.sleep, 1)
+    finally:
+        pipeline.shutdown()
+
+
+def test_inline_pipeline_reports_job_errors_and_frees_its_slot():
+    pipeline = ImagePipeline(workers=0, max_pending=1, timeout_seconds=1)
+
+    with pytest.raises(FileNotFoundError):
+        pipeline.run(resize_image, Path("missing.png"), Path("thumb.png"))
+
+    assert pipeline.run(len, "free") == 4
+
+
+def test_timed_out_render_keeps_its_folder_until_the_worker_stops(app, tmp_path, monkeypatch):
+    folder = tmp_path / "render"
+    folder.mkdir()
+    monkeypatch.setattr("twitclone.timeline.media.mkdtemp", lambda: str(folder))
+    pipeline = StalledPipeline()
+    upload = FileStorage(BytesIO(png_bytes()), filename="photo.png", content_type="image/png")
+
+    with app.app_context():
+        assert store_image_upload(upload, tmp_path / "media", pipeline=pipeline) == (PIPELINE_TIMEOUT_MESSAGE, None, None)
+
+    assert folder.exists()
+    pipeline.future.set_result(())
+    assert not folder.exists()
+
+
+def test_async_thumbnail_serves_a_placeholder_until_it_is_stored(client, app, monkeypatch):
+    pipeline = DeferredPipeline()
+    monkeypatch.setitem(app.extensions, "image_pipeline", pipeline)
+    monkeypatch.setitem(app.config, "IMAGE_THUMBNAIL_ASYNC", True)
+    log_in(client, app)
+
+    client.post("/tweet", data={"content": "photo", "image": (BytesIO(png_bytes()), "photo.png", "image/png")})
+    with app.app_context():
+        thumbnail = Tweet.query.one().image
+
+    pending = client.get(f"/uploads/{thumbnail}")
+    assert (pending.status_code, pending.mimetype, pending.data) == (200, "image/gif", THUMBNAIL_PLACEHOLDER)
+    assert "no-store" in pending.headers["Cache-Control"]
+
+    pipeline.finish()
+    ready = client.get(f"/uploads/{thumbnail}")
+    assert (ready.status_code, ready.mimetype) == (200, "image/png")
+    with app.app_context():
+        assert MediaRendition.query.filter_by(width=320, format="webp").count() == 1
+    assert client.get("/uploads/banner_missing.png").status_code == 404
+
+
+def test_failed_async_thumbnail_falls_back_to_the_original(client, app, monkeypatch):
+    pipeline = DeferredPipeline()
+    monkeypatch.setitem(app.extensions, "image_pipeline", pipeline)
+    monkeypatch.setitem(app.config, "IMAGE_THUMBNAIL_ASYNC", True)
+    log_in(client, app)
+    original = png_bytes()
+
+    client.post("/tweet", data={"content": "photo", "image": (BytesIO(original), "photo.png", "image/png")})
+    with app.app_context():
+        thumbnail = Tweet.query.one().image
+    pipeline.fail()
+
+    served = client.get(f"/uploads/{thumbnail}")
+    assert (served.status_code, served.mimetype, served.data) == (200, "image/png", original)
+    assert "no-store" not in served.headers["Cache-Control"]
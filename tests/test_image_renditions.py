@@ -0,0 +1,81 @@
+"""Responsive image renditions and their srcset markup."""
+
+from io import BytesIO
+import re
+
+from PIL import Image
+
+from twitclone.extensions import db
+from twitclone.models import MediaRendition, Tweet, User
+
+
+def png_bytes(size):
+    payload = BytesIO()
+    Image.new("RGB", size, "green").save(payload, format="PNG")
+    return payload.getvalue()
+
+
+def log_in(client, app):
+    with app.app_context():
+        user = User(username="alice", email="alice@example.com", password="hash")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+
+def post_image(client, size):
+    return client.post("/tweet", data={"content": "photo", "image": (BytesIO(png_bytes(size)), "photo.png", "image/png")})
+
+
+def test_upload_records_and_serves_each_width_and_format(client, app, monkeypatch):
+    monkeypatch.setitem(app.config, "IMAGE_RENDITION_WIDTHS", (320, 640, 1080))
+    monkeypatch.setitem(app.config, "IMAGE_RENDITION_FORMATS", ("avif", "webp"))
+    log_in(client, app)
+
+    post_image(client, (800, 400))
+
+    with app.app_context():
+        tweet = Tweet.query.one()
+        renditions = MediaRendition.query.order_by(MediaRendition.format, MediaRendition.width).all()
+        stem = tweet.original_image.removeprefix("original_").removesuffix(".png")
+        assert {rendition.source for rendition in renditions} == {tweet.original_image}
+        assert [(rendition.format, rendition.width, rendition.height) for rendition in renditions] == [
+            ("avif", 320, 160), ("avif", 640, 320), ("avif", 800, 400),
+            ("webp", 320, 160), ("webp", 640, 320), ("webp", 800, 400),
+        ]
+        assert renditions[0].name == f"rend_{stem}_320w.avif"
+        names = [(rendition.name, rendition.size_bytes) for rendition in renditions]
+    for name, size in names:
+        served = client.get(f"/uploads/{name}")
+        assert served.status_code == 200 and len(served.data) == size
+        assert served.mimetype == f"image/{name.rsplit('.', 1)[1]}"
+    assert client.get(f"/uploads/{tweet.original_image}").status_code == 404
+
+
+def test_timeline_and_detail_offer_renditions_through_srcset(client, app, monkeypatch, assert_max_queries):
+    monkeypatch.setitem(app.config, "IMAGE_RENDITION_WIDTHS", (320, 640))
+    monkeypatch.setitem(app.config, "IMAGE_RENDITION_FORMATS", ("webp", "avif"))
+    log_in(client, app)
+    for _ in range(3):
+        post_image(client, (700, 700))
+    post_image(client, (100, 100))
+    monkeypatch.setitem(app.config, "IMAGE_RENDITION_FORMATS", ())
+    post_image(client, (700, 700))
+    with app.app_context():
+        tweet_id = Tweet.query.order_by(Tweet.id).first().id
+
+    with assert_max_queries(100) as statements:
+        page = client.get("/").get_data(as_text=True)
+    detail = client.get(f"/post/{tweet_id}").get_data(as_text=True)
+
+    assert sum("media_rendition" in statement for statement in statements) == 1
+    pictures = re.findall(r"<picture>(.*?)</picture>", page)
+    assert len(pictures) == 5
+    assert [re.findall(r'<source type="([^"]+)"', picture) for picture in pictures] == [[]] + [["image/avif", "image/webp"]] * 4
+    assert re.search(r'srcset="/uploads/rend_\w+_100w\.avif 100w"', pictures[1])
+    assert re.search(r'srcset="/uploads/rend_\w+_320w\.webp 320w, /uploads/rend_\w+_640w\.webp 640w"', pictures[4])
+    assert 'sizes="(max-width: 820px) 100vw, 540px"' in detail
+    assert re.search(r'<source type="image/avif" sizes="[^"]+" srcset="/uploads/rend_\w+_320w\.avif 320w, ', detail)
@@ -0,0 +1,97 @@
+"""Presigned-URL redirect delivery for S3 media, against a local S3 stand-in."""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+from urllib.parse import parse_qs, urlsplit
+from urllib.request import urlopen
+
+import boto3
+import pytest
+
+from twitclone.media_storage import S3MediaStorage
+
+
+class LocalS3(BaseHTTPRequestHandler):
+    """Path-style GetObject that serves stored objects only to presigned requests."""
+
+    objects = {}
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        content = self.objects.get(url.path.lstrip("/"))
+        if not {"X-Amz-Signature", "X-Amz-Expires"} <= query.keys():
+            self.send_response(403)
+            content = b""
+        elif content is None:
+            self.send_response(404)
+            content = b""
+        else:
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def local_s3():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), LocalS3)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    LocalS3.objects.clear()
+
+
+class Clock:
+    def __init__(self): self.now = 1000.0
+    def __call__(self): return self.now
+
+
+def _storage(endpoint, clock, **options):
+    client = boto3.client(
+        "s3",
+        region_name="nyc3",
+        endpoint_url=endpoint,
+        aws_access_key_id="test-access-key",
+        aws_secret_access_key="test-secret-key",
+    )
+    return S3MediaStorage(bucket="ripple-media", region="nyc3", prefix="media", client=client, clock=clock, **options)
+
+
+def test_redirect_mode_sends_browsers_to_a_cached_presigned_url(client, app, monkeypatch, local_s3):
+    LocalS3.objects["ripple-media/media/thumb_photo.png"] = b"\x89PNG-bytes"
+    clock = Clock()
+    storage = _storage(local_s3, clock, delivery="redirect", url_expires_seconds=900)
+    monkeypatch.setattr(storage, "open", lambda *args, **kwargs: pytest.fail("media bytes passed through the app"))
+    monkeypatch.setitem(app.extensions, "media_storage", storage)
+    signed = []
+    sign = storage.client.generate_presigned_url
+    monkeypatch.setattr(storage.client, "generate_presigned_url", lambda *args, **kwargs: signed.append(kwargs) or sign(*args, **kwargs))
+
+    first = client.get("/uploads/thumb_photo.png")
+    clock.now += 600
+    second = client.get("/uploads/thumb_photo.png")
+    clock.now += 200
+    renewed = client.get("/uploads/thumb_photo.png")
+
+    assert first.status_code == 302
+    assert first.headers["Location"].startswith(f"{local_s3}/ripple-media/media/thumb_photo.png?")
+    assert {"private", "max-age=720"} == set(first.headers["Cache-Control"].split(", "))
+    assert second.headers["Location"] == first.headers["Location"]
+    assert "max-age=120" in second.headers["Cache-Control"]
+    assert len(signed) == 2 and "max-age=720" in renewed.headers["Cache-Control"]
+    with urlopen(first.headers["Location"]) as response:
+        assert response.read() == b"\x89PNG-bytes"
+
+
+def test_proxy_mode_keeps_streaming_through_the_app(local_s3):
+    storage = _storage(local_s3, Clock())
+
+    assert storage.delivery_url("thumb_photo.png") is None
+    with pytest.raises(ValueError, match="safe path component"):
+        _storage(local_s3, Clock(), delivery="redirect").delivery_url("../secret")
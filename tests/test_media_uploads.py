@@ -12,7 +12,7 @@ from twitclone.extensions import db
 from twitclone.models import Tweet, User
 from twitclone.timeline.media import IMAGE_UPLOAD_MAX_BYTES
 from twitclone.timeline.media import store_image_upload
-from twitclone.media_storage import S3MediaStorage
+from twitclone.media_storage import MEDIA_STREAM_CHUNK_BYTES, CachingMediaStorage, MediaCacheStats, S3MediaStorage
 
 
 def log_in(client, app):
@@ -110,16 +110,39 @@ def test_processing_failure_cleans_up_partial_files(tmp_path, monkeypatch):
 
 
 class FakeBody:
-    def __init__(self, content): self.content = content
-    def read(self): return self.content
+    def __init__(self, content): self.stream, self.reads, self.closed = BytesIO(content), [], False
+    def read(self, amt=None):
+        self.reads.append(amt)
+        return self.stream.read(amt)
+    def close(self): self.closed = True
+
+
+class FakeClientError(Exception):
+    def __init__(self, code, headers=None):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}, "ResponseMetadata": {"HTTPHeaders": headers or {}}}
 
 
 class FakeS3Client:
-    def __init__(self): self.objects = {}
+    def __init__(self): self.objects, self.bodies = {}, []
     def put_object(self, **kwargs): self.objects[(kwargs["Bucket"], kwargs["Key"])] = (kwargs["Body"], kwargs["ContentType"])
     def get_object(self, **kwargs):
+        if (kwargs["Bucket"], kwargs["Key"]) not in self.objects:
+            raise FakeClientError("NoSuchKey")
         content, content_type = self.objects[(kwargs["Bucket"], kwargs["Key"])]
-        return {"Body": FakeBody(content), "ContentType": content_type}
+        etag = f'"{len(content)}"'
+        if kwargs.get("IfNoneMatch") == etag:
+            raise FakeClientError("304", {"etag": etag})
+        response = {"ContentType": content_type, "ContentLength": len(content), "ETag": etag}
+        if "Range" in kwargs:
+            start, end = (int(value) for value in kwargs["Range"].removeprefix("bytes=").split("-"))
+            if start >= len(content):
+                raise FakeClientError("InvalidRange")
+            end = min(end, len(content) - 1)
+            response.update(ContentLength=end - start + 1, ContentRange=f"bytes {start}-{end}/{len(content)}")
+            content = content[start:end + 1]
+        self.bodies.append(FakeBody(content))
+        return {**response, "Body": self.bodies[-1]}
     def delete_object(self, **kwargs): self.objects.pop((kwargs["Bucket"], kwargs["Key"]), None)
 
 
@@ -140,3 +163,87 @@ def test_s3_adapter_rejects_unsafe_object_names(name):
     storage = S3MediaStorage(bucket="ripple-media", region="nyc3", client=FakeS3Client())
     with pytest.raises(ValueError, match="safe path component"):
         storage.put(name, b"content")
+
+
+def test_filesystem_media_is_sent_from_disk_with_ranges_and_etags(client, app, monkeypatch):
+    with app.app_context():
+        storage = app.extensions["media_storage"]
+        storage.put("thumb_stream.png", png_bytes())
+    monkeypatch.setattr(storage, "get", lambda name: pytest.fail("media was read into memory"))
+
+    full = client.get("/uploads/thumb_stream.png")
+    part = client.get("/uploads/thumb_stream.png", headers={"Range": "bytes=0-3"})
+    cached = client.get("/uploads/thumb_stream.png", headers={"If-None-Match": full.headers["ETag"]})
+
+    assert (full.status_code, full.data) == (200, png_bytes())
+    assert full.headers["Accept-Ranges"] == "bytes"
+    assert (part.status_code, part.data) == (206, b"\x89PNG")
+    assert cached.status_code == 304
+
+
+def test_s3_media_streams_the_body_in_bounded_chunks(client, app, monkeypatch):
+    s3 = FakeS3Client()
+    storage = S3MediaStorage(bucket="ripple-media", region="nyc3", client=s3)
+    storage.put("thumb_large.png", b"x" * (MEDIA_STREAM_CHUNK_BYTES * 2 + 10), content_type="image/png")
+    monkeypatch.setitem(app.extensions, "media_storage", storage)
+
+    full = client.get("/uploads/thumb_large.png")
+
+    assert full.status_code == 200
+    assert len(full.data) == int(full.headers["Content-Length"]) == MEDIA_STREAM_CHUNK_BYTES * 2 + 10
+    full.close()
+    assert set(s3.bodies[-1].reads) == {MEDIA_STREAM_CHUNK_BYTES} and s3.bodies[-1].closed
+    assert "max-age=31536000" in full.headers["Cache-Control"]
+
+    part = client.get("/uploads/thumb_large.png", headers={"Range": "bytes=10-19"})
+    assert (part.status_code, part.data) == (206, b"x" * 10)
+    assert part.headers["Content-Range"] == f"bytes 10-19/{MEDIA_STREAM_CHUNK_BYTES * 2 + 10}"
+
+    cached = client.get("/uploads/thumb_large.png", headers={"If-None-Match": full.headers["ETag"]})
+    assert (cached.status_code, cached.headers["ETag"]) == (304, full.headers["ETag"])
+    assert client.get("/uploads/thumb_large.png", headers={"Range": "bytes=999999-1000000"}).status_code == 416
+    assert client.get("/uploads/thumb_missing.png").status_code == 404
+
+
+def test_media_cache_evicts_least_recently_served_objects_by_size(tmp_path):
+    s3 = FakeS3Client()
+    inner = S3MediaStorage(bucket="ripple-media", region="nyc3", client=s3)
+    for name in ("thumb_a.png", "thumb_b.png", "thumb_c.png"):
+        inner.put(name, b"x" * 40, content_type="image/png")
+    storage = CachingMediaStorage(inner, tmp_path, max_bytes=100, max_object_bytes=50)
+
+    assert storage.open("thumb_a.png").path == tmp_path / "thumb_a.png"
+    storage.open("thumb_b.png")
+    assert storage.open("thumb_a.png").path.read_bytes() == b"x" * 40
+    storage.open("thumb_c.png")
+
+    assert len(s3.bodies) == 3
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["thumb_a.png", "thumb_c.png"]
+    assert storage.stats() == MediaCacheStats(hits=1, misses=3, evictions=1, entries=2, size=80)
+
+    storage.put("thumb_big.png", b"y" * 60, content_type="image/png")
+    storage.delete("thumb_a.png")
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["thumb_c.png"]
+    assert ("ripple-media", "media/thumb_a.png") not in s3.objects
+
+    restarted = CachingMediaStorage(inner, tmp_path, max_bytes=100)
+    assert restarted.get("thumb_c.png").content == b"x" * 40
+    assert len(s3.bodies) == 3 and restarted.stats().hits == 1
+
+
+def test_cached_s3_media_is_served_from_local_disk(client, app, monkeypatch, tmp_path):
+    s3 = FakeS3Client()
+    storage = CachingMediaStorage(S3MediaStorage(bucket="ripple-media", region="nyc3", client=s3), tmp_path, max_bytes=1024 * 1024)
+    storage.inner.put("thumb_hot.png", png_bytes(), content_type="image/png")
+    monkeypatch.setitem(app.extensions, "media_storage", storage)
+
+    revalidated = client.get("/uploads/thumb_hot.png", headers={"If-None-Match": f'"{len(png_bytes())}"'})
+    first = client.get("/uploads/thumb_hot.png")
+    second = client.get("/uploads/thumb_hot.png")
+    part = client.get("/uploads/thumb_hot.png", headers={"Range": "bytes=0-3"})
+
+    assert revalidated.status_code == 304
+    assert (first.data, second.data, part.status_code, part.data) == (png_bytes(), png_bytes(), 206, b"\x89PNG")
+    assert client.get("/uploads/thumb_hot.png", headers={"If-None-Match": second.headers["ETag"]}).status_code == 304
+    assert len(s3.bodies) == 1 and s3.bodies[0].closed
+    assert storage.stats().hits == 3
@@ -90,7 +90,7 @@ def test_unrelated_user_cannot_delete_message(client, app):
         assert db.session.get(DirectMessage, message_id) is not None
 
 
-def test_sent_messages_are_collapsed_by_default_and_have_delete_control(client, app):
+def test_sent_messages_appear_in_their_conversation_with_delete_control(client, app):
     alice_id, bob_id, _ = _users(app)
     with app.app_context():
         message = DirectMessage(
@@ -101,13 +101,15 @@ def test_sent_messages_are_collapsed_by_default_and_have_delete_control(client,
         db.session.add(message)
         db.session.commit()
         message_id = message.id
+        conversation_id = message.conversation_id
 
     _login(client, alice_id)
-    response = client.get("/messages")
+    inbox = client.get("/messages")
+    response = client.get(f"/messages/{conversation_id}")
 
+    assert f'href="/messages/{conversation_id}"'.encode() in inbox.data
     assert response.status_code == 200
-    assert b'data-bs-target="#sentMessages"' in response.data
-    assert b'class="collapse mt-3" id="sentMessages"' in response.data
+    assert b"sent message" in response.data
     assert f'/messages/{message_id}/delete'.encode() in response.data
 
 
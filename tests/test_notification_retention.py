@@ -0,0 +1,75 @@
+"""Batched retention of read notifications."""
+
+import logging
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from twitclone.extensions import db
+from twitclone.models import Notification, NotificationArchive, User
+from twitclone.notifications.retention import prune_notifications
+
+
+def _now():
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+@pytest.fixture()
+def inbox(app):
+    """Three expired read notifications, plus an old unread one and a recent read one."""
+    now = _now()
+    with app.app_context():
+        user = User(username="alice", email="alice@example.com", password="hash")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all(
+            [Notification(user_id=user.id, message=f"old {index}", read=True, timestamp=now - timedelta(days=100 + index)) for index in range(3)]
+            + [
+                Notification(user_id=user.id, message="old unread", timestamp=now - timedelta(days=200)),
+                Notification(user_id=user.id, message="recent", read=True, timestamp=now - timedelta(days=1)),
+            ]
+        )
+        db.session.commit()
+    return now
+
+
+def _messages():
+    return sorted(notification.message for notification in Notification.query)
+
+
+def test_expired_read_notifications_are_deleted_in_batches(app, inbox, caplog):
+    with app.app_context(), caplog.at_level(logging.INFO, logger="twitclone.notifications"):
+        result = prune_notifications(now=inbox, batch_size=2)
+
+        assert (result.pruned, result.batches) == (3, 2)
+        assert _messages() == ["old unread", "recent"]
+        assert NotificationArchive.query.count() == 0
+    record = next(record for record in caplog.records if record.msg == "notifications_pruned")
+    assert (record.pruned_count, record.retention_mode) == (3, "delete")
+
+
+def test_archive_mode_copies_rows_before_removing_them(app, inbox, monkeypatch):
+    monkeypatch.setitem(app.config, "NOTIFICATION_RETENTION_MODE", "archive")
+    with app.app_context():
+        prune_notifications(now=inbox)
+
+        assert _messages() == ["old unread", "recent"]
+        archived = NotificationArchive.query.order_by(NotificationArchive.timestamp.desc()).all()
+        assert [row.message for row in archived] == ["old 0", "old 1", "old 2"]
+        assert archived[0].archived_at == inbox
+
+
+def test_cli_dry_run_reports_without_pruning(app, inbox, monkeypatch):
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=["prune-notifications", "--dry-run"])
+
+    assert result.exit_code == 0
+    assert "3 read notifications older than" in result.output and "would be deleted" in result.output
+    with app.app_context():
+        assert Notification.query.count() == 5
+
+    monkeypatch.setitem(app.config, "NOTIFICATION_RETENTION_DAYS", 0)
+    assert "disabled" in runner.invoke(args=["prune-notifications"]).output
+    with app.app_context():
+        assert Notification.query.count() == 5
@@ -5,8 +5,9 @@ from datetime import UTC, datetime, timedelta
 from flask import url_for
 
 from twitclone.extensions import db
-from twitclone.models import Notification, User
+from twitclone.models import Notification, Tweet, User
 from twitclone.notifications.routes import notifications
+from twitclone.notifications.service import activity_message, notify_activity
 
 
 def create_logged_in_user(client, app):
@@ -123,3 +124,129 @@ def test_notifications_still_require_login(client):
 
     assert response.status_code == 302
     assert response.headers["Location"].startswith("/login?")
+
+
+def _add_notifications(app, user_id, count, *, start):
+    with app.app_context():
+        db.session.add_all(
+            [
+                Notification(user_id=user_id, message=f"notification {index}", timestamp=start + timedelta(minutes=index))
+                for index in range(count)
+            ]
+        )
+        db.session.commit()
+
+
+def test_inbox_pages_by_cursor_and_marks_only_displayed_rows_read(client, app):
+    user_id, _other_id = create_logged_in_user(client, app)
+    _add_notifications(app, user_id, 25, start=datetime(2026, 10, 1))
+
+    first = client.get("/notifications")
+
+    html = first.get_data(as_text=True)
+    assert "notification 24" in html and "notification 5" in html and "notification 4<" not in html
+    assert html.count(">New</span>") == 20
+    with app.app_context():
+        assert Notification.query.filter_by(user_id=user_id, read=False).count() == 5
+    older_link = html.split('id="older-notifications" href="')[1].split('"')[0].replace("&amp;", "&")
+
+    second = client.get(older_link)
+
+    assert "notification 4<" in second.get_data(as_text=True)
+    assert 'id="older-notifications"' not in second.get_data(as_text=True)
+    with app.app_context():
+        assert Notification.query.filter_by(user_id=user_id, read=False).count() == 0
+
+
+def test_feed_returns_json_pages_that_break_timestamp_ties_by_id(client, app):
+    user_id, _other_id = create_logged_in_user(client, app)
+    tied = datetime(2026, 10, 1)
+    with app.app_context():
+        db.session.add_all([Notification(user_id=user_id, message=f"tied {index}", timestamp=tied) for index in range(25)])
+        db.session.commit()
+
+    first = client.get("/notifications/feed").get_json()
+    second = client.get(f"/notifications/feed?before={first['next_cursor']}").get_json()
+
+    assert first["status"] == "success" and len(first["notifications"]) == 20
+    assert all(item["unread"] for item in first["notifications"])
+    assert second["next_cursor"] is None
+    ids = [item["id"] for item in first["notifications"] + second["notifications"]]
+    assert ids == sorted(ids, reverse=True) and len(set(ids)) == 25
+    assert client.get("/notifications/feed?before=not-a-cursor").status_code == 400
+
+
+def _users(app, *usernames):
+    with app.app_context():
+        users = [User(username=username, email=f"{username}@example.com", password="hash") for username in usernames]
+        db.session.add_all(users)
+        db.session.commit()
+        return [user.id for user in users]
+
+
+def test_activity_on_one_post_coalesces_into_a_single_notification(app):
+    owner_id, *actor_ids = _users(app, "owner", "alice", "bob", "carol", "dave")
+    now = datetime.now(UTC).replace(tzinfo=None)
+    with app.app_context():
+        tweet = Tweet(content="Road trip", user_id=owner_id)
+        db.session.add(tweet)
+        db.session.commit()
+        for offset, actor_id in enumerate([*actor_ids, actor_ids[1]]):
+            notify_activity(owner_id, "repost", db.session.get(User, actor_id), tweet_id=tweet.id, now=now + timedelta(minutes=offset))
+            db.session.commit()
+
+        notification = Notification.query.filter_by(user_id=owner_id).one()
+        assert notification.actor_count == 4
+        assert notification.actor_ids == [actor_ids[1], actor_ids[3], actor_ids[2]]
+        assert notification.message == "bob and 3 others reposted your post"
+        assert notification.timestamp == now + timedelta(minutes=4)
+
+
+
+def test_repeat_actor_outside_the_sample_is_counted_once(app):
+    owner_id, *actor_ids = _users(app, "owner", "a", "b", "c", "d")
+    now = datetime.now(UTC).replace(tzinfo=None)
+    with app.app_context():
+        for offset, actor_id in enumerate([*actor_ids, actor_ids[0]]):
+            notify_activity(owner_id, "follow", db.session.get(User, actor_id), now=now + timedelta(minutes=offset))
+            db.session.commit()
+
+        notification = Notification.query.filter_by(user_id=owner_id).one()
+        assert notification.actor_count == 4
+        assert notification.actor_ids == [actor_ids[0], actor_ids[3], actor_ids[2]]
+        assert notification.message == "a and 3 others followed you"
+        assert sorted(actor.actor_id for actor in notification.actors) == sorted(actor_ids)
+
+def test_read_stale_or_unrelated_activity_starts_a_new_notification(app, monkeypatch):
+    owner_id, alice_id, bob_id = _users(app, "owner", "alice", "bob")
+    now = datetime.now(UTC).replace(tzinfo=None)
+    with app.app_context():
+        alice, bob = db.session.get(User, alice_id), db.session.get(User, bob_id)
+        read = notify_activity(owner_id, "follow", alice, now=now)
+        db.session.commit()
+        read.read = True
+        db.session.commit()
+        notify_activity(owner_id, "follow", bob, now=now)
+        notify_activity(owner_id, "unfollow", alice, now=now)
+        db.session.commit()
+        notify_activity(owner_id, "follow", alice, now=now + timedelta(minutes=61))
+        db.session.commit()
+
+        assert sorted(n.message for n in Notification.query.filter_by(user_id=owner_id)) == [
+            "alice followed you",
+            "alice followed you",
+            "alice unfollowed you",
+            "bob followed you",
+        ]
+
+        monkeypatch.setitem(app.config, "NOTIFICATION_COALESCE_MINUTES", 0)
+        notify_activity(owner_id, "unfollow", bob, now=now)
+        db.session.commit()
+        assert Notification.query.filter_by(user_id=owner_id, kind="unfollow").count() == 2
+
+
+def test_activity_messages_name_a_sample_of_actors():
+    assert activity_message("quote", ["alice"], 1) == "alice quoted your post"
+    assert activity_message("follow", ["bob", "alice"], 2) == "bob and alice followed you"
+    assert activity_message("mention", ["bob", "alice"], 3) == "bob and 2 others mentioned you in a post"
+    assert activity_message("repost", ["bob"], 2) == "bob and 1 other reposted your post"
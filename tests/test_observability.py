@@ -73,3 +73,15 @@ def test_json_formatter_includes_structured_worker_fields():
     assert payload["level"] == "INFO"
     assert payload["event"] == "scheduled_tweets_published"
     assert payload["published_count"] == 2
+
+
+def test_json_formatter_includes_home_timeline_fanout_fields():
+    record = logging.LogRecord("twitclone.timeline", logging.INFO, __file__, 1, "fanout", (), None)
+    record.event = "home_timeline_fanout"
+    record.fanout_strategy = "pull"
+    record.follower_count = 20000
+    record.recipient_count = 1
+
+    payload = json.loads(JsonFormatter().format(record))
+
+    assert (payload["fanout_strategy"], payload["follower_count"], payload["recipient_count"]) == ("pull", 20000, 1)
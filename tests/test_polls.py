@@ -9,6 +9,7 @@ from sqlalchemy.exc import IntegrityError
 from twitclone.extensions import db
 from twitclone.models import Poll, PollOption, PollVote, User
 from twitclone.polls.routes import create_poll, vote_poll
+from twitclone.timeline.service import TIMELINE_PAGE_SIZE
 
 
 def _utcnow_naive():
@@ -197,3 +198,73 @@ def test_expired_poll_renders_results_without_vote_form(client, app):
     assert b"Poll Results:" in response.data
     assert b"Result option - 3 votes" in response.data
     assert f'/vote_poll/{poll_id}'.encode() not in response.data
+
+
+def test_viewer_poll_votes_returns_only_the_viewers_votes_in_one_query(app, assert_max_queries):
+    from flask_login import AnonymousUserMixin
+
+    from twitclone.polls.service import viewer_poll_votes
+
+    with app.app_context():
+        voter = User(username="voter", email="voter@example.com", password="hash")
+        other = User(username="other", email="other@example.com", password="hash")
+        db.session.add_all([voter, other])
+        db.session.commit()
+        polls = [Poll(question=f"Q{index}", duration_days=1, duration_hours=0, duration_minutes=0, user_id=other.id) for index in range(3)]
+        db.session.add_all(polls)
+        db.session.commit()
+        options = [PollOption(option_text="A", poll_id=poll.id) for poll in polls]
+        db.session.add_all(options)
+        db.session.commit()
+        db.session.add_all([
+            PollVote(poll_id=polls[0].id, user_id=voter.id, option_id=options[0].id),
+            PollVote(poll_id=polls[1].id, user_id=other.id, option_id=options[1].id),
+            PollVote(poll_id=polls[2].id, user_id=voter.id, option_id=options[2].id),
+        ])
+        db.session.commit()
+        poll_ids = [poll.id for poll in polls]
+        option_ids = [option.id for option in options]
+        db.session.refresh(voter)  # Reload the committed viewer outside the counted block.
+
+        with assert_max_queries(1):
+            votes = viewer_poll_votes(voter, poll_ids[:2])
+        with assert_max_queries(0):
+            assert viewer_poll_votes(AnonymousUserMixin(), poll_ids) == {}
+            assert viewer_poll_votes(voter, []) == {}
+
+        assert votes == {poll_ids[0]: option_ids[0]}
+
+
+def test_authenticated_timeline_poll_votes_cost_one_query(client, app, assert_max_queries):
+    viewer_id = create_logged_in_user(client, app)
+    with app.app_context():
+        voted_ids = []
+        for count in range(2):
+            poll = Poll(question=f"Poll {count}", duration_days=1, duration_hours=0, duration_minutes=0, user_id=viewer_id)
+            db.session.add(poll)
+            db.session.commit()
+            option = PollOption(option_text="Yes", poll_id=poll.id)
+            db.session.add(option)
+            db.session.commit()
+            db.session.add(PollVote(poll_id=poll.id, user_id=viewer_id, option_id=option.id))
+            db.session.commit()
+            voted_ids.append(poll.id)
+    with assert_max_queries(40) as few_polls:
+        voted_page = client.get("/").data
+
+    assert voted_page.count(b"Poll Results:") == 2
+    assert not any(f"/vote_poll/{poll_id}".encode() in voted_page for poll_id in voted_ids)
+
+    with app.app_context():
+        later = [Poll(question=f"Later {count}", duration_days=1, duration_hours=0, duration_minutes=0, user_id=viewer_id) for count in range(25)]
+        db.session.add_all(later)
+        db.session.commit()
+        later_ids = [poll.id for poll in later]
+    with assert_max_queries(40) as many_polls:
+        response = client.get("/")
+
+    shown = [poll_id for poll_id in later_ids if f"/vote_poll/{poll_id}".encode() in response.data]
+    assert len(shown) == TIMELINE_PAGE_SIZE
+    assert b"Poll Results:" not in response.data
+    assert len(many_polls) == len(few_polls)
+    assert sum("FROM poll_vote" in statement for statement in many_polls) == 1
@@ -0,0 +1,176 @@
+"""Live timeline and unread-count updates over Server-Sent Events."""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+
+import pytest
+
+from twitclone.extensions import db
+from twitclone.models import User
+from twitclone.realtime.broker import InProcessBroker, RealtimeBrokerFull, Subscription, announce_unread_counts, build_realtime_broker, user_channel
+
+
+@pytest.fixture()
+def broker(app):
+    previous = app.extensions["realtime_broker"]
+    app.extensions["realtime_broker"] = InProcessBroker(max_pending=5)
+    app.config.update(REALTIME_STREAM_SECONDS=1, REALTIME_HEARTBEAT_SECONDS=1, REALTIME_MAX_CONNECTIONS=2)
+    yield app.extensions["realtime_broker"]
+    app.extensions["realtime_broker"] = previous
+
+
+def _create_user(app, username):
+    with app.app_context():
+        user = User(username=username, email=f"{username}@example.com", password="hash")
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def _login(client, user_id):
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+
+def _events(response):
+    """Parse the ``event``/``data`` frames of a finished stream."""
+    body = b"".join(response.response).decode("utf-8")
+    events = []
+    for frame in body.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in frame.splitlines() if line.startswith(("event: ", "data: ")))
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_broker_delivers_to_subscribed_channels_and_tracks_connections():
+    broker = InProcessBroker(max_pending=1)
+    first = broker.subscribe(["timeline", user_channel(1)])
+    second = broker.subscribe(["timeline"])
+    assert broker.connection_count == 2
+
+    assert broker.publish("timeline", "timeline", {"source_id": 1}) == 2
+    assert broker.publish(user_channel(1), "counts", {}) == 0
+    assert first.get(timeout=0)["data"] == {"source_id": 1}
+
+    second.close()
+    second.close()
+    assert broker.connection_count == 1
+    assert broker.publish("timeline", "timeline", {"source_id": 2}) == 1
+
+
+def test_broker_admits_at_most_max_connections_even_when_racing():
+    broker = InProcessBroker()
+
+    def attempt(_):
+        try:
+            return broker.subscribe(["timeline"], max_connections=3)
+        except RealtimeBrokerFull:
+            return None
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        admitted = [subscription for subscription in pool.map(attempt, range(32)) if subscription]
+
+    assert len(admitted) == broker.connection_count == 3
+    admitted[0].close()
+    broker.subscribe(["timeline"], max_connections=3)
+    with pytest.raises(RealtimeBrokerFull):
+        broker.subscribe(["timeline"], max_connections=3)
+
+
+def test_broker_factory_honours_setting():
+    config = {"REALTIME_BROKER": "none", "REALTIME_MAX_PENDING_EVENTS": 10}
+    assert build_realtime_broker(config) is None
+    assert build_realtime_broker({**config, "REALTIME_BROKER": "memory"}).max_pending == 10
+
+
+def test_events_publish_only_after_commit(app, broker):
+    subscription = broker.subscribe([user_channel(7)])
+    with app.app_context():
+        announce_unread_counts(7)
+        db.session.rollback()
+        assert subscription.get(timeout=0) is None
+
+        announce_unread_counts(7)
+        announce_unread_counts(7)
+        assert subscription.get(timeout=0) is None
+        db.session.commit()
+
+    assert subscription.get(timeout=0)["event"] == "counts"
+    assert subscription.get(timeout=0) is None
+
+
+def test_stream_sends_initial_counts_then_new_posts_and_mentions(client, app, broker, caplog):
+    reader_id = _create_user(app, "reader")
+    writer_id = _create_user(app, "writer")
+    _login(client, reader_id)
+    response = client.get("/stream", buffered=False)
+    assert response.mimetype == "text/event-stream"
+    assert broker.connection_count == 1
+
+    writer = app.test_client()
+    _login(writer, writer_id)
+    # A fresh app context keeps the open stream's logged-in user out of ``g``.
+    with app.app_context():
+        writer.post("/tweet", data={"content": "Hello @reader"})
+
+    with caplog.at_level(logging.INFO, logger="twitclone.realtime"):
+        initial, *updates = _events(response)
+    assert initial == ("counts", {"notifications": 0, "messages": 0})
+    delivered = [record for record in caplog.records if record.msg == "realtime_event_delivered"]
+    assert sorted(record.realtime_event for record in delivered) == ["counts", "timeline"]
+    assert all(0 <= record.latency_ms < 5000 for record in delivered)
+    updates = dict(updates)
+    assert updates.keys() == {"timeline", "counts"}
+    assert updates["timeline"]["type"] == "tweet" and updates["timeline"]["cursor"]
+    assert updates["counts"] == {"notifications": 1, "messages": 0}
+    assert broker.connection_count == 0
+
+
+def test_stream_rejects_connections_over_the_cap(client, app, broker):
+    _login(client, _create_user(app, "reader"))
+    app.config["REALTIME_MAX_CONNECTIONS"] = 1
+    broker.subscribe(["timeline"])
+
+    response = client.get("/stream")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "30"
+
+
+class PublishSubscribeBroker:
+    """A plug-in broker with only the documented ``publish`` and ``subscribe``."""
+
+    def __init__(self):
+        self.subscriptions = []
+
+    def publish(self, channel, name, data):
+        return 0
+
+    def subscribe(self, channels, *, max_connections):
+        subscription = Subscription(self, channels, max_pending=5)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscriptions.remove(subscription)
+
+
+def test_stream_works_with_a_broker_implementing_only_the_contract(client, app, broker):
+    _login(client, _create_user(app, "reader"))
+    custom = app.extensions["realtime_broker"] = PublishSubscribeBroker()
+
+    response = client.get("/stream", buffered=False)
+
+    assert _events(response) == [("counts", {"notifications": 0, "messages": 0})]
+    assert custom.subscriptions == []
+
+
+def test_stream_requires_login_and_an_enabled_broker(client, app, broker):
+    assert client.get("/stream").status_code == 302
+
+    _login(client, _create_user(app, "reader"))
+    app.extensions["realtime_broker"] = None
+    assert client.get("/stream").status_code == 404
@@ -0,0 +1,118 @@
+"""Full-text search index maintenance, ranking, and pagination."""
+
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import text
+
+from twitclone.extensions import db
+from twitclone.models import Quote, Tweet, User
+from twitclone.scheduling import publish_due_tweets
+from twitclone.search import search_posts, search_terms, search_users
+
+
+def _now():
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+def _author(app, username="author"):
+    with app.app_context():
+        user = User(username=username, email=f"{username}@example.com", password="hash")
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def _contents(page):
+    return [(hit.kind, hit.record.content) for hit in page.hits]
+
+
+def test_terms_drop_punctuation_so_queries_cannot_inject_syntax():
+    assert search_terms('#RV "trip" OR NEAR(x* ') == ["rv", "trip", "or", "near", "x"]
+    assert search_terms("!!!") == []
+
+
+def test_posts_and_quotes_match_every_word_as_a_prefix_ranked_by_relevance(app):
+    author_id = _author(app)
+    with app.app_context():
+        tweet = Tweet(content="Camping trip with the #rv", user_id=author_id)
+        db.session.add_all([tweet, Tweet(content="Trip report", user_id=author_id)])
+        db.session.flush()
+        db.session.add(Quote(content="Camp camp camp trip", user_id=author_id, tweet_id=tweet.id))
+        db.session.commit()
+
+        assert _contents(search_posts("camp TRIP")) == [("quote", "Camp camp camp trip"), ("tweet", "Camping trip with the #rv")]
+        assert _contents(search_posts("#rv")) == [("tweet", "Camping trip with the #rv")]
+        assert search_posts("").hits == []
+
+
+def test_index_follows_edits_scheduling_removal_and_renames(app):
+    author_id = _author(app)
+    with app.app_context():
+        scheduled = Tweet(content="Launch day", user_id=author_id, scheduled_at=_now() + timedelta(minutes=5))
+        removed = Tweet(content="Launch rumour", user_id=author_id)
+        db.session.add_all([scheduled, removed])
+        db.session.flush()
+        db.session.add(Quote(content="Launch rumour quoted", user_id=author_id, tweet_id=removed.id))
+        db.session.commit()
+        assert len(search_posts("launch").hits) == 2
+
+        removed.is_removed = True
+        db.session.commit()
+        assert search_posts("launch").hits == []
+
+        publish_due_tweets(now=_now() + timedelta(minutes=10))
+        assert _contents(search_posts("launch")) == [("tweet", "Launch day")]
+
+        user = db.session.get(User, author_id)
+        user.username = "renamed_writer"
+        db.session.commit()
+        assert [hit.record.username for hit in search_users("writer").hits] == ["renamed_writer"]
+        assert search_users("author").hits == []
+
+
+def test_results_are_paginated(app):
+    author_id = _author(app)
+    with app.app_context():
+        db.session.add_all([Tweet(content=f"Road note {index}", user_id=author_id) for index in range(3)])
+        db.session.commit()
+
+        first = search_posts("road", per_page=2)
+        second = search_posts("road", page=2, per_page=2)
+
+        assert (len(first.hits), first.has_next) == (2, True)
+        assert (len(second.hits), second.has_next) == (1, False)
+        assert {hit.record.id for hit in first.hits}.isdisjoint(hit.record.id for hit in second.hits)
+
+
+def test_backfill_command_rebuilds_the_index(app):
+    author_id = _author(app)
+    with app.app_context():
+        db.session.add(Tweet(content="Desert sunrise", user_id=author_id))
+        db.session.commit()
+        db.session.execute(text("DELETE FROM search_index"))
+        db.session.commit()
+        assert search_posts("desert").hits == []
+
+    result = app.test_cli_runner().invoke(args=["backfill-search-index", "--batch-size", "1"])
+
+    assert result.exit_code == 0
+    assert "2 documents indexed" in result.output
+    with app.app_context():
+        assert _contents(search_posts("desert")) == [("tweet", "Desert sunrise")]
+
+
+def test_search_page_links_to_more_results(client, app):
+    author_id = _author(app)
+    with app.app_context():
+        db.session.add_all([Tweet(content=f"Canyon {index}", user_id=author_id) for index in range(21)])
+        db.session.commit()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(author_id)
+        session["_fresh"] = True
+
+    first = client.post("/search", data={"search_query": "canyon"})
+    second = client.get("/search?search_query=canyon&page=2")
+
+    assert b"More posts" in first.data and b"page=2" in first.data
+    assert second.status_code == 200
+    assert second.data.count(b"Canyon ") == 1
@@ -0,0 +1,135 @@
+"""Process-wide sidebar cache for trending hashtags and newest users."""
+
+import threading
+
+import pytest
+
+from twitclone.extensions import db
+from twitclone.models import Follows, User
+from twitclone.sidebar import SidebarCache
+from twitclone.trending import refresh_trending_hashtags
+
+
+@pytest.fixture()
+def sidebar_cache(app):
+    cache = app.extensions["sidebar_cache"] = SidebarCache(ttl_seconds=60)
+    yield cache
+    app.extensions["sidebar_cache"] = None
+
+
+def _create_user(app, username):
+    with app.app_context():
+        user = User(username=username, email=f"{username}@example.com", password="hash")
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def test_cache_reuses_a_value_until_it_expires_or_is_invalidated():
+    now = [0.0]
+    loads = []
+    cache = SidebarCache(ttl_seconds=10, clock=lambda: now[0])
+
+    def load():
+        loads.append(now[0])
+        return len(loads)
+
+    assert cache.get(load) == 1
+    now[0] = 9.0
+    assert cache.get(load) == 1
+    now[0] = 10.0
+    assert cache.get(load) == 2
+    cache.invalidate()
+    assert cache.get(load) == 3
+
+
+def test_only_one_thread_recomputes_while_others_serve_the_stale_copy():
+    cache = SidebarCache(ttl_seconds=60)
+    cache.get(lambda: "stale")
+    cache.invalidate()
+    started, release = threading.Event(), threading.Event()
+    loads = []
+
+    def slow_load():
+        loads.append(1)
+        started.set()
+        release.wait(5)
+        return "fresh"
+
+    refresher = threading.Thread(target=cache.get, args=(slow_load,))
+    refresher.start()
+    assert started.wait(5)
+    assert cache.get(lambda: pytest.fail("a second thread recomputed")) == "stale"
+    release.set()
+    refresher.join(5)
+
+    assert cache.get(lambda: pytest.fail("fresh value was not reused")) == "fresh"
+    assert loads == [1]
+
+
+def test_cold_cache_callers_wait_for_the_single_load():
+    cache = SidebarCache(ttl_seconds=60)
+    release = threading.Event()
+    loads, results = [], []
+
+    def slow_load():
+        loads.append(1)
+        release.wait(5)
+        return "value"
+
+    threads = [threading.Thread(target=lambda: results.append(cache.get(slow_load))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ["value"] * 3
+    assert loads == [1]
+
+
+def test_sidebar_is_cached_across_requests_and_refreshed_by_registration(client, app, sidebar_cache, assert_max_queries):
+    _create_user(app, "first")
+    with assert_max_queries(40) as cold:
+        client.get("/about")
+    with assert_max_queries(40) as warm:
+        client.get("/about")
+    assert sum("trending_hashtag" in statement for statement in cold) == 1
+    assert sum("trending_hashtag" in statement or "FROM user" in statement for statement in warm) == 0
+
+    client.post("/register", data={"username": "newcomer", "email": "newcomer@example.com", "password": "Secret123!", "community_standards": "yes"})
+
+    assert b"newcomer" in client.get("/about").data
+
+
+
+def test_posting_keeps_the_sidebar_until_trending_is_refreshed(client, app, sidebar_cache):
+    user_id = _create_user(app, "poster")
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+    client.get("/about")
+
+    client.post("/tweet", data={"content": "Off to the woods #Camping"})
+    assert b"#camping" not in client.get("/about").data
+
+    with app.app_context():
+        refresh_trending_hashtags()
+    assert b"#camping" in client.get("/about").data
+
+def test_follow_buttons_use_the_viewers_follows(client, app, sidebar_cache):
+    viewer_id = _create_user(app, "viewer")
+    followed_id = _create_user(app, "followed")
+    _create_user(app, "stranger")
+    with app.app_context():
+        db.session.add(Follows(follower_id=viewer_id, followed_id=followed_id))
+        db.session.commit()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(viewer_id)
+        session["_fresh"] = True
+
+    page = client.get("/about").data.decode()
+
+    assert 'data-username="followed" data-action="unfollow"' in page
+    assert 'data-username="stranger" data-action="follow"' in page
+    assert 'data-username="viewer"' not in page
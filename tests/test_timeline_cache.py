@@ -0,0 +1,165 @@
+"""Timeline page cache backends and write-driven invalidation."""
+
+import os
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from twitclone.extensions import db
+from twitclone.models import Tweet, User
+from twitclone.scheduling import publish_due_tweets
+from twitclone.timeline.cache import (
+    FileSystemTimelineCacheBackend,
+    InMemoryTimelineCacheBackend,
+    TimelinePageCache,
+    build_timeline_page_cache,
+)
+
+
+def _now():
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+@pytest.fixture()
+def page_cache(app):
+    cache = app.extensions["timeline_page_cache"] = TimelinePageCache(InMemoryTimelineCacheBackend(max_entries=50), ttl_seconds=60)
+    yield cache
+    app.extensions["timeline_page_cache"] = None
+
+
+def _login_new_user(client, app, username="alice"):
+    with app.app_context():
+        user = User(username=username, email=f"{username}@example.com", password="hash")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+    return user_id
+
+
+def test_memory_backend_expires_evicts_and_clears_on_generation_bump():
+    now = [0.0]
+    backend = InMemoryTimelineCacheBackend(max_entries=2, clock=lambda: now[0])
+    backend.set("a", 1, 10); backend.set("b", 2, 10)
+    assert backend.get("a") == 1
+    backend.set("c", 3, 10)
+    assert (backend.get("a"), backend.get("b"), backend.get("c")) == (1, None, 3)
+
+    now[0] = 10.0
+    assert backend.get("a") is None
+
+    backend.set("d", 4, 10)
+    assert backend.bump_generation() == 1
+    assert backend.get("d") is None
+
+
+def test_filesystem_backend_is_shared_between_worker_instances(tmp_path):
+    now = [100.0]
+    first = FileSystemTimelineCacheBackend(tmp_path, max_entries=2, clock=lambda: now[0])
+    second = FileSystemTimelineCacheBackend(tmp_path, max_entries=2, clock=lambda: now[0])
+
+    first.set("page", [["tweet", 1, "2026-10-18T12:00:00"]], 10)
+    assert second.get("page") == [["tweet", 1, "2026-10-18T12:00:00"]]
+    assert second.bump_generation() == 1
+    assert first.generation() == 1
+
+    now[0] = 110.0
+    assert first.get("page") is None
+
+
+def test_filesystem_backend_evicts_least_recently_used_entries(tmp_path):
+    backend = FileSystemTimelineCacheBackend(tmp_path, max_entries=2)
+    backend.set("old", 1, 60)
+    backend.set("new", 2, 60)
+    old_path = backend._path("old")
+    stale = old_path.stat().st_mtime - 60
+    os.utime(old_path, (stale, stale))
+
+    backend.set("newest", 3, 60)
+
+    assert (backend.get("old"), backend.get("new"), backend.get("newest")) == (None, 2, 3)
+
+
+
+def test_filesystem_backend_scans_the_directory_only_when_nearly_full(tmp_path, monkeypatch):
+    backend = FileSystemTimelineCacheBackend(tmp_path, max_entries=20)
+    scans = []
+    monkeypatch.setattr(backend, "_evict", lambda original=backend._evict: scans.append(1) or original())
+
+    for index in range(60):
+        backend.set(f"page-{index}", index, 60)
+
+    assert len(scans) <= 20
+    assert len(list(tmp_path.glob("*.json"))) <= backend.max_entries
+    assert backend.get("page-59") == 59
+
+def test_cache_factory_honours_backend_setting(tmp_path):
+    config = {"TIMELINE_CACHE_BACKEND": "none", "TIMELINE_CACHE_TTL_SECONDS": 15, "TIMELINE_CACHE_MAX_ENTRIES": 10, "TIMELINE_CACHE_DIR": str(tmp_path)}
+    assert build_timeline_page_cache(config) is None
+    assert isinstance(build_timeline_page_cache({**config, "TIMELINE_CACHE_BACKEND": "memory"}).backend, InMemoryTimelineCacheBackend)
+    assert isinstance(build_timeline_page_cache({**config, "TIMELINE_CACHE_BACKEND": "filesystem"}).backend, FileSystemTimelineCacheBackend)
+
+
+def test_repeat_timeline_requests_reuse_the_cached_page_selection(client, app, page_cache, assert_max_queries):
+    user_id = _login_new_user(client, app)
+    with app.app_context():
+        db.session.add_all([Tweet(content=f"Post {index}", user_id=user_id) for index in range(3)])
+        db.session.commit()
+
+    with assert_max_queries(40) as first:
+        assert client.get("/").status_code == 200
+    with assert_max_queries(40) as second:
+        response = client.get("/")
+
+    assert b"Post 2" in response.data
+    assert sum("UNION ALL" in statement for statement in first) == 2
+    assert sum("UNION ALL" in statement for statement in second) == 0
+
+
+def test_new_posts_are_never_hidden_by_a_cached_page(client, app, page_cache):
+    _login_new_user(client, app)
+    client.get("/")
+    client.get("/home")
+
+    client.post("/tweet", data={"content": "Fresh arrival"})
+
+    assert b"Fresh arrival" in client.get("/").data
+    assert b"Fresh arrival" in client.get("/home").data
+
+
+def test_cached_pages_are_keyed_by_viewer(client, app, page_cache):
+    _login_new_user(client, app, "alice")
+    client.post("/tweet", data={"content": "Alice at home"})
+    assert b"Alice at home" in client.get("/home").data
+
+    _login_new_user(client, app, "bob")
+    assert b"Alice at home" not in client.get("/home").data
+
+
+def test_publishing_scheduled_tweets_bumps_the_generation(app, page_cache):
+    with app.app_context():
+        user = User(username="writer", email="writer@example.com", password="hash")
+        db.session.add(user)
+        db.session.commit()
+        db.session.add(Tweet(content="Later", user_id=user.id, scheduled_at=_now() + timedelta(minutes=5)))
+        db.session.commit()
+        generation = page_cache.backend.generation()
+
+        assert publish_due_tweets(now=_now()) == 0
+        assert page_cache.backend.generation() == generation
+        assert publish_due_tweets(now=_now() + timedelta(minutes=10)) == 1
+        assert page_cache.backend.generation() == generation + 1
+
+
+
+def test_index_count_is_cached_once_for_every_viewer(client, app, page_cache):
+    _login_new_user(client, app, "alice")
+    client.get("/")
+    _login_new_user(client, app, "bob")
+    client.get("/")
+
+    keys = list(page_cache.backend._entries)
+    assert [key for key in keys if key.endswith(":index:count")] == ["timeline:0:shared:index:count"]
+    assert len([key for key in keys if ":index:page:" in key]) == 2
@@ -2,9 +2,18 @@
 
 from datetime import UTC, datetime, timedelta
 
+import pytest
+from sqlalchemy import event
+
 from twitclone.extensions import db
 from twitclone.models import Poll, PollOption, PollVote, Quote, Retweet, Tweet, User
-from twitclone.timeline.service import build_timeline_posts
+from twitclone.timeline.service import (
+    TIMELINE_TYPE_PRIORITY,
+    TimelineEntry,
+    build_timeline_posts,
+    fetch_timeline_posts,
+    timeline_union_query,
+)
 
 
 def seed_timeline(app):
@@ -133,3 +142,69 @@ def test_anonymous_poll_contract_does_not_report_a_vote(app):
 
         poll_post = next(post for post in posts if post["type"] == "poll")
         assert poll_post["has_voted"] is False
+
+
+def test_union_query_matches_reference_sort_order_in_one_statement(app):
+    seeded = seed_timeline(app)
+    with app.app_context():
+        author_id = seeded["author_id"]
+        tied = seeded["now"] - timedelta(minutes=4)
+        tweet = Tweet(content="tied tweet", user_id=author_id, timestamp=tied)
+        db.session.add(tweet)
+        db.session.flush()
+        db.session.add_all(
+            [
+                Retweet(user_id=seeded["actor_id"], tweet_id=tweet.id, timestamp=tied),
+                Quote(user_id=author_id, tweet_id=tweet.id, content="tied quote", timestamp=tied),
+                Poll(question="tied poll", created_at=tied, duration_days=1, duration_hours=0, duration_minutes=0, user_id=author_id),
+            ]
+        )
+        db.session.commit()
+        reference = sorted(
+            [(tweet.timestamp, "tweet", tweet.id) for tweet in Tweet.query.all()]
+            + [(retweet.timestamp, "retweet", retweet.id) for retweet in Retweet.query.all()]
+            + [(quote.timestamp, "quote", quote.id) for quote in Quote.query.all()]
+            + [(poll.created_at, "poll", poll.id) for poll in Poll.query.all()],
+            key=lambda item: (item[0], -TIMELINE_TYPE_PRIORITY[item[1]], item[2]),
+            reverse=True,
+        )
+
+        statements = []
+
+        @event.listens_for(db.engine, "before_cursor_execute")
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        try:
+            rows = db.session.execute(timeline_union_query(now=seeded["now"], limit=20)).all()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+
+        assert len(statements) == 1
+        assert "UNION ALL" in statements[0]
+        assert [(row.timestamp, row.type, row.source_id) for row in rows] == reference
+        assert [row.type for row in rows] == [
+            "poll", "quote", "retweet", "tweet", "retweet", "quote", "poll", "tweet", "tweet"
+        ]
+        posts = fetch_timeline_posts(now=seeded["now"], limit=20)
+        assert [(post["type"], post["source_id"]) for post in posts] == [
+            (post["type"], post["source_id"]) for post in build_timeline_posts(now=seeded["now"])
+        ]
+
+
+def test_timeline_entries_are_slotted_and_keep_the_dict_names(app):
+    seeded = seed_timeline(app)
+    with app.app_context():
+        posts = build_timeline_posts(now=seeded["now"])
+        poll_post, quote_post, retweet_post, original_post, _ = posts
+
+        assert all(isinstance(post, TimelineEntry) and not hasattr(post, "__dict__") for post in posts)
+        assert (retweet_post.id, retweet_post.report_type, retweet_post.report_id, retweet_post.report_author_id) == (
+            seeded["retweet_id"], "tweet", seeded["original_id"], seeded["author_id"]
+        )
+        assert (quote_post.report_type, quote_post.report_id, quote_post.report_author_id) == ("quote", seeded["quote_id"], seeded["actor_id"])
+        assert (poll_post.poll_id, poll_post.report_type, poll_post.poll_is_active) == (seeded["poll_id"], "poll", True)
+        assert original_post.original_user is None and original_post.get("poll_id") is None
+        assert original_post["report_author_id"] == seeded["author_id"]
+        with pytest.raises(KeyError):
+            original_post["missing"]
@@ -5,8 +5,17 @@ from datetime import datetime, timedelta
 import pytest
 
 from twitclone.extensions import db
-from twitclone.models import Tweet, User
-from twitclone.timeline.service import TIMELINE_PAGE_SIZE, paginate_timeline_posts
+from twitclone.models import Poll, PollOption, Quote, Retweet, Tweet, User
+from twitclone.timeline import service
+from twitclone.timeline.service import (
+    TIMELINE_PAGE_SIZE,
+    TimelineCursor,
+    build_timeline_cursor_page,
+    build_timeline_posts,
+    count_new_timeline_posts,
+    fetch_timeline_rows,
+    paginate_timeline_posts,
+)
 
 
 def seed_tweets(app, *, count, tied=False):
@@ -104,3 +113,188 @@ def test_page_beyond_end_returns_last_page(client, app):
     assert response.status_code == 200
     assert b"Page 2 of 2" in response.data
     assert b"timeline item 20" in response.data
+
+
+def seed_mixed_timeline(app):
+    fixed_time = datetime(2026, 8, 12, 12, 0, 0)
+    with app.app_context():
+        author = User(username="author", email="author@example.com", password="hash")
+        actor = User(username="actor", email="actor@example.com", password="hash")
+        db.session.add_all([author, actor])
+        db.session.commit()
+        for index in range(12):
+            timestamp = fixed_time - timedelta(minutes=index // 3)
+            tweet = Tweet(content=f"mixed item {index:02d}", user_id=author.id, timestamp=timestamp)
+            db.session.add(tweet)
+            db.session.flush()
+            db.session.add_all(
+                [
+                    Retweet(user_id=actor.id, tweet_id=tweet.id, timestamp=timestamp),
+                    Quote(user_id=actor.id, tweet_id=tweet.id, content=f"quote {index:02d}", timestamp=timestamp),
+                    Poll(question=f"poll {index:02d}", created_at=timestamp, duration_days=1, duration_hours=0, duration_minutes=0, user_id=author.id),
+                ]
+            )
+        db.session.commit()
+    return fixed_time
+
+
+def test_cursor_pages_match_full_ordering_without_gaps_or_duplicates(app):
+    now = seed_mixed_timeline(app)
+    with app.app_context():
+        expected = [(post["type"], post["source_id"]) for post in build_timeline_posts(now=now)]
+        walked, before = [], None
+        while True:
+            page = build_timeline_cursor_page(now=now, before=before, per_page=7)
+            assert len(page.items) <= 7
+            walked.extend((post["type"], post["source_id"]) for post in page.items)
+            if not page.has_next:
+                break
+            before = page.next_cursor
+
+        assert walked == expected
+        assert len(walked) == 48
+
+
+def test_cursor_page_requests_only_one_extra_row(app, monkeypatch):
+    now = seed_mixed_timeline(app)
+    requested = []
+    original = service.fetch_timeline_rows
+
+    def recording_fetch(**kwargs):
+        requested.append(kwargs["limit"])
+        return original(**kwargs)
+
+    monkeypatch.setattr(service, "fetch_timeline_rows", recording_fetch)
+    with app.app_context():
+        page = build_timeline_cursor_page(now=now, per_page=5)
+
+    assert requested == [6]
+    assert len(page.items) == 5
+    assert page.has_next is True
+
+
+def test_timeline_cursor_is_opaque_and_rejects_tampering():
+    cursor = TimelineCursor(datetime(2026, 8, 12, 12, 0, 0), 2, 41)
+
+    token = cursor.encode()
+
+    assert "2026" not in token
+    assert TimelineCursor.decode(token) == cursor
+    for invalid in ("not-a-cursor", "", TimelineCursor(datetime(2026, 8, 12), 9, 1).encode()):
+        with pytest.raises(ValueError, match="Invalid timeline cursor"):
+            TimelineCursor.decode(invalid)
+
+
+def test_index_follows_older_than_cursor_links(client, app):
+    seed_tweets(app, count=25)
+    with app.app_context():
+        first = build_timeline_cursor_page(now=datetime(2026, 8, 13), per_page=TIMELINE_PAGE_SIZE)
+
+    response = client.get(f"/?before={first.next_cursor}")
+
+    assert response.status_code == 200
+    assert b"Older posts" in response.data
+    for index in range(20, 25):
+        assert f"timeline item {index:02d}".encode() in response.data
+    assert b"timeline item 19" not in response.data
+
+
+def test_index_ignores_an_invalid_cursor(client, app):
+    seed_tweets(app, count=21)
+
+    response = client.get("/?before=invalid")
+
+    assert response.status_code == 200
+    assert b"Page 1 of 2" in response.data
+
+
+def seed_rendered_posts(app, *, count, prefix="writer"):
+    with app.app_context():
+        users = [User(username=f"{prefix}{index}", email=f"{prefix}{index}@example.com", password="hash") for index in range(count)]
+        db.session.add_all(users)
+        db.session.commit()
+        base = datetime(2026, 8, 12, 12, 0, 0)
+        for index, user in enumerate(users):
+            timestamp = base - timedelta(minutes=index)
+            tweet = Tweet(content=f"rendered {index:02d}", user_id=user.id, image=f"thumb_{index}.png", timestamp=timestamp)
+            db.session.add(tweet)
+            db.session.flush()
+            poll = Poll(question=f"question {index:02d}", created_at=timestamp, duration_days=1, duration_hours=0, duration_minutes=0, user_id=user.id)
+            db.session.add_all([
+                Retweet(user_id=users[index - 1].id, tweet_id=tweet.id, timestamp=timestamp),
+                Quote(user_id=users[index - 1].id, tweet_id=tweet.id, content=f"quoted {index:02d}", timestamp=timestamp),
+                poll,
+            ])
+            db.session.flush()
+            db.session.add_all([PollOption(option_text="yes", poll_id=poll.id), PollOption(option_text="no", poll_id=poll.id)])
+        db.session.commit()
+
+
+def test_timeline_page_renders_in_constant_queries(client, app, assert_max_queries):
+    seed_rendered_posts(app, count=2)
+    with assert_max_queries(14) as small_page:
+        assert client.get("/").status_code == 200
+
+    seed_rendered_posts(app, count=30, prefix="later")
+    with assert_max_queries(14) as full_page:
+        response = client.get("/")
+
+    assert response.status_code == 200
+    assert response.data.count(b'class="post-card"') == TIMELINE_PAGE_SIZE
+    assert len(full_page) == len(small_page)
+
+
+def test_rows_newer_than_each_cursor_are_exactly_the_preceding_items(app):
+    now = seed_mixed_timeline(app)
+    with app.app_context():
+        expected = [(post["type"], post["source_id"]) for post in build_timeline_posts(now=now)]
+        for position, post in enumerate(build_timeline_posts(now=now)):
+            newer = fetch_timeline_rows(now=now, after=TimelineCursor.for_post(post), limit=100)
+            assert [(row.type, row.source_id) for row in newer] == expected[:position]
+        assert count_new_timeline_posts(now=now, since=TimelineCursor.for_post(post), cap=5) == 6
+
+
+def test_timeline_updates_returns_only_posts_newer_than_the_cursor(client, app):
+    now = seed_mixed_timeline(app)
+    with app.app_context():
+        posts = build_timeline_posts(now=now)
+        since = TimelineCursor.for_post(posts[3]).encode()
+        expected = [(post["type"], post["source_id"]) for post in posts[:3]]
+
+    payload = client.get(f"/timeline/updates?since={since}").get_json()
+    counted = client.get(f"/timeline/updates?since={since}&format=count").get_json()
+    caught_up = client.get(f"/timeline/updates?since={payload['newest_cursor']}").get_json()
+
+    assert [(post["type"], post["source_id"]) for post in payload["posts"]] == expected
+    assert (payload["count"], payload["has_more"]) == (3, False)
+    assert payload["posts"][-1]["url"] == f"/post/{payload['posts'][-1]['source_id']}"
+    assert counted == {"status": "success", "count": 3, "has_more": False}
+    assert (caught_up["count"], caught_up["posts"], caught_up["newest_cursor"]) == (0, [], payload["newest_cursor"])
+
+
+def test_timeline_updates_caps_the_response_and_rejects_bad_cursors(client, app, monkeypatch):
+    from twitclone.timeline import routes
+
+    now = seed_mixed_timeline(app)
+    with app.app_context():
+        oldest = TimelineCursor.for_post(build_timeline_posts(now=now)[-1]).encode()
+    monkeypatch.setattr(routes, "NEW_POSTS_LIMIT", 4)
+
+    payload = client.get(f"/timeline/updates?since={oldest}").get_json()
+    counted = client.get(f"/timeline/updates?since={oldest}&format=count").get_json()
+    invalid = client.get("/timeline/updates?since=not-a-cursor")
+
+    assert (payload["count"], payload["has_more"]) == (4, True)
+    assert (counted["count"], counted["has_more"]) == (4, True)
+    assert invalid.status_code == 400
+    assert invalid.get_json()["status"] == "error"
+
+
+def test_first_timeline_page_advertises_the_updates_endpoint(client, app):
+    seed_mixed_timeline(app)
+
+    first_page = client.get("/").get_data(as_text=True)
+    second_page = client.get("/?page=2").get_data(as_text=True)
+
+    assert 'data-updates-url="/timeline/updates?since=' in first_page
+    assert 'data-updates-url="' not in second_page
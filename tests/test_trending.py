@@ -0,0 +1,111 @@
+"""Time-decayed trending hashtags built from hourly buckets."""
+
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from twitclone.extensions import db
+from twitclone.hashtag_index import backfill_hashtag_index
+from twitclone.models import HashtagTrendBucket, TrendingHashtag, Tweet, User
+from twitclone.trending import bucket_start, decayed_scores, refresh_trending_hashtags
+from twitclone.utils import get_trending_hashtags
+
+
+@pytest.fixture()
+def author_id(app):
+    with app.app_context():
+        user = User(username="author", email="author@example.com", password="hash")
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def _now():
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+def _buckets():
+    return {(bucket.tag, bucket.bucket_start): bucket.count for bucket in HashtagTrendBucket.query.all()}
+
+
+def test_decay_halves_a_bucket_every_half_life():
+    now = datetime(2026, 10, 18, 12)
+    scores = decayed_scores([("old", now - timedelta(hours=6), 4), ("new", now, 1), ("gone", now, 0)], now=now, half_life_hours=6)
+
+    assert scores == {"old": 2.0, "new": 1.0}
+
+
+def test_buckets_follow_publication_and_removal(app, author_id):
+    with app.app_context():
+        tweet = Tweet(content="#rv", user_id=author_id)
+        other = Tweet(content="#rv #camping", user_id=author_id)
+        db.session.add_all([tweet, other])
+        db.session.commit()
+        hour = bucket_start(tweet.timestamp)
+        assert _buckets() == {("rv", hour): 2, ("camping", hour): 1}
+
+        other.is_removed = True
+        db.session.commit()
+
+        assert _buckets() == {("rv", hour): 1, ("camping", hour): 0}
+
+
+def test_refresh_prefers_recent_tags_and_prunes_the_window(app, author_id):
+    now = _now()
+    with app.app_context():
+        db.session.add_all(
+            [Tweet(content="#classic", user_id=author_id, timestamp=now - timedelta(hours=12)) for _ in range(3)]
+            + [Tweet(content="#fresh", user_id=author_id, timestamp=now) for _ in range(2)]
+            + [Tweet(content="#ancient", user_id=author_id, timestamp=now - timedelta(days=5)) for _ in range(9)]
+        )
+        db.session.commit()
+
+        assert refresh_trending_hashtags(now=now) == ["fresh", "classic"]
+
+        assert get_trending_hashtags(limit=1) == ["fresh"]
+        assert {tag for tag, _start in _buckets()} == {"classic", "fresh"}
+
+
+def test_reading_refreshes_a_missing_or_stale_ranking(app, author_id, assert_max_queries):
+    with app.app_context():
+        with assert_max_queries(1):
+            assert get_trending_hashtags() == []
+
+        db.session.add(Tweet(content="#rv", user_id=author_id))
+        db.session.commit()
+        assert get_trending_hashtags() == ["rv"]
+
+        db.session.add(Tweet(content="#camping #camping2", user_id=author_id))
+        db.session.commit()
+        with assert_max_queries(1):
+            assert get_trending_hashtags() == ["rv"]
+
+        TrendingHashtag.query.update({"computed_at": _now() - timedelta(hours=2)})
+        db.session.commit()
+        assert get_trending_hashtags() == ["camping", "camping2", "rv"]
+
+
+def test_refresh_stores_only_the_configured_size(app, author_id):
+    app.config["TRENDING_SIZE"] = 2
+    try:
+        with app.app_context():
+            db.session.add(Tweet(content="#a #b #c", user_id=author_id))
+            db.session.commit()
+            refresh_trending_hashtags()
+            assert TrendingHashtag.query.count() == 2
+    finally:
+        app.config["TRENDING_SIZE"] = 10
+
+
+def test_backfill_recounts_buckets_from_the_index(app, author_id):
+    with app.app_context():
+        tweet = Tweet(content="#rv", user_id=author_id)
+        db.session.add(tweet)
+        db.session.commit()
+        expected = _buckets()
+        HashtagTrendBucket.query.delete()
+        db.session.commit()
+
+        backfill_hashtag_index()
+
+        assert _buckets() == expected
@@ -0,0 +1,120 @@
+"""In-memory username prefix index and the autocomplete endpoint."""
+
+import pytest
+
+from twitclone.extensions import db
+from twitclone.models import Follows, User
+from twitclone.username_index import FollowedIdsCache, UsernameIndex
+
+
+@pytest.fixture()
+def username_index(app):
+    index = app.extensions["username_index"] = UsernameIndex(max_entries=100)
+    app.extensions["followed_ids_cache"] = FollowedIdsCache(max_entries=10, ttl_seconds=60)
+    yield index
+    app.extensions["username_index"] = app.extensions["followed_ids_cache"] = None
+
+
+def _create_user(app, username):
+    with app.app_context():
+        user = User(username=username, email=f"{username}@example.com", password="hash")
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def _login(client, user_id):
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user_id)
+        session["_fresh"] = True
+
+
+def test_lookup_matches_lowercase_prefixes_in_order():
+    index = UsernameIndex(max_entries=10)
+    index.ensure_loaded(lambda _limit: [(1, "bob"), (2, "Alice"), (3, "alfred"), (4, "carol")])
+
+    assert index.lookup("al", 5) == [(3, "alfred"), (2, "Alice")]
+    assert index.lookup("al", 1) == [(3, "alfred")]
+    assert index.lookup("z", 5) == []
+
+    index.remove(2, "Alice")
+    index.add(2, "Alana")
+    index.add(2, "Alana")
+    assert index.lookup("al", 5) == [(2, "Alana"), (3, "alfred")]
+
+
+def test_index_stays_unloaded_beyond_its_bound():
+    index = UsernameIndex(max_entries=2)
+    assert index.ensure_loaded(lambda limit: [(user_id, f"user{user_id}") for user_id in range(1, limit + 1)]) is False
+    assert index.overflowed and len(index) == 0
+
+    bounded = UsernameIndex(max_entries=2)
+    bounded.ensure_loaded(lambda _limit: [(1, "ann")])
+    bounded.add(2, "ben")
+    bounded.add(3, "cat")
+    assert bounded.overflowed and not bounded.loaded
+
+
+def test_autocomplete_ranks_followed_accounts_first(client, app, username_index):
+    viewer_id = _create_user(app, "viewer")
+    for username in ("sam", "sally", "Sandy"):
+        _create_user(app, username)
+    with app.app_context():
+        db.session.add(Follows(follower_id=viewer_id, followed_id=User.query.filter_by(username="Sandy").one().id))
+        db.session.commit()
+    _login(client, viewer_id)
+
+    response = client.get("/users/autocomplete?q=@SA")
+
+    assert response.get_json() == {
+        "users": [
+            {"username": "Sandy", "following": True},
+            {"username": "sally", "following": False},
+            {"username": "sam", "following": False},
+        ]
+    }
+    assert username_index.loaded
+
+
+def test_warm_autocomplete_ranks_follows_from_memory(client, app, username_index, assert_max_queries):
+    viewer_id = _create_user(app, "viewer")
+    for index in range(10):
+        _create_user(app, f"sa{index}")
+    zed_id = _create_user(app, "sazed")
+    _login(client, viewer_id)
+    client.get("/users/autocomplete?q=sa")
+
+    assert client.post("/follow/sazed").status_code == 200
+    with assert_max_queries(10) as statements:
+        first = client.get("/users/autocomplete?q=sa").get_json()["users"]
+    with assert_max_queries(10) as warm:
+        second = client.get("/users/autocomplete?q=sa").get_json()["users"]
+
+    assert first == second
+    assert first[:2] == [{"username": "sazed", "following": True}, {"username": "sa0", "following": False}]
+    assert sum("follows" in statement for statement in statements) == 1
+    assert not any("follows" in statement or "lower(" in statement for statement in warm)
+    assert app.extensions["followed_ids_cache"].get(viewer_id, lambda _viewer_id: ()) == {zed_id}
+
+
+def test_registration_and_rename_update_a_loaded_index(client, app, username_index):
+    viewer_id = _create_user(app, "viewer")
+    _login(client, viewer_id)
+    assert client.get("/users/autocomplete?q=new").get_json() == {"users": []}
+
+    client.post("/register", data={"username": "newcomer", "email": "newcomer@example.com", "password": "Secret123!", "community_standards": "yes"})
+    assert [user["username"] for user in client.get("/users/autocomplete?q=new").get_json()["users"]] == ["newcomer"]
+
+    client.post("/profile/edit", data={"username": "vista", "email": "viewer@example.com", "bio": ""})
+    assert [user["username"] for user in client.get("/users/autocomplete?q=vi").get_json()["users"]] == ["vista"]
+    assert username_index.lookup("viewer", 5) == []
+
+
+def test_autocomplete_falls_back_to_the_database_without_an_index(client, app):
+    viewer_id = _create_user(app, "viewer")
+    _create_user(app, "Victor")
+    _create_user(app, "vi_ola")
+    _login(client, viewer_id)
+
+    assert [user["username"] for user in client.get("/users/autocomplete?q=vi").get_json()["users"]] == ["vi_ola", "Victor", "viewer"]
+    assert client.get("/users/autocomplete?q=v_").get_json() == {"users": []}
@@ -26,6 +26,7 @@ def create_app(config_object: type[Config] = Config) -> Flask:
     from twitclone.billing import ensure_default_plans
     from twitclone.bookmarks import bookmarks_blueprint
     from twitclone.community import community_blueprint
+    from twitclone.counters import reconcile_counters
     from twitclone.demo import DEMO_PASSWORD, seed_demo_content
     from twitclone.discovery import discovery_blueprint
     from twitclone.deployment_preflight import (
@@ -33,16 +34,25 @@ def create_app(config_object: type[Config] = Config) -> Flask:
         run_deployment_preflight,
     )
     from twitclone.extensions import db
+    from twitclone.hashtag_index import backfill_hashtag_index
+    from twitclone.image_pipeline import init_image_pipeline
     from twitclone.media_migration import migrate_media_directory
     from twitclone.media_storage import init_media_storage
     from twitclone.messaging import messaging_blueprint
     from twitclone.models import User
     from twitclone.notifications import notifications_blueprint
+    from twitclone.notifications.retention import prune_notifications
     from twitclone.observability import configure_observability
     from twitclone.payments import payments_blueprint
     from twitclone.polls import polls_blueprint
     from twitclone.profiles import profiles_blueprint
+    from twitclone.realtime import realtime_blueprint
+    from twitclone.realtime.broker import init_realtime
+    from twitclone.search import backfill_search_index
+    from twitclone.sidebar import init_sidebar_cache
     from twitclone.timeline import timeline_blueprint
+    from twitclone.timeline.cache import init_timeline_cache
+    from twitclone.username_index import init_username_index
     from twitclone.utils import bind_legacy_module
 
     bind_legacy_module(legacy_app)
@@ -50,6 +60,11 @@ def create_app(config_object: type[Config] = Config) -> Flask:
     scheduler = legacy_app.scheduler
     flask_app.config.from_object(config_object)
     init_media_storage(flask_app)
+    init_image_pipeline(flask_app)
+    init_timeline_cache(flask_app)
+    init_realtime(flask_app)
+    init_sidebar_cache(flask_app)
+    init_username_index(flask_app)
     configure_observability(flask_app)
 
     for blueprint in (
@@ -64,6 +79,7 @@ def create_app(config_object: type[Config] = Config) -> Flask:
         admin_blueprint,
         community_blueprint,
         payments_blueprint,
+        realtime_blueprint,
     ):
         if blueprint.name not in flask_app.blueprints:
             flask_app.register_blueprint(blueprint)
@@ -99,6 +115,47 @@ def create_app(config_object: type[Config] = Config) -> Flask:
             ensure_default_plans()
             click.echo("Ripple billing plan catalog is ready.")
 
+    if "backfill-hashtag-index" not in flask_app.cli.commands:
+        @flask_app.cli.command("backfill-hashtag-index")
+        @click.option("--batch-size", type=click.IntRange(min=1), default=500, show_default=True)
+        def backfill_hashtag_index_command(batch_size):
+            """Rebuild the hashtag index from existing tweets and quotes."""
+            result = backfill_hashtag_index(batch_size=batch_size)
+            click.echo(f"Hashtag index rebuilt: {result.posts} posts scanned, {result.hashtags} hashtags indexed.")
+
+    if "backfill-search-index" not in flask_app.cli.commands:
+        @flask_app.cli.command("backfill-search-index")
+        @click.option("--batch-size", type=click.IntRange(min=1), default=500, show_default=True)
+        def backfill_search_index_command(batch_size):
+            """Rebuild the full-text search index from existing posts and users."""
+            result = backfill_search_index(batch_size=batch_size)
+            click.echo(f"Search index rebuilt: {result.documents} documents indexed.")
+
+    if "reconcile-counters" not in flask_app.cli.commands:
+        @flask_app.cli.command("reconcile-counters")
+        @click.option("--batch-size", type=click.IntRange(min=1), default=500, show_default=True)
+        def reconcile_counters_command(batch_size):
+            """Recount unread and moderation counters and repair any drift."""
+            result = reconcile_counters(batch_size=batch_size)
+            pending = "repaired" if result.pending_reports_repaired else "unchanged"
+            click.echo(f"Counters reconciled: {result.users} users checked, {result.repaired} repaired; pending reports {pending}.")
+
+    if "prune-notifications" not in flask_app.cli.commands:
+        @flask_app.cli.command("prune-notifications")
+        @click.option("--dry-run", is_flag=True, help="Count expired notifications without removing them.")
+        @click.option("--batch-size", type=click.IntRange(min=1), default=500, show_default=True)
+        def prune_notifications_command(dry_run, batch_size):
+            """Delete or archive read notifications past the retention age."""
+            result = prune_notifications(dry_run=dry_run, batch_size=batch_size)
+            if result.cutoff is None:
+                click.echo("Notification retention is disabled; set NOTIFICATION_RETENTION_DAYS to enable it.")
+                return
+            action = "deleted" if result.mode == "delete" else "archived"
+            if dry_run:
+                click.echo(f"Notification retention plan: {result.pruned} read notifications older than {result.cutoff:%Y-%m-%d %H:%M} would be {action}.")
+            else:
+                click.echo(f"Notification retention complete: {result.pruned} read notifications {action} in {result.batches} batches.")
+
     if "migrate-media-to-s3" not in flask_app.cli.commands:
         @flask_app.cli.command("migrate-media-to-s3")
         @click.option("--source", type=click.Path(path_type=Path), default=None)
@@ -10,6 +10,7 @@ from twitclone.admin import admin_blueprint
 from twitclone.community.routes import REPORT_CATEGORIES
 from twitclone.extensions import db
 from twitclone.models import Notification, Poll, PostReport, Quote, Tweet, User, VerificationRequest
+from twitclone.timeline.cache import bump_timeline_generation
 
 
 def _utcnow():
@@ -165,6 +166,8 @@ def review_report(report_id):
             )
         flash(f'Content removed and {len(related_reports)} related report(s) resolved.', 'success')
     db.session.commit()
+    if action == 'remove':
+        bump_timeline_generation()
     return redirect(url_for('admin.moderation_queue'))
 
 
@@ -36,18 +36,29 @@ def _safe_commit():
 def record_post_impressions(posts):
     viewer_user_id, viewer_key = _viewer_identity('post')
     today = _today()
-    seen = set()
+    authors = {}
     for post in posts:
-        tweet_id = post.get('action_tweet_id')
-        if not tweet_id or tweet_id in seen:
+        tweet_id = post.action_tweet_id
+        author_id = post.report_author_id
+        if not tweet_id or tweet_id in authors or not author_id or author_id == viewer_user_id:
             continue
-        seen.add(tweet_id)
-        author_id = post.get('report_author_id')
-        if not author_id or author_id == viewer_user_id:
-            continue
-        exists = PostImpression.query.filter_by(tweet_id=tweet_id, viewer_key=viewer_key, impression_date=today).first()
-        if exists is None:
-            db.session.add(PostImpression(tweet_id=tweet_id, author_id=author_id, viewer_user_id=viewer_user_id, viewer_key=viewer_key, impression_date=today))
+        authors[tweet_id] = author_id
+    if authors:
+        recorded = {
+            tweet_id for (tweet_id,) in db.session.query(PostImpression.tweet_id).filter(
+                PostImpression.tweet_id.in_(authors), PostImpression.viewer_key == viewer_key, PostImpression.impression_date == today
+            )
+        }
+        missing = [
+            {'tweet_id': tweet_id, 'author_id': author_id, 'viewer_user_id': viewer_user_id, 'viewer_key': viewer_key, 'impression_date': today}
+            for tweet_id, author_id in authors.items() if tweet_id not in recorded
+        ]
+        if missing:
+            try:
+                db.session.execute(db.insert(PostImpression), missing)
+            except IntegrityError:
+                db.session.rollback()
+                return
     _safe_commit()
 
 
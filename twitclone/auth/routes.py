@@ -17,6 +17,8 @@ from twitclone.auth.recovery import (
 from twitclone.community.routes import COMMUNITY_GUIDELINES_VERSION
 from twitclone.extensions import bcrypt, db
 from twitclone.models import User
+from twitclone.sidebar import invalidate_sidebar
+from twitclone.username_index import record_username
 
 
 def register():
@@ -60,6 +62,8 @@ def register():
                 username=username,
                 email=email,
             )
+        invalidate_sidebar()
+        record_username(user.id, user.username)
         flash("Your account has been created!", "success")
         return redirect(url_for("login"))
     return render_template("register.html")
@@ -0,0 +1,202 @@
+"""Maintained counters behind the page chrome.
+
+Unread notifications, unread direct messages, and followed hashtags are kept
+per user in ``user_counters``, and pending moderation reports in the global
+``site_counter`` row, so rendering a page reads counters by primary key instead
+of counting rows. Mapper events adjust the counters inside the same flush as
+the rows they count; bulk ``UPDATE`` statements bypass those events and adjust
+with :func:`adjust_user_counters` instead. :func:`reconcile_counters` recounts
+everything from the source tables and repairs drift.
+"""
+
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from twitclone.extensions import db
+from twitclone.models import DirectMessage, HashtagFollow, Notification, PostReport, SiteCounter, User, UserCounters
+
+PENDING_REPORTS = "pending_reports"
+_USER_COUNTER_COLUMNS = ("unread_notifications", "unread_messages", "followed_hashtags")
+
+
+@dataclass(frozen=True, slots=True)
+class UserCounts:
+    unread_notifications: int = 0
+    unread_messages: int = 0
+    followed_hashtags: int = 0
+
+
+@dataclass(frozen=True)
+class CounterReconcileResult:
+    users: int = 0
+    repaired: int = 0
+    pending_reports_repaired: bool = False
+
+
+def _upsert_increments(connection, model, key: dict, deltas: dict) -> None:
+    dialect_insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    statement = dialect_insert(model).values({**key, **deltas})
+    connection.execute(
+        statement.on_conflict_do_update(
+            index_elements=list(key),
+            set_={column: getattr(model, column) + statement.excluded[column] for column in deltas},
+        )
+    )
+
+
+def _apply(connection, changes: Counter) -> None:
+    """Apply ``{(model, key, column): delta}`` changes, one upsert per counter row."""
+    rows: dict = defaultdict(dict)
+    for (model, key, column), delta in changes.items():
+        if delta:
+            rows[model, key][column] = delta
+    for (model, key), deltas in rows.items():
+        key_column = "user_id" if model is UserCounters else "name"
+        _upsert_increments(connection, model, {key_column: key}, deltas)
+
+
+def adjust_user_counters(user_id: int, **deltas: int) -> None:
+    """Add ``deltas`` to ``user_id``'s counters; for write paths that bypass the ORM."""
+    _apply(db.session.connection(), Counter({(UserCounters, user_id, column): delta for column, delta in deltas.items()}))
+
+
+def _notification_counts(value):
+    return {(UserCounters, value("user_id"), "unread_notifications"): int(not value("read"))}
+
+
+def _message_counts(value):
+    return {(UserCounters, value("receiver_id"), "unread_messages"): int(not value("read") and not value("deleted_by_receiver"))}
+
+
+def _hashtag_follow_counts(value):
+    return {(UserCounters, value("user_id"), "followed_hashtags"): 1}
+
+
+def _report_counts(value):
+    return {(SiteCounter, PENDING_REPORTS, "value"): int(value("status") == "pending")}
+
+
+def _counts(target, counted, *, previous=False):
+    state = inspect(target)
+
+    def value(name):
+        history = state.attrs[name].history
+        if previous and history.deleted:
+            return history.deleted[0]
+        return getattr(target, name)
+
+    return counted(value)
+
+
+def _keep_previous_value(_target, value, _oldvalue, _initiator):
+    return value
+
+
+def _track(model, counted, attributes) -> None:
+    # Load the replaced value even when the attribute was expired, so updates can subtract it.
+    for name in attributes:
+        event.listen(getattr(model, name), "set", _keep_previous_value, active_history=True, retval=True)
+
+    def inserted(_mapper, connection, target):
+        _apply(connection, Counter(_counts(target, counted)))
+
+    def updated(_mapper, connection, target):
+        changes = Counter(_counts(target, counted))
+        changes.subtract(_counts(target, counted, previous=True))
+        _apply(connection, changes)
+
+    def deleted(_mapper, connection, target):
+        # A row changed and deleted in one flush only emits the DELETE, so count its loaded values.
+        changes = Counter()
+        changes.subtract(_counts(target, counted, previous=True))
+        _apply(connection, changes)
+
+    event.listen(model, "after_insert", inserted)
+    event.listen(model, "after_update", updated)
+    event.listen(model, "after_delete", deleted)
+
+
+_track(Notification, _notification_counts, ("user_id", "read"))
+_track(DirectMessage, _message_counts, ("receiver_id", "read", "deleted_by_receiver"))
+_track(HashtagFollow, _hashtag_follow_counts, ("user_id",))
+_track(PostReport, _report_counts, ("status",))
+
+
+def get_user_counts(user_id: int) -> UserCounts:
+    """Read ``user_id``'s counters with one primary-key lookup."""
+    row = db.session.execute(select(*(getattr(UserCounters, column) for column in _USER_COUNTER_COLUMNS)).where(UserCounters.user_id == user_id)).first()
+    return UserCounts(*row) if row is not None else UserCounts()
+
+
+def get_pending_report_count() -> int:
+    return db.session.scalar(select(SiteCounter.value).where(SiteCounter.name == PENDING_REPORTS)) or 0
+
+
+def _grouped_counts(column, *filters):
+    return dict(db.session.execute(select(column, func.count()).where(*filters).group_by(column)).all())
+
+
+def reconcile_counters(*, batch_size=500) -> CounterReconcileResult:
+    """Recount every counter from its source rows, committing one user id range at a time.
+
+    Only rows whose stored values differ are written, so the result reports
+    how much drift was repaired. Rerunning is safe.
+    """
+    users = repaired = 0
+    last_id = 0
+    while True:
+        ids = list(db.session.scalars(select(User.id).where(User.id > last_id).order_by(User.id).limit(batch_size)))
+        if not ids:
+            break
+        actual = {
+            "unread_notifications": _grouped_counts(Notification.user_id, Notification.user_id.in_(ids), Notification.read.is_(False)),
+            "unread_messages": _grouped_counts(
+                DirectMessage.receiver_id,
+                DirectMessage.receiver_id.in_(ids),
+                DirectMessage.read.is_(False),
+                DirectMessage.deleted_by_receiver.is_(False),
+            ),
+            "followed_hashtags": _grouped_counts(HashtagFollow.user_id, HashtagFollow.user_id.in_(ids)),
+        }
+        stored = {counters.user_id: counters for counters in UserCounters.query.filter(UserCounters.user_id.in_(ids))}
+        for user_id in ids:
+            expected = {column: counts.get(user_id, 0) for column, counts in actual.items()}
+            counters = stored.get(user_id)
+            if counters is None:
+                if any(expected.values()):
+                    db.session.add(UserCounters(user_id=user_id, **expected))
+                    repaired += 1
+            elif any(getattr(counters, column) != value for column, value in expected.items()):
+                for column, value in expected.items():
+                    setattr(counters, column, value)
+                repaired += 1
+        db.session.commit()
+        users += len(ids)
+        last_id = ids[-1]
+
+    pending = PostReport.query.filter_by(status="pending").count()
+    site_counter = db.session.get(SiteCounter, PENDING_REPORTS)
+    pending_reports_repaired = (site_counter.value if site_counter is not None else 0) != pending
+    if pending_reports_repaired:
+        if site_counter is None:
+            db.session.add(SiteCounter(name=PENDING_REPORTS, value=pending))
+        else:
+            site_counter.value = pending
+        db.session.commit()
+    return CounterReconcileResult(users=users, repaired=repaired, pending_reports_repaired=pending_reports_repaired)
+
+
+__all__ = [
+    "CounterReconcileResult",
+    "PENDING_REPORTS",
+    "UserCounts",
+    "adjust_user_counters",
+    "get_pending_report_count",
+    "get_user_counts",
+    "reconcile_counters",
+]
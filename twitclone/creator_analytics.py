@@ -4,16 +4,14 @@ from __future__ import annotations
 
 from collections import Counter
 from datetime import UTC, date, datetime, timedelta
-import re
 
 from sqlalchemy import false, func
 
 from twitclone.analytics_models import FollowerSnapshot, PostImpression, ProfileVisit
 from twitclone.extensions import db
-from twitclone.models import Quote, Retweet, Tweet
+from twitclone.models import Quote, Retweet, Tweet, TweetHashtag
 
 ALLOWED_RANGES = {7, 30, 90}
-HASHTAG_RE = re.compile(r"(?<!\w)#([A-Za-z0-9_]+)")
 
 
 def _today() -> date:
@@ -214,6 +212,11 @@ def build_creator_dashboard(user, raw_days=None):
         .group_by(Quote.tweet_id).all()
     ))
 
+    tweet_tags = {}
+    tag_filter = TweetHashtag.tweet_id.in_(tweet_ids) if tweet_ids else false()
+    for tweet_id, tag in db.session.query(TweetHashtag.tweet_id, TweetHashtag.tag).filter(tag_filter).order_by(TweetHashtag.id):
+        tweet_tags.setdefault(tweet_id, []).append(tag)
+
     post_performance = []
     hashtag_posts = Counter(); hashtag_impressions = Counter(); hashtag_engagements = Counter()
     for tweet in sorted(tweets, key=lambda item: item.timestamp, reverse=True):
@@ -221,8 +224,7 @@ def build_creator_dashboard(user, raw_days=None):
         post_engagements = post_reposts + post_quotes
         post_rate = round((post_engagements / post_impressions) * 100, 2) if post_impressions else 0
         post_performance.append({'tweet': tweet, 'impressions': post_impressions, 'reposts': post_reposts, 'quotes': post_quotes, 'engagements': post_engagements, 'engagement_rate': post_rate})
-        tags = dict.fromkeys(tag.lower() for tag in HASHTAG_RE.findall(tweet.content or ''))
-        for tag in tags:
+        for tag in tweet_tags.get(tweet.id, ()):
             hashtag_posts[tag] += 1; hashtag_impressions[tag] += post_impressions; hashtag_engagements[tag] += post_engagements
 
     hashtag_performance = []
@@ -0,0 +1,82 @@
+"""Keyset-paginated hashtag pages read from the hashtag index.
+
+The index holds one row per tag per published, unremoved post, so a page walks
+``ix_tweet_hashtag_tag_timestamp`` by ``(timestamp, tweet_id)`` and reads only
+the rows it shows, without ``DISTINCT``.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from twitclone.extensions import db
+from twitclone.models import Tweet, TweetHashtag
+
+HASHTAG_PAGE_SIZE = 20
+
+
+@dataclass(frozen=True)
+class HashtagCursor:
+    """Position of one tagged tweet in the ``(timestamp, tweet_id)`` newest-first order."""
+
+    timestamp: datetime
+    tweet_id: int
+
+    def encode(self):
+        raw = f"{self.timestamp.isoformat()}|{self.tweet_id}".encode("ascii")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    @classmethod
+    def decode(cls, token):
+        """Parse an opaque cursor, raising ``ValueError`` for anything malformed."""
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("ascii")
+            timestamp, tweet_id = raw.split("|")
+            return cls(datetime.fromisoformat(timestamp), int(tweet_id))
+        except (binascii.Error, UnicodeError, TypeError, ValueError) as exc:
+            raise ValueError("Invalid hashtag cursor") from exc
+
+
+@dataclass(frozen=True)
+class HashtagPage:
+    """Up to ``per_page`` tweets tagged ``tag`` strictly older than ``cursor``."""
+
+    items: list
+    cursor: str | None
+    next_cursor: str | None
+
+    @property
+    def has_next(self): return self.next_cursor is not None
+
+
+def tagged_tweets_page(tag, *, before=None, per_page=HASHTAG_PAGE_SIZE) -> HashtagPage:
+    """Load the newest tweets tagged ``tag`` with their authors.
+
+    ``ValueError`` is raised for a malformed ``before`` cursor.
+    """
+    statement = (
+        select(Tweet, TweetHashtag.timestamp)
+        .join(TweetHashtag, TweetHashtag.tweet_id == Tweet.id)
+        .where(TweetHashtag.tag == tag)
+        .options(joinedload(Tweet.user))
+        .order_by(TweetHashtag.timestamp.desc(), TweetHashtag.tweet_id.desc())
+        .limit(per_page + 1)
+    )
+    if before:
+        cursor = HashtagCursor.decode(before)
+        statement = statement.where(
+            (TweetHashtag.timestamp < cursor.timestamp) | ((TweetHashtag.timestamp == cursor.timestamp) & (TweetHashtag.tweet_id < cursor.tweet_id))
+        )
+    rows = db.session.execute(statement).all()
+    items = [tweet for tweet, _timestamp in rows[:per_page]]
+    next_cursor = HashtagCursor(rows[per_page - 1].timestamp, items[-1].id).encode() if len(rows) > per_page else None
+    return HashtagPage(items=items, cursor=before or None, next_cursor=next_cursor)
+
+
+__all__ = ["HASHTAG_PAGE_SIZE", "HashtagCursor", "HashtagPage", "tagged_tweets_page"]
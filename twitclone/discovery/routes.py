@@ -1,46 +1,63 @@
 """Search, hashtag, and public discovery routes."""
 
-from flask import redirect, render_template, request, url_for
+from datetime import UTC, datetime
+
+from flask import jsonify, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
 from twitclone.discovery import discovery_blueprint
+from twitclone.discovery.hashtags import tagged_tweets_page
 from twitclone.extensions import db
-from twitclone.models import HashtagFollow, Tweet, User
+from twitclone.models import HashtagFollow
+from twitclone.search import search_posts, search_users
+from twitclone.timeline.cache import bump_timeline_generation
+from twitclone.timeline.home import backfill_followed_hashtag, remove_followed_hashtag
+from twitclone.username_index import suggest_usernames
 
 
 def _normalize_hashtag(value: str) -> str:
     return value.strip().lstrip("#").lower()
 
 
+def _now():
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
 def about():
     return render_template("about.html")
 
 
 @login_required
 def search():
-    if request.method == "POST":
-        search_query = request.form["search_query"]
-        user_results = User.query.filter(User.username.ilike(f"%{search_query}%")).all()
-        tweet_results = Tweet.query.filter(
-            Tweet.content.ilike(f"%#{search_query}%"), Tweet.is_removed.is_(False)
-        ).all()
-        return render_template("search_results.html", search_query=search_query, user_results=user_results, tweet_results=tweet_results)
-    return redirect(url_for("index"))
+    search_query = (request.form.get("search_query") or request.args.get("search_query") or "").strip()
+    if not search_query:
+        return redirect(url_for("index"))
+    user_results = search_users(search_query, page=request.args.get("user_page", 1, type=int))
+    post_results = search_posts(search_query, page=request.args.get("page", 1, type=int))
+    return render_template("search_results.html", search_query=search_query, user_results=user_results, post_results=post_results)
+
+
+@login_required
+def username_autocomplete():
+    return jsonify(users=suggest_usernames(request.args.get("q", "")[:150], viewer_id=current_user.id))
 
 
 @login_required
 def hashtag(hashtag):
     normalized = _normalize_hashtag(hashtag); tagged_hashtag = f"#{normalized}"
-    tweets = Tweet.query.filter(Tweet.content.ilike(f"%{tagged_hashtag}%"), Tweet.is_removed.is_(False)).order_by(Tweet.timestamp.desc()).all()
+    try:
+        page = tagged_tweets_page(normalized, before=request.args.get("before"))
+    except ValueError:
+        return redirect(url_for("hashtag", hashtag=normalized))
     is_following = HashtagFollow.query.filter_by(user_id=current_user.id, hashtag=normalized).first() is not None
-    return render_template("hashtag.html", hashtag=tagged_hashtag, hashtag_name=normalized, tweets=tweets, is_following=is_following)
+    return render_template("hashtag.html", hashtag=tagged_hashtag, hashtag_name=normalized, tweets=page.items, hashtag_page=page, is_following=is_following)
 
 
 @login_required
 def follow_hashtag(hashtag):
     normalized = _normalize_hashtag(hashtag)
     if normalized and not HashtagFollow.query.filter_by(user_id=current_user.id, hashtag=normalized).first():
-        db.session.add(HashtagFollow(user_id=current_user.id, hashtag=normalized)); db.session.commit()
+        db.session.add(HashtagFollow(user_id=current_user.id, hashtag=normalized)); backfill_followed_hashtag(current_user.id, normalized, now=_now()); db.session.commit(); bump_timeline_generation()
     return redirect(url_for("hashtag", hashtag=normalized))
 
 
@@ -48,7 +65,7 @@ def follow_hashtag(hashtag):
 def unfollow_hashtag(hashtag):
     normalized = _normalize_hashtag(hashtag); followed = HashtagFollow.query.filter_by(user_id=current_user.id, hashtag=normalized).first()
     if followed:
-        db.session.delete(followed); db.session.commit()
+        db.session.delete(followed); remove_followed_hashtag(current_user.id, normalized); db.session.commit(); bump_timeline_generation()
     return redirect(url_for("hashtag", hashtag=normalized))
 
 
@@ -56,6 +73,7 @@ def unfollow_hashtag(hashtag):
 def register_discovery_routes(state):
     state.app.add_url_rule("/about", endpoint="about", view_func=about)
     state.app.add_url_rule("/search", endpoint="search", view_func=search, methods=["GET", "POST"])
+    state.app.add_url_rule("/users/autocomplete", endpoint="username_autocomplete", view_func=username_autocomplete)
     state.app.add_url_rule("/hashtag/<hashtag>", endpoint="hashtag", view_func=hashtag)
     state.app.add_url_rule("/hashtag/<hashtag>/follow", endpoint="follow_hashtag", view_func=follow_hashtag, methods=["POST"])
     state.app.add_url_rule("/hashtag/<hashtag>/unfollow", endpoint="unfollow_hashtag", view_func=unfollow_hashtag, methods=["POST"])
@@ -0,0 +1,119 @@
+"""Normalized ``(tag, timestamp)`` index of tweet and quote hashtags.
+
+Mapper events keep ``tweet_hashtag`` in step with the posts themselves, so post
+creation, scheduled publication, quote creation, and moderation removal all
+maintain it inside the same flush. Scheduled tweets are left out until
+publication clears ``scheduled_at``, so readers need no visibility filter beyond
+the join. Existing data is indexed with :func:`backfill_hashtag_index`.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from sqlalchemy import delete, event, inspect, insert, select
+
+from twitclone.extensions import db
+from twitclone.models import Quote, Tweet, TweetHashtag
+from twitclone.trending import rebuild_trend_buckets, record_hashtag_uses
+from twitclone.utils.hashtags import extract_hashtags
+
+_TWEET_INDEXED_ATTRIBUTES = ("content", "timestamp", "scheduled_at", "is_removed")
+_QUOTE_INDEXED_ATTRIBUTES = ("content", "timestamp", "is_removed")
+
+
+@dataclass(frozen=True)
+class HashtagIndexBackfillResult:
+    posts: int = 0
+    hashtags: int = 0
+
+
+def _tweet_rows(tweet):
+    if tweet.is_removed or tweet.scheduled_at is not None:
+        return []
+    return [{"tweet_id": tweet.id, "quote_id": None, "tag": tag, "timestamp": tweet.timestamp} for tag in extract_hashtags(tweet.content)]
+
+
+def _quote_rows(quote):
+    if quote.is_removed:
+        return []
+    return [{"tweet_id": None, "quote_id": quote.id, "tag": tag, "timestamp": quote.timestamp} for tag in extract_hashtags(quote.content)]
+
+
+def _changed(target, attributes):
+    state = inspect(target)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+def _insert(connection, rows):
+    if rows:
+        connection.execute(insert(TweetHashtag), rows)
+        record_hashtag_uses(connection, [(row["tag"], row["timestamp"]) for row in rows], 1)
+
+
+def _delete(connection, condition):
+    removed = connection.execute(delete(TweetHashtag).where(condition).returning(TweetHashtag.tag, TweetHashtag.timestamp)).all()
+    record_hashtag_uses(connection, removed, -1)
+
+
+@event.listens_for(Tweet, "after_insert")
+def _index_new_tweet(_mapper, connection, tweet):
+    _insert(connection, _tweet_rows(tweet))
+
+
+@event.listens_for(Tweet, "after_update")
+def _reindex_tweet(_mapper, connection, tweet):
+    if not _changed(tweet, _TWEET_INDEXED_ATTRIBUTES):
+        return
+    _delete(connection, TweetHashtag.tweet_id == tweet.id)
+    _insert(connection, _tweet_rows(tweet))
+    if tweet.is_removed:
+        # Quotes of a removed tweet are hidden with it.
+        _delete(connection, TweetHashtag.quote_id.in_(select(Quote.id).where(Quote.tweet_id == tweet.id)))
+
+
+@event.listens_for(Quote, "after_insert")
+def _index_new_quote(_mapper, connection, quote):
+    _insert(connection, _quote_rows(quote))
+
+
+@event.listens_for(Quote, "after_update")
+def _reindex_quote(_mapper, connection, quote):
+    if _changed(quote, _QUOTE_INDEXED_ATTRIBUTES):
+        _delete(connection, TweetHashtag.quote_id == quote.id)
+        _insert(connection, _quote_rows(quote))
+
+
+def backfill_hashtag_index(*, batch_size=500):
+    """Rebuild index rows for every tweet and quote, committing one id range at a time.
+
+    Rerunning is safe: each batch replaces the rows of the posts it covers, and
+    the trend buckets are recounted from the finished index.
+    """
+    posts = hashtags = 0
+    sources = (
+        (Tweet, TweetHashtag.tweet_id, _tweet_rows, ()),
+        (Quote, TweetHashtag.quote_id, _quote_rows, (Quote.tweet.has(Tweet.is_removed.is_(False)),)),
+    )
+    for model, column, build_rows, filters in sources:
+        last_id = 0
+        while True:
+            batch = model.query.filter(model.id > last_id).order_by(model.id).limit(batch_size).all()
+            if not batch:
+                break
+            ids = [post.id for post in batch]
+            visible = set(db.session.scalars(select(model.id).where(model.id.in_(ids), *filters))) if filters else set(ids)
+            rows = [row for post in batch if post.id in visible for row in build_rows(post)]
+            connection = db.session.connection()
+            connection.execute(delete(TweetHashtag).where(column.in_(ids)))
+            if rows:
+                connection.execute(insert(TweetHashtag), rows)
+            db.session.commit()
+            posts += len(ids)
+            hashtags += len(rows)
+            last_id = ids[-1]
+    rebuild_trend_buckets()
+    return HashtagIndexBackfillResult(posts=posts, hashtags=hashtags)
+
+
+__all__ = ["HashtagIndexBackfillResult", "backfill_hashtag_index"]
@@ -0,0 +1,127 @@
+"""Image decoding and resizing off the request thread.
+
+``IMAGE_PIPELINE_WORKERS`` processes run Pillow work submitted through
+:class:`ImagePipeline`, so a large upload holds neither a gunicorn thread's
+CPU time nor the GIL while it decodes. At most ``IMAGE_PIPELINE_MAX_PENDING``
+jobs are queued or running per web process; beyond that, submissions fail
+fast with :class:`ImagePipelineBusy` instead of piling up. Callers wait at
+most ``IMAGE_PIPELINE_TIMEOUT_SECONDS`` for a result. With no workers, as in
+testing, jobs run inline and return completed futures, so the same code paths
+are exercised without spawning processes.
+
+Jobs must be importable module-level functions taking picklable arguments.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import logging
+import multiprocessing
+import threading
+
+from flask import current_app
+
+log = logging.getLogger("twitclone.image_pipeline")
+
+
+class ImagePipelineBusy(RuntimeError):
+    """Raised when the pipeline already holds ``max_pending`` jobs."""
+
+
+class ImagePipelineTimeout(TimeoutError):
+    """Raised when a job does not finish within the pipeline timeout; ``future`` is the abandoned job."""
+
+    def __init__(self, message: str, future: Future | None = None) -> None:
+        super().__init__(message)
+        self.future = future
+
+
+class ImagePipeline:
+    """Submit image jobs to a lazily started process pool, or inline without workers.
+
+    A job keeps its pending slot until it finishes, even after a caller gave
+    up waiting, because a running process cannot be interrupted.
+    """
+
+    def __init__(self, *, workers: int, max_pending: int, timeout_seconds: float) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout_seconds = timeout_seconds
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawned workers start clean instead of forking a threaded web process.
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def _finished(self, future: Future) -> None:
+        self._slots.release()
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            log.error("image_pipeline_broken", extra={"event": "image_pipeline_broken"})
+            with self._lock:
+                self._executor = None
+
+    def submit(self, job, *args) -> Future:
+        """Queue ``job(*args)`` and return its future, raising ``ImagePipelineBusy`` when full."""
+        if not self._slots.acquire(blocking=False):
+            raise ImagePipelineBusy("Image processing queue is full")
+        if not self.workers:
+            future = Future()
+            try:
+                future.set_result(job(*args))
+            except Exception as exc:
+                future.set_exception(exc)
+        else:
+            try:
+                future = self._pool().submit(job, *args)
+            except Exception:
+                self._slots.release()
+                raise
+        future.add_done_callback(self._finished)
+        return future
+
+    def run(self, job, *args):
+        """Run ``job(*args)`` and return its result, raising ``ImagePipelineTimeout`` when it is too slow."""
+        future = self.submit(job, *args)
+        try:
+            return future.result(timeout=self.timeout_seconds)
+        except FutureTimeoutError as exc:
+            future.cancel()
+            raise ImagePipelineTimeout("Image processing timed out", future) from exc
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def build_image_pipeline(config) -> ImagePipeline:
+    return ImagePipeline(
+        workers=config["IMAGE_PIPELINE_WORKERS"],
+        max_pending=config["IMAGE_PIPELINE_MAX_PENDING"],
+        timeout_seconds=config["IMAGE_PIPELINE_TIMEOUT_SECONDS"],
+    )
+
+
+def init_image_pipeline(app) -> None:
+    app.extensions["image_pipeline"] = build_image_pipeline(app.config)
+
+
+def get_image_pipeline() -> ImagePipeline:
+    return current_app.extensions["image_pipeline"]
+
+
+__all__ = [
+    "ImagePipeline",
+    "ImagePipelineBusy",
+    "ImagePipelineTimeout",
+    "build_image_pipeline",
+    "get_image_pipeline",
+    "init_image_pipeline",
+]
@@ -1,24 +1,111 @@
-"""Filesystem and private S3-compatible media storage adapters."""
+"""Filesystem and private S3-compatible media storage adapters.
+
+``get()`` reads a whole object into memory for tools such as the media
+migration. Serving uses ``open()``, which returns a :class:`MediaStream`: a
+path on disk for the filesystem adapter, so ``send_file`` can hand the file to
+the server without copying it, or the S3 response body, read in
+``MEDIA_STREAM_CHUNK_BYTES`` chunks. The S3 adapter passes a single ``Range``
+and ``If-None-Match`` through to the bucket.
+
+With ``MEDIA_S3_DELIVERY=redirect`` the S3 adapter instead hands out
+presigned ``GET`` URLs from ``delivery_url()``, so the bytes go straight from
+the bucket to the browser. Each object's URL is reused until the last fifth of
+its lifetime, which keeps browser and CDN caches keyed on one URL.
+
+:class:`CachingMediaStorage` wraps another adapter with a read-through cache
+on local disk, bounded by ``MEDIA_CACHE_MAX_BYTES`` and evicting the least
+recently served objects first. Upload names are never reused for different
+bytes, so a cached copy stays valid until the object is deleted.
+"""
 
 from __future__ import annotations
 
+from collections import OrderedDict
 from dataclasses import dataclass
 import mimetypes
+import os
 from pathlib import Path, PurePosixPath
+import threading
+import time
 
 from flask import current_app
 
+MEDIA_STREAM_CHUNK_BYTES = 64 * 1024
+SIGNED_URL_CACHE_ENTRIES = 10_000
+
 
 class MediaNotFound(FileNotFoundError):
     """Raised when a requested media object does not exist."""
 
 
+class MediaNotModified(Exception):
+    """Raised when the object still matches the caller's ``If-None-Match`` ETag."""
+
+    def __init__(self, name, *, etag=None):
+        super().__init__(name)
+        self.etag = etag
+
+
+class MediaRangeNotSatisfiable(Exception):
+    """Raised when a requested byte range lies outside the object."""
+
+
 @dataclass(frozen=True)
 class StoredMedia:
     content: bytes
     content_type: str
 
 
+@dataclass(frozen=True)
+class MediaStream:
+    """An opened media object, read from ``path`` or in chunks from ``body``.
+
+    ``size`` is the number of bytes that will be read. ``content_range`` is the
+    ``Content-Range`` value when ``body`` holds only part of the object.
+    """
+
+    content_type: str
+    size: int
+    path: Path | None = None
+    body: object | None = None
+    etag: str | None = None
+    content_range: str | None = None
+
+    @property
+    def partial(self) -> bool:
+        return self.content_range is not None
+
+    def iter_chunks(self, chunk_size: int = MEDIA_STREAM_CHUNK_BYTES):
+        if self.path is not None:
+            with self.path.open("rb") as handle:
+                while chunk := handle.read(chunk_size):
+                    yield chunk
+            return
+        while chunk := self.body.read(chunk_size):
+            yield chunk
+
+    def close(self) -> None:
+        if self.body is not None:
+            self.body.close()
+
+
+@dataclass(frozen=True)
+class MediaCacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size: int
+
+
+@dataclass(frozen=True)
+class SignedMediaUrl:
+    """A presigned URL and how many more seconds clients may reuse it."""
+
+    url: str
+    max_age: int
+
+
 def _safe_name(name: str) -> str:
     candidate = PurePosixPath(name)
     if not name or candidate.name != name or name in {".", ".."}:
@@ -35,6 +122,9 @@ class FileSystemMediaStorage:
         self.root = Path(root)
         self.root.mkdir(parents=True, exist_ok=True)
 
+    def delivery_url(self, name: str) -> SignedMediaUrl | None:
+        return None
+
     def put(self, name: str, content: bytes, *, content_type: str | None = None) -> None:
         (self.root / _safe_name(name)).write_bytes(content)
 
@@ -45,12 +135,32 @@ class FileSystemMediaStorage:
         except FileNotFoundError as exc:
             raise MediaNotFound(name) from exc
 
+    def open(self, name: str, *, byte_range: str | None = None, if_none_match: str | None = None) -> MediaStream:
+        """Return the file's path; ``send_file`` answers ranges and ETags from it."""
+        path = self.root / _safe_name(name)
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError as exc:
+            raise MediaNotFound(name) from exc
+        return MediaStream(_content_type(name), size, path=path)
+
     def delete(self, name: str) -> None:
         (self.root / _safe_name(name)).unlink(missing_ok=True)
 
 
 class S3MediaStorage:
-    def __init__(self, *, bucket, region, endpoint_url=None, prefix="media", client=None):
+    def __init__(
+        self,
+        *,
+        bucket,
+        region,
+        endpoint_url=None,
+        prefix="media",
+        client=None,
+        delivery="proxy",
+        url_expires_seconds=900,
+        clock=time.monotonic,
+    ):
         if client is None:
             import boto3
 
@@ -58,6 +168,11 @@ class S3MediaStorage:
         self.client = client
         self.bucket = bucket
         self.prefix = prefix.strip("/")
+        self.delivery = delivery
+        self.url_expires_seconds = url_expires_seconds
+        self._clock = clock
+        self._signed_urls: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._signed_urls_lock = threading.Lock()
 
     def _key(self, name: str) -> str:
         safe_name = _safe_name(name)
@@ -71,24 +186,224 @@ class S3MediaStorage:
             ContentType=content_type or _content_type(name),
         )
 
-    def get(self, name: str) -> StoredMedia:
+    def _get_object(self, name: str, **options):
         try:
-            response = self.client.get_object(Bucket=self.bucket, Key=self._key(name))
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(name), **options)
         except Exception as exc:
-            code = str(getattr(exc, "response", {}).get("Error", {}).get("Code", ""))
+            error = getattr(exc, "response", {})
+            code = str(error.get("Error", {}).get("Code", ""))
             if code in {"NoSuchKey", "404", "NotFound"}:
                 raise MediaNotFound(name) from exc
+            if code in {"NotModified", "304"}:
+                etag = error.get("ResponseMetadata", {}).get("HTTPHeaders", {}).get("etag")
+                raise MediaNotModified(name, etag=etag) from exc
+            if code in {"InvalidRange", "416"}:
+                raise MediaRangeNotSatisfiable(name) from exc
             raise
+
+    def get(self, name: str) -> StoredMedia:
+        response = self._get_object(name)
         return StoredMedia(
             response["Body"].read(),
             response.get("ContentType") or _content_type(name),
         )
 
+    def open(self, name: str, *, byte_range: str | None = None, if_none_match: str | None = None) -> MediaStream:
+        """Start a GET for ``name`` and return its unread body.
+
+        ``byte_range`` is a single ``bytes=`` range and ``if_none_match`` an
+        ``If-None-Match`` header value; the bucket evaluates both.
+        """
+        options = {}
+        if byte_range:
+            options["Range"] = byte_range
+        if if_none_match:
+            options["IfNoneMatch"] = if_none_match
+        response = self._get_object(name, **options)
+        return MediaStream(
+            response.get("ContentType") or _content_type(name),
+            response["ContentLength"],
+            body=response["Body"],
+            etag=response.get("ETag"),
+            content_range=response.get("ContentRange") if byte_range else None,
+        )
+
+    def delivery_url(self, name: str) -> SignedMediaUrl | None:
+        """Return a presigned ``GET`` URL in redirect mode, reusing a cached one until near expiry."""
+        if self.delivery != "redirect":
+            return None
+        key = self._key(name)
+        reuse_for = self.url_expires_seconds - self.url_expires_seconds // 5
+        now = self._clock()
+        with self._signed_urls_lock:
+            cached = self._signed_urls.get(key)
+            if cached is not None and now < cached[1] + reuse_for:
+                self._signed_urls.move_to_end(key)
+                return SignedMediaUrl(cached[0], int(cached[1] + reuse_for - now))
+        url = self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=self.url_expires_seconds,
+        )
+        with self._signed_urls_lock:
+            self._signed_urls[key] = (url, now)
+            self._signed_urls.move_to_end(key)
+            while len(self._signed_urls) > SIGNED_URL_CACHE_ENTRIES:
+                self._signed_urls.popitem(last=False)
+        return SignedMediaUrl(url, reuse_for)
+
     def delete(self, name: str) -> None:
+        with self._signed_urls_lock:
+            self._signed_urls.pop(self._key(name), None)
         self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
 
 
+class CachingMediaStorage:
+    """Serve recently read objects of ``inner`` from a local directory.
+
+    The index maps each cached name to its size and content type in least
+    recently served order, and objects are evicted from the front until the
+    directory holds at most ``max_bytes``. Objects larger than
+    ``max_object_bytes`` are streamed from ``inner`` without being cached, as
+    are conditional and range requests that miss. Worker processes sharing a
+    directory keep separate indexes; a file another process evicted is treated
+    as a miss.
+    """
+
+    def __init__(self, inner, directory, *, max_bytes: int, max_object_bytes: int | None = None) -> None:
+        self.inner = inner
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_object_bytes = min(max_bytes, max_bytes // 8 if max_object_bytes is None else max_object_bytes)
+        self.hits = self.misses = self.evictions = 0
+        self._entries: OrderedDict[str, tuple[int, str]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self) -> None:
+        # Hits leave modification times alone so ``send_file`` ETags stay
+        # stable, so after a restart the index starts in fill order.
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith("."):
+                continue
+            try:
+                status = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((status.st_mtime, entry.name, status.st_size))
+        with self._lock:
+            for _mtime, name, size in sorted(files):
+                self._add(name, size, _content_type(name))
+
+    def _add(self, name: str, size: int, content_type: str) -> None:
+        # Caller holds the lock.
+        previous = self._entries.pop(name, None)
+        if previous is not None:
+            self._size -= previous[0]
+        self._entries[name] = (size, content_type)
+        self._size += size
+        while self._size > self.max_bytes and self._entries:
+            evicted, (evicted_size, _) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+            self.evictions += 1
+            (self.directory / evicted).unlink(missing_ok=True)
+
+    def _forget(self, name: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(name, None)
+            if entry is not None:
+                self._size -= entry[0]
+        (self.directory / name).unlink(missing_ok=True)
+
+    def _lookup(self, name: str) -> tuple[Path, int, str] | None:
+        path = self.directory / _safe_name(name)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and path.exists():
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return path, *entry
+            if entry is not None:
+                del self._entries[name]
+                self._size -= entry[0]
+            self.misses += 1
+        return None
+
+    def _store(self, name: str, chunks, content_type: str) -> Path:
+        path = self.directory / name
+        temporary = path.with_name(f".{name}.{os.getpid()}.{threading.get_ident()}")
+        size = 0
+        try:
+            with temporary.open("wb") as handle:
+                for chunk in chunks:
+                    handle.write(chunk)
+                    size += len(chunk)
+            os.replace(temporary, path)
+        finally:
+            temporary.unlink(missing_ok=True)
+        with self._lock:
+            self._add(name, size, content_type)
+        return path
+
+    def stats(self) -> MediaCacheStats:
+        with self._lock:
+            return MediaCacheStats(self.hits, self.misses, self.evictions, len(self._entries), self._size)
+
+    def delivery_url(self, name: str) -> SignedMediaUrl | None:
+        return self.inner.delivery_url(name)
+
+    def put(self, name: str, content: bytes, *, content_type: str | None = None) -> None:
+        self.inner.put(name, content, content_type=content_type)
+        if len(content) <= self.max_object_bytes:
+            self._store(_safe_name(name), [content], content_type or _content_type(name))
+
+    def get(self, name: str) -> StoredMedia:
+        cached = self._lookup(name)
+        if cached is not None:
+            path, _size, content_type = cached
+            try:
+                return StoredMedia(path.read_bytes(), content_type)
+            except FileNotFoundError:
+                pass
+        stored = self.inner.get(name)
+        if len(stored.content) <= self.max_object_bytes:
+            self._store(name, [stored.content], stored.content_type)
+        return stored
+
+    def open(self, name: str, *, byte_range: str | None = None, if_none_match: str | None = None) -> MediaStream:
+        """Return the cached file's path, filling the cache from ``inner`` on a plain miss."""
+        cached = self._lookup(name)
+        if cached is not None:
+            path, size, content_type = cached
+            return MediaStream(content_type, size, path=path)
+        if byte_range or if_none_match:
+            return self.inner.open(name, byte_range=byte_range, if_none_match=if_none_match)
+        media = self.inner.open(name)
+        if media.size > self.max_object_bytes:
+            return media
+        try:
+            path = self._store(name, media.iter_chunks(), media.content_type)
+        finally:
+            media.close()
+        return MediaStream(media.content_type, media.size, path=path)
+
+    def delete(self, name: str) -> None:
+        self._forget(_safe_name(name))
+        self.inner.delete(name)
+
+
 def build_media_storage(config, *, client=None):
+    storage = _build_adapter(config, client=client)
+    max_bytes = config.get("MEDIA_CACHE_MAX_BYTES", 0)
+    if max_bytes and not isinstance(storage, FileSystemMediaStorage):
+        storage = CachingMediaStorage(storage, config["MEDIA_CACHE_DIR"], max_bytes=max_bytes)
+    return storage
+
+
+def _build_adapter(config, *, client=None):
     backend = config.get("MEDIA_STORAGE_BACKEND", "filesystem").lower()
     if backend == "filesystem":
         return FileSystemMediaStorage(config["UPLOAD_FOLDER"])
@@ -99,6 +414,8 @@ def build_media_storage(config, *, client=None):
             endpoint_url=config.get("MEDIA_S3_ENDPOINT_URL"),
             prefix=config.get("MEDIA_S3_PREFIX", "media"),
             client=client,
+            delivery=config.get("MEDIA_S3_DELIVERY", "proxy"),
+            url_expires_seconds=config.get("MEDIA_S3_URL_EXPIRES_SECONDS", 900),
         )
     raise RuntimeError(f"Unsupported MEDIA_STORAGE_BACKEND: {backend}")
 
@@ -112,9 +429,16 @@ def get_media_storage():
 
 
 __all__ = [
+    "CachingMediaStorage",
     "FileSystemMediaStorage",
+    "MEDIA_STREAM_CHUNK_BYTES",
+    "MediaCacheStats",
     "MediaNotFound",
+    "MediaNotModified",
+    "MediaRangeNotSatisfiable",
+    "MediaStream",
     "S3MediaStorage",
+    "SignedMediaUrl",
     "StoredMedia",
     "build_media_storage",
     "get_media_storage",
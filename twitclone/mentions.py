@@ -3,7 +3,9 @@
 import re
 
 from twitclone.extensions import db
-from twitclone.models import Notification, User
+from twitclone.models import User
+from twitclone.notifications.service import notify_activity
+from twitclone.realtime.broker import announce_unread_counts
 
 MENTION_RE = re.compile(r"(?<![\w@])@([A-Za-z0-9_]+)")
 
@@ -21,13 +23,8 @@ def add_mention_notifications(*, content: str, author: User, tweet_id: int) -> i
     users = User.query.filter(db.func.lower(User.username).in_(usernames)).all()
     recipients = [user for user in users if user.id != author.id]
     for user in recipients:
-        db.session.add(
-            Notification(
-                user_id=user.id,
-                message=f"{author.username} mentioned you in a post",
-                tweet_id=tweet_id,
-            )
-        )
+        notify_activity(user.id, "mention", author, tweet_id=tweet_id)
+        announce_unread_counts(user.id)
     return len(recipients)
 
 
@@ -0,0 +1,294 @@
+"""Direct-message conversations and their keyset-paginated inbox.
+
+Every pair of users shares one ``conversation`` row holding the pair in id
+order, a pointer to the newest message, and each participant's unread count.
+Mapper events keep it in step with ``direct_message`` inside the same flush:
+a message joins (or starts) its pair's conversation before insert and moves
+the pointer after, read and receiver-deletion changes adjust the unread
+counts, and deleting the newest message repoints the conversation first.
+Bulk ``UPDATE`` statements bypass those events, so :func:`mark_inbox_page_read`
+adjusts the counts itself.
+
+The inbox pages conversations by ``(last_message_at, id)`` and a thread pages
+its messages by ``(timestamp, id)``, each walking an index, so neither reads
+more rows than it shows however long the history grows.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+
+from sqlalchemy import case, event, inspect, select, true, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import joinedload
+
+from twitclone.counters import adjust_user_counters
+from twitclone.extensions import db
+from twitclone.models import Conversation, DirectMessage
+
+INBOX_PAGE_SIZE = 20
+THREAD_PAGE_SIZE = 30
+
+
+def participants(sender_id, receiver_id):
+    return min(sender_id, receiver_id), max(sender_id, receiver_id)
+
+
+def _unread_column(message):
+    return "first_unread" if message.receiver_id < message.sender_id else "second_unread"
+
+
+def _unread(target, *, previous=False):
+    state = inspect(target)
+
+    def value(name):
+        history = state.attrs[name].history
+        if previous and history.deleted:
+            return history.deleted[0]
+        return getattr(target, name)
+
+    return int(not value("read") and not value("deleted_by_receiver"))
+
+
+def _keep_previous_value(_target, value, _oldvalue, _initiator):
+    return value
+
+
+for _name in ("read", "deleted_by_receiver"):
+    event.listen(getattr(DirectMessage, _name), "set", _keep_previous_value, active_history=True, retval=True)
+
+
+def _conversation_id(connection, sender_id, receiver_id, timestamp):
+    first, second = participants(sender_id, receiver_id)
+    lookup = select(Conversation.id).where(Conversation.first_user_id == first, Conversation.second_user_id == second)
+    conversation_id = connection.scalar(lookup)
+    if conversation_id is None:
+        dialect_insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+        connection.execute(
+            dialect_insert(Conversation)
+            .values(first_user_id=first, second_user_id=second, last_message_at=timestamp, first_unread=0, second_unread=0)
+            .on_conflict_do_nothing(index_elements=["first_user_id", "second_user_id"])
+        )
+        conversation_id = connection.scalar(lookup)
+    return conversation_id
+
+
+@event.listens_for(DirectMessage, "before_insert")
+def _join_conversation(_mapper, connection, message):
+    if message.timestamp is None:
+        message.timestamp = datetime.now(UTC).replace(tzinfo=None)
+    if message.conversation_id is None:
+        message.conversation_id = _conversation_id(connection, message.sender_id, message.receiver_id, message.timestamp)
+
+
+@event.listens_for(DirectMessage, "after_insert")
+def _advance_conversation(_mapper, connection, message):
+    column = getattr(Conversation, _unread_column(message))
+    connection.execute(
+        update(Conversation)
+        .where(Conversation.id == message.conversation_id)
+        .values({"last_message_id": message.id, "last_message_at": message.timestamp, column: column + _unread(message)})
+    )
+
+
+@event.listens_for(DirectMessage, "after_update")
+def _recount_conversation(_mapper, connection, message):
+    delta = _unread(message) - _unread(message, previous=True)
+    if delta:
+        column = getattr(Conversation, _unread_column(message))
+        connection.execute(update(Conversation).where(Conversation.id == message.conversation_id).values({column: column + delta}))
+
+
+@event.listens_for(DirectMessage, "before_delete")
+def _repoint_conversation(_mapper, connection, message):
+    # Runs before the DELETE so the pointer never names a missing row.
+    column = getattr(Conversation, _unread_column(message))
+    previous = (
+        select(DirectMessage.id, DirectMessage.timestamp)
+        .where(DirectMessage.conversation_id == message.conversation_id, DirectMessage.id != message.id)
+        .order_by(DirectMessage.timestamp.desc(), DirectMessage.id.desc())
+        .limit(1)
+    )
+    values = {column: column - _unread(message, previous=True)}
+    row = connection.execute(previous).first()
+    if row is not None:
+        is_last = Conversation.last_message_id == message.id
+        values.update(
+            last_message_id=case((is_last, row.id), else_=Conversation.last_message_id),
+            last_message_at=case((is_last, row.timestamp), else_=Conversation.last_message_at),
+        )
+    else:
+        # last_message_at is required, so an emptied conversation keeps its last activity time.
+        values.update(last_message_id=None)
+    connection.execute(update(Conversation).where(Conversation.id == message.conversation_id).values(values))
+
+
+@dataclass(frozen=True)
+class ConversationCursor:
+    """Position in a newest-first ``(timestamp, id)`` order: conversations by last activity, messages by send time."""
+
+    timestamp: datetime
+    id: int
+
+    def encode(self):
+        raw = f"{self.timestamp.isoformat()}|{self.id}".encode("ascii")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    @classmethod
+    def decode(cls, token):
+        """Parse an opaque cursor, raising ``ValueError`` for anything malformed."""
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("ascii")
+            timestamp, row_id = raw.split("|")
+            return cls(datetime.fromisoformat(timestamp), int(row_id))
+        except (binascii.Error, UnicodeError, TypeError, ValueError) as exc:
+            raise ValueError("Invalid conversation cursor") from exc
+
+
+def _older_than(timestamp_column, id_column, before):
+    if not before:
+        return true()
+    cursor = ConversationCursor.decode(before)
+    return (timestamp_column < cursor.timestamp) | ((timestamp_column == cursor.timestamp) & (id_column < cursor.id))
+
+
+def _inbox_ids(user_id, before, limit):
+    """Ids of ``user_id``'s newest conversations, merged from one index walk per participant column."""
+    older = _older_than(Conversation.last_message_at, Conversation.id, before)
+    sides = [
+        select(Conversation.id, Conversation.last_message_at)
+        .where(column == user_id, older)
+        .order_by(Conversation.last_message_at.desc(), Conversation.id.desc())
+        .limit(limit)
+        .subquery()
+        for column in (Conversation.first_user_id, Conversation.second_user_id)
+    ]
+    merged = union_all(*(select(side.c.id, side.c.last_message_at) for side in sides)).subquery()
+    return select(merged.c.id).order_by(merged.c.last_message_at.desc(), merged.c.id.desc()).limit(limit)
+
+
+@dataclass(frozen=True)
+class InboxPage:
+    """Up to ``per_page`` conversations strictly older than ``cursor``.
+
+    ``unread`` maps each conversation this request marked read to the number
+    of messages it marked, so the page can still show them as new.
+    """
+
+    items: list
+    cursor: str | None
+    next_cursor: str | None
+    unread: dict = field(default_factory=dict)
+
+    @property
+    def has_next(self): return self.next_cursor is not None
+
+
+def mark_inbox_page_read(user_id, *, before=None, per_page=INBOX_PAGE_SIZE) -> dict:
+    """Mark the messages ``user_id`` received in one inbox page's conversations read.
+
+    Returns ``{conversation_id: messages marked}``; the caller commits.
+    """
+    page_ids = _inbox_ids(user_id, before, per_page).scalar_subquery()
+    return _mark_read(user_id, DirectMessage.conversation_id.in_(page_ids))
+
+
+def mark_conversation_read(user_id, conversation_id) -> int:
+    return _mark_read(user_id, DirectMessage.conversation_id == conversation_id).get(conversation_id, 0)
+
+
+def _mark_read(user_id, scope) -> dict:
+    marked = Counter(
+        db.session.scalars(
+            update(DirectMessage)
+            .where(scope, DirectMessage.receiver_id == user_id, DirectMessage.read.is_(False), DirectMessage.deleted_by_receiver.is_(False))
+            .values(read=True)
+            .returning(DirectMessage.conversation_id)
+            .execution_options(synchronize_session=False)
+        )
+    )
+    if marked:
+        db.session.execute(
+            update(Conversation)
+            .where(Conversation.id.in_(list(marked)))
+            .values(
+                first_unread=case((Conversation.first_user_id == user_id, 0), else_=Conversation.first_unread),
+                second_unread=case((Conversation.second_user_id == user_id, 0), else_=Conversation.second_unread),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        adjust_user_counters(user_id, unread_messages=-marked.total())
+    return dict(marked)
+
+
+def inbox_page(user_id, *, before=None, per_page=INBOX_PAGE_SIZE, unread=None) -> InboxPage:
+    """Load ``user_id``'s conversations newest first, with both participants and the last message.
+
+    ``ValueError`` is raised for a malformed ``before`` cursor.
+    """
+    ids = _inbox_ids(user_id, before, per_page + 1).subquery()
+    rows = db.session.scalars(
+        select(Conversation)
+        .join(ids, ids.c.id == Conversation.id)
+        .options(joinedload(Conversation.first_user), joinedload(Conversation.second_user), joinedload(Conversation.last_message))
+        .order_by(Conversation.last_message_at.desc(), Conversation.id.desc())
+    ).all()
+    items = rows[:per_page]
+    next_cursor = ConversationCursor(items[-1].last_message_at, items[-1].id).encode() if len(rows) > per_page else None
+    return InboxPage(items=items, cursor=before or None, next_cursor=next_cursor, unread=unread or {})
+
+
+@dataclass(frozen=True)
+class ThreadPage:
+    """The newest ``per_page`` visible messages older than ``cursor``, oldest first for reading."""
+
+    conversation: Conversation
+    messages: list
+    cursor: str | None
+    next_cursor: str | None
+
+    @property
+    def has_next(self): return self.next_cursor is not None
+
+
+def get_conversation(user_id, conversation_id):
+    """Return the conversation if ``user_id`` takes part in it, else ``None``."""
+    conversation = db.session.get(Conversation, conversation_id)
+    if conversation is None or user_id not in (conversation.first_user_id, conversation.second_user_id):
+        return None
+    return conversation
+
+
+def thread_page(user_id, conversation, *, before=None, per_page=THREAD_PAGE_SIZE) -> ThreadPage:
+    """Page the messages of ``conversation`` that ``user_id`` has not deleted, walking its ``(timestamp, id)`` index."""
+    visible = ((DirectMessage.sender_id == user_id) & DirectMessage.deleted_by_sender.is_(False)) | (
+        (DirectMessage.receiver_id == user_id) & DirectMessage.deleted_by_receiver.is_(False)
+    )
+    rows = db.session.scalars(
+        select(DirectMessage)
+        .where(DirectMessage.conversation_id == conversation.id, visible, _older_than(DirectMessage.timestamp, DirectMessage.id, before))
+        .order_by(DirectMessage.timestamp.desc(), DirectMessage.id.desc())
+        .limit(per_page + 1)
+    ).all()
+    messages = rows[:per_page]
+    next_cursor = ConversationCursor(messages[-1].timestamp, messages[-1].id).encode() if len(rows) > per_page else None
+    return ThreadPage(conversation=conversation, messages=messages[::-1], cursor=before or None, next_cursor=next_cursor)
+
+
+__all__ = [
+    "ConversationCursor",
+    "INBOX_PAGE_SIZE",
+    "InboxPage",
+    "THREAD_PAGE_SIZE",
+    "ThreadPage",
+    "get_conversation",
+    "inbox_page",
+    "mark_conversation_read",
+    "mark_inbox_page_read",
+    "participants",
+    "thread_page",
+]
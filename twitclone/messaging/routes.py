@@ -1,45 +1,76 @@
-"""Direct-message inbox, compose, reply, and deletion routes."""
+"""Direct-message inbox, conversation, compose, reply, and deletion routes."""
 
 from flask import abort, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
+from twitclone.counters import adjust_user_counters
 from twitclone.extensions import db
 from twitclone.messaging import messaging_blueprint
+from twitclone.messaging.conversations import (
+    get_conversation,
+    inbox_page,
+    mark_conversation_read,
+    mark_inbox_page_read,
+    thread_page,
+)
 from twitclone.messaging.validation import validate_message_content
 from twitclone.models import DirectMessage, Notification, User
+from twitclone.realtime.broker import announce_unread_counts
 
 
 @login_required
 def messages():
-    unread_messages = DirectMessage.query.filter_by(
-        receiver_id=current_user.id,
-        read=False,
-        deleted_by_receiver=False,
-    )
-    if unread_messages.update({"read": True}, synchronize_session=False):
+    """List conversations by last activity, marking the displayed page read."""
+    before = request.args.get("before")
+    try:
+        unread = mark_inbox_page_read(current_user.id, before=before)
+    except ValueError:
+        return redirect(url_for("messages"))
+    if unread:
+        announce_unread_counts(current_user.id)
         db.session.commit()
+    page = inbox_page(current_user.id, before=before, unread=unread)
+    return render_template("messages.html", inbox_page=page, conversations=page.items)
 
-    received_messages = (
-        DirectMessage.query.filter_by(
-            receiver_id=current_user.id,
-            deleted_by_receiver=False,
-        )
-        .order_by(DirectMessage.timestamp.desc())
-        .all()
-    )
-    sent_messages = (
-        DirectMessage.query.filter_by(
-            sender_id=current_user.id,
-            deleted_by_sender=False,
-        )
-        .order_by(DirectMessage.timestamp.desc())
-        .all()
-    )
-    return render_template(
-        "messages.html",
-        messages=received_messages,
-        sent_messages=sent_messages,
-    )
+
+@login_required
+def conversation(conversation_id):
+    """Show one conversation a page at a time and send messages into it."""
+    thread = get_conversation(current_user.id, conversation_id)
+    if thread is None:
+        abort(404)
+    recipient = thread.other_user(current_user.id)
+
+    if request.method == "POST":
+        content = request.form.get("content")
+        validation_error = validate_message_content(content)
+        if validation_error:
+            flash(validation_error, "danger")
+        else:
+            message = DirectMessage(
+                content=content.strip(),
+                sender_id=current_user.id,
+                receiver_id=recipient.id,
+                conversation_id=thread.id,
+            )
+            notification = Notification(
+                user_id=recipient.id,
+                message=f"{current_user.username} sent you a message",
+            )
+            db.session.add_all([message, notification])
+            announce_unread_counts(recipient.id)
+            db.session.commit()
+        return redirect(url_for("conversation", conversation_id=conversation_id))
+
+    before = request.args.get("before")
+    if not before and mark_conversation_read(current_user.id, thread.id):
+        announce_unread_counts(current_user.id)
+        db.session.commit()
+    try:
+        page = thread_page(current_user.id, thread, before=before)
+    except ValueError:
+        return redirect(url_for("conversation", conversation_id=conversation_id))
+    return render_template("conversation.html", thread=page, recipient=recipient)
 
 
 @login_required
@@ -72,6 +103,7 @@ def new_message():
                     message=f"{current_user.username} sent you a message",
                 )
                 db.session.add_all([message, notification])
+                announce_unread_counts(recipient.id)
                 db.session.commit()
                 flash(
                     f"Your message to {recipient.username} has been sent.",
@@ -106,6 +138,7 @@ def reply_message(message_id):
             message=f"{current_user.username} replied to your message",
         )
         db.session.add_all([reply, notification])
+        announce_unread_counts(message.sender_id)
         db.session.commit()
         flash("Your reply has been sent!", "success")
         return redirect(url_for("messages"))
@@ -127,18 +160,25 @@ def delete_message(message_id):
     else:
         abort(404)
 
+    conversation_id = message.conversation_id
     if message.deleted_by_sender and message.deleted_by_receiver:
         db.session.delete(message)
 
     db.session.commit()
     flash("Message deleted from your view.", "success")
-    return redirect(url_for("messages"))
+    return redirect(url_for("conversation", conversation_id=conversation_id))
 
 
 @messaging_blueprint.record_once
 def register_messaging_routes(state):
     """Register routes while retaining existing endpoint names."""
     state.app.add_url_rule("/messages", endpoint="messages", view_func=messages)
+    state.app.add_url_rule(
+        "/messages/<int:conversation_id>",
+        endpoint="conversation",
+        view_func=conversation,
+        methods=["GET", "POST"],
+    )
     state.app.add_url_rule(
         "/messages/new",
         endpoint="new_message",
@@ -179,18 +179,69 @@ class DirectMessage(db.Model):
     read = db.Column(db.Boolean, default=False, server_default=db.false(), nullable=False)
     deleted_by_sender = db.Column(db.Boolean, default=False, server_default=db.false(), nullable=False)
     deleted_by_receiver = db.Column(db.Boolean, default=False, server_default=db.false(), nullable=False)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversation.id'), nullable=False)
     sender = db.relationship('User', foreign_keys=[sender_id], backref='sent_messages')
     receiver = db.relationship('User', foreign_keys=[receiver_id], backref='received_messages')
 
+    def visible_to(self, user_id):
+        if self.sender_id == user_id:
+            return not self.deleted_by_sender
+        return self.receiver_id == user_id and not self.deleted_by_receiver
+
+
+class Conversation(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('first_user_id', 'second_user_id', name='uq_conversation_participants'),
+        db.CheckConstraint('first_user_id <= second_user_id', name='ck_conversation_participant_order'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    first_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    second_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Not a foreign key: direct_message already references conversation, and deletes repoint this first.
+    last_message_id = db.Column(db.Integer, nullable=True)
+    last_message_at = db.Column(db.DateTime, nullable=False)
+    first_unread = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    second_unread = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    first_user = db.relationship('User', foreign_keys=[first_user_id])
+    second_user = db.relationship('User', foreign_keys=[second_user_id])
+    last_message = db.relationship('DirectMessage', primaryjoin='foreign(Conversation.last_message_id) == DirectMessage.id', viewonly=True)
+
+    def other_user(self, user_id):
+        return self.second_user if self.first_user_id == user_id else self.first_user
+
+    def unread_for(self, user_id):
+        return self.first_unread if self.first_user_id == user_id else self.second_unread
+
 
 class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     message = db.Column(db.String(200), nullable=False)
-    timestamp = db.Column(db.DateTime, default=_utcnow)
+    timestamp = db.Column(db.DateTime, default=_utcnow, server_default=db.func.current_timestamp(), nullable=False)
     read = db.Column(db.Boolean, default=False, server_default=db.false(), nullable=False)
     tweet_id = db.Column(db.Integer, db.ForeignKey('tweet.id'), nullable=True)
+    kind = db.Column(db.String(20), nullable=True)
+    actor_count = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    # Newest actors first, kept only to render the message; notification_actor holds every actor.
+    actor_ids = db.Column(db.JSON, nullable=True)
     tweet = db.relationship('Tweet', foreign_keys=[tweet_id])
+    actors = db.relationship('NotificationActor', cascade='all, delete-orphan')
+
+
+class NotificationActor(db.Model):
+    notification_id = db.Column(db.Integer, db.ForeignKey('notification.id', ondelete='CASCADE'), primary_key=True)
+    actor_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+
+
+class NotificationArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    message = db.Column(db.String(200), nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False)
+    tweet_id = db.Column(db.Integer, db.ForeignKey('tweet.id'), nullable=True)
+    kind = db.Column(db.String(20), nullable=True)
+    actor_count = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    archived_at = db.Column(db.DateTime, nullable=False, default=_utcnow)
 
 
 class PostReport(db.Model):
@@ -284,6 +335,73 @@ class PollVote(db.Model):
     option = db.relationship('PollOption', backref=db.backref('vote_records', lazy=True))
 
 
+class HomeTimelineEntry(db.Model):
+    __table_args__ = (db.UniqueConstraint('user_id', 'post_type', 'source_id', name='uq_home_timeline_entry_user_post'),)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    post_type = db.Column(db.String(20), nullable=False)
+    source_id = db.Column(db.Integer, nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False)
+    priority = db.Column(db.Integer, nullable=False)
+
+
+class FanoutExemptAuthor(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    follower_count = db.Column(db.Integer, nullable=False)
+    exempted_at = db.Column(db.DateTime, nullable=False, default=_utcnow)
+
+
+class TweetHashtag(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('tweet_id', 'tag', name='uq_tweet_hashtag_tweet_tag'),
+        db.UniqueConstraint('quote_id', 'tag', name='uq_tweet_hashtag_quote_tag'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    tweet_id = db.Column(db.Integer, db.ForeignKey('tweet.id'), nullable=True)
+    quote_id = db.Column(db.Integer, db.ForeignKey('quote.id'), nullable=True)
+    tag = db.Column(db.String(144), nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False)
+
+
+class HashtagTrendBucket(db.Model):
+    tag = db.Column(db.String(144), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class TrendingHashtag(db.Model):
+    rank = db.Column(db.Integer, primary_key=True)
+    tag = db.Column(db.String(144), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+
+class UserCounters(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    unread_notifications = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    unread_messages = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    followed_hashtags = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+
+class SiteCounter(db.Model):
+    name = db.Column(db.String(40), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+
+class MediaRendition(db.Model):
+    __table_args__ = (db.UniqueConstraint('source', 'format', 'width', name='uq_media_rendition_source_format_width'),)
+    id = db.Column(db.Integer, primary_key=True)
+    # Storage name of the original upload the rendition was made from.
+    source = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+    format = db.Column(db.String(10), nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=_utcnow)
+
+
 class ScheduledPost(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
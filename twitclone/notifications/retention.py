@@ -0,0 +1,99 @@
+"""Retention of read notifications.
+
+The scheduled worker prunes read notifications older than
+``NOTIFICATION_RETENTION_DAYS`` every ``NOTIFICATION_RETENTION_INTERVAL_SECONDS``.
+``NOTIFICATION_RETENTION_MODE`` either deletes them or first copies them into
+``notification_archive``. Each batch of ids is its own short transaction, so
+pruning a large backlog never holds locks on the inbox for long. Unread
+notifications are kept however old they are.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, literal, select
+
+from twitclone.extensions import db
+from twitclone.models import Notification, NotificationActor, NotificationArchive
+
+RETENTION_BATCH_SIZE = 500
+_ARCHIVED_COLUMNS = ("id", "user_id", "message", "timestamp", "tweet_id", "kind", "actor_count")
+
+log = logging.getLogger("twitclone.notifications")
+
+
+@dataclass(frozen=True)
+class NotificationRetentionResult:
+    mode: str
+    cutoff: datetime | None = None
+    pruned: int = 0
+    batches: int = 0
+    dry_run: bool = False
+
+
+def _expired(cutoff):
+    return Notification.read.is_(True), Notification.timestamp < cutoff
+
+
+def _archive(ids, now):
+    columns = [getattr(Notification, name) for name in _ARCHIVED_COLUMNS]
+    db.session.execute(
+        insert(NotificationArchive).from_select(
+            [*_ARCHIVED_COLUMNS, "archived_at"],
+            select(*columns, literal(now, NotificationArchive.archived_at.type)).where(Notification.id.in_(ids)),
+        )
+    )
+
+
+def prune_notifications(*, now=None, dry_run=False, batch_size=RETENTION_BATCH_SIZE) -> NotificationRetentionResult:
+    """Delete or archive read notifications older than the retention age.
+
+    ``dry_run`` only counts the notifications that would be pruned. A
+    ``NOTIFICATION_RETENTION_DAYS`` of ``0`` disables retention.
+    """
+    mode = current_app.config["NOTIFICATION_RETENTION_MODE"]
+    days = current_app.config["NOTIFICATION_RETENTION_DAYS"]
+    if not days:
+        return NotificationRetentionResult(mode=mode, dry_run=dry_run)
+    started_at = time.perf_counter()
+    now = now or datetime.now(UTC).replace(tzinfo=None)
+    cutoff = now - timedelta(days=days)
+    if dry_run:
+        pruned = db.session.scalar(select(func.count()).select_from(Notification).where(*_expired(cutoff)))
+        return NotificationRetentionResult(mode=mode, cutoff=cutoff, pruned=pruned, dry_run=True)
+    pruned = batches = 0
+    while True:
+        ids = db.session.scalars(select(Notification.id).where(*_expired(cutoff)).limit(batch_size)).all()
+        if not ids:
+            break
+        if mode == "archive":
+            _archive(ids, now)
+        db.session.execute(delete(NotificationActor).where(NotificationActor.notification_id.in_(ids)).execution_options(synchronize_session=False))
+        db.session.execute(delete(Notification).where(Notification.id.in_(ids)).execution_options(synchronize_session=False))
+        db.session.commit()
+        pruned += len(ids)
+        batches += 1
+        if len(ids) < batch_size:
+            break
+    log.info(
+        "notifications_pruned",
+        extra={
+            "event": "notifications_pruned",
+            "pruned_count": pruned,
+            "retention_mode": mode,
+            "duration_ms": round((time.perf_counter() - started_at) * 1000, 2),
+        },
+    )
+    return NotificationRetentionResult(mode=mode, cutoff=cutoff, pruned=pruned, batches=batches)
+
+
+__all__ = [
+    "NotificationRetentionResult",
+    "RETENTION_BATCH_SIZE",
+    "prune_notifications",
+]
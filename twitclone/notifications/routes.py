@@ -1,27 +1,56 @@
 """Notification inbox and deletion routes."""
 
-from flask import abort, flash, redirect, render_template, url_for
+from flask import abort, flash, jsonify, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
 from twitclone.extensions import db
 from twitclone.models import Notification
 from twitclone.notifications import notifications_blueprint
+from twitclone.notifications.service import mark_page_read, notification_page
+from twitclone.realtime.broker import announce_unread_counts
+
+
+def _load_page():
+    """Mark the requested page read, then load it for display."""
+    before = request.args.get("before")
+    read_ids = mark_page_read(current_user.id, before=before)
+    if read_ids:
+        announce_unread_counts(current_user.id)
+        db.session.commit()
+    return notification_page(current_user.id, before=before, read_ids=read_ids)
+
+
+def _notification_json(notification, page):
+    tweet = notification.tweet
+    return {
+        "id": notification.id,
+        "message": notification.message,
+        "timestamp": notification.timestamp.isoformat(),
+        "unread": page.is_new(notification),
+        "post_content": tweet.content if tweet and not tweet.is_removed else None,
+        "post_url": url_for("post_detail", tweet_id=tweet.id) if tweet and not tweet.is_removed else None,
+        "post_removed": bool(tweet and tweet.is_removed),
+        "delete_url": url_for("delete_notification", notification_id=notification.id),
+    }
 
 
 @login_required
 def notifications():
-    unread_count = Notification.query.filter_by(
-        user_id=current_user.id, read=False
-    ).update({"read": True}, synchronize_session=False)
-    if unread_count:
-        db.session.commit()
+    try:
+        page = _load_page()
+    except ValueError:
+        return redirect(url_for("notifications"))
+    return render_template("notifications.html", notifications=page.items, notification_page=page)
 
-    user_notifications = (
-        Notification.query.filter_by(user_id=current_user.id)
-        .order_by(Notification.timestamp.desc())
-        .all()
-    )
-    return render_template("notifications.html", notifications=user_notifications)
+
+@login_required
+def notifications_feed():
+    """Return one page of notifications as JSON for infinite scrolling."""
+    try:
+        page = _load_page()
+    except ValueError:
+        return jsonify(status="error", message="A valid before cursor is required."), 400
+    return jsonify(status="success", notifications=[_notification_json(notification, page) for notification in page.items], next_cursor=page.next_cursor)
 
 
 @login_required
@@ -42,6 +71,9 @@ def register_notification_routes(state):
     state.app.add_url_rule(
         "/notifications", endpoint="notifications", view_func=notifications
     )
+    state.app.add_url_rule(
+        "/notifications/feed", endpoint="notifications_feed", view_func=notifications_feed
+    )
     state.app.add_url_rule(
         "/notifications/<int:notification_id>/delete",
         endpoint="delete_notification",
@@ -0,0 +1,219 @@
+"""Notification writes and keyset pagination of a user's inbox.
+
+Follows, reposts, quotes, and mentions go through :func:`notify_activity`.
+While a notification for the same recipient, kind, and post is unread and
+younger than ``NOTIFICATION_COALESCE_MINUTES``, new activity folds into it:
+each distinct actor is recorded once in ``notification_actor`` and grows the
+count, the newest actors are kept as a sample for the message, and the message
+becomes "alice and 312 others reposted your post".
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, true, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import joinedload
+
+from twitclone.counters import adjust_user_counters
+from twitclone.extensions import db
+from twitclone.models import Notification, NotificationActor, User
+
+NOTIFICATIONS_PAGE_SIZE = 20
+ACTOR_SAMPLE_SIZE = 3
+ACTIVITY_MESSAGES = {
+    "follow": "{actors} followed you",
+    "unfollow": "{actors} unfollowed you",
+    "repost": "{actors} reposted your post",
+    "quote": "{actors} quoted your post",
+    "mention": "{actors} mentioned you in a post",
+}
+
+
+def _actors_phrase(usernames, actor_count):
+    if actor_count == 1:
+        return usernames[0]
+    if actor_count == 2 and len(usernames) == 2:
+        return f"{usernames[0]} and {usernames[1]}"
+    others = actor_count - 1
+    return f"{usernames[0]} and {others} other{'s' if others != 1 else ''}"
+
+
+def activity_message(kind, usernames, actor_count):
+    """Render the message for ``actor_count`` actors, newest first in ``usernames``."""
+    return ACTIVITY_MESSAGES[kind].format(actors=_actors_phrase(usernames, actor_count))
+
+
+def _coalescing_target(recipient_id, kind, tweet_id, now):
+    minutes = current_app.config["NOTIFICATION_COALESCE_MINUTES"]
+    if not minutes:
+        return None
+    return db.session.scalars(
+        select(Notification)
+        .where(
+            Notification.user_id == recipient_id,
+            Notification.kind == kind,
+            Notification.tweet_id.is_(None) if tweet_id is None else Notification.tweet_id == tweet_id,
+            Notification.read.is_(False),
+            Notification.timestamp >= now - timedelta(minutes=minutes),
+        )
+        .order_by(Notification.timestamp.desc(), Notification.id.desc())
+        .limit(1)
+        .with_for_update()
+    ).first()
+
+
+def _record_actor(notification_id, actor_id):
+    """Record ``actor_id`` on the notification; return whether they are new to it."""
+    dialect_insert = postgresql.insert if db.session.get_bind().dialect.name == "postgresql" else sqlite.insert
+    result = db.session.execute(
+        dialect_insert(NotificationActor)
+        .values(notification_id=notification_id, actor_id=actor_id)
+        .on_conflict_do_nothing(index_elements=["notification_id", "actor_id"])
+    )
+    return result.rowcount == 1
+
+
+def notify_activity(recipient_id, kind, actor, *, tweet_id=None, now=None):
+    """Add ``actor``'s activity to ``recipient_id``'s inbox, folding it into a recent unread notification.
+
+    Returns the new or updated notification; the caller commits.
+    """
+    now = now or datetime.now(UTC).replace(tzinfo=None)
+    notification = _coalescing_target(recipient_id, kind, tweet_id, now)
+    if notification is None:
+        notification = Notification(
+            user_id=recipient_id,
+            kind=kind,
+            tweet_id=tweet_id,
+            actor_ids=[actor.id],
+            actor_count=1,
+            message=activity_message(kind, [actor.username], 1),
+            timestamp=now,
+            actors=[NotificationActor(actor_id=actor.id)],
+        )
+        db.session.add(notification)
+        return notification
+    if _record_actor(notification.id, actor.id):
+        notification.actor_count += 1
+    # Repeat activity moves the actor to the front of the sample without counting twice.
+    sample = [actor.id] + [actor_id for actor_id in notification.actor_ids or [] if actor_id != actor.id][: ACTOR_SAMPLE_SIZE - 1]
+    usernames = dict(db.session.execute(select(User.id, User.username).where(User.id.in_(sample))).all())
+    notification.actor_ids = sample
+    notification.message = activity_message(kind, [usernames[actor_id] for actor_id in sample if actor_id in usernames], notification.actor_count)
+    notification.timestamp = now
+    return notification
+
+
+@dataclass(frozen=True)
+class NotificationCursor:
+    """Position of one notification in the ``(timestamp, id)`` newest-first order."""
+
+    timestamp: datetime
+    id: int
+
+    def encode(self):
+        raw = f"{self.timestamp.isoformat()}|{self.id}".encode("ascii")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    @classmethod
+    def decode(cls, token):
+        """Parse an opaque cursor, raising ``ValueError`` for anything malformed."""
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("ascii")
+            timestamp, notification_id = raw.split("|")
+            return cls(datetime.fromisoformat(timestamp), int(notification_id))
+        except (binascii.Error, UnicodeError, TypeError, ValueError) as exc:
+            raise ValueError("Invalid notification cursor") from exc
+
+    @classmethod
+    def for_notification(cls, notification):
+        return cls(notification.timestamp, notification.id)
+
+
+@dataclass(frozen=True)
+class NotificationPage:
+    """Up to ``per_page`` notifications strictly older than ``cursor``.
+
+    ``read_ids`` holds the notifications this request marked read, which are
+    still shown as new.
+    """
+
+    items: list
+    cursor: str | None
+    next_cursor: str | None
+    read_ids: frozenset = frozenset()
+
+    @property
+    def has_next(self): return self.next_cursor is not None
+
+    def is_new(self, notification):
+        return not notification.read or notification.id in self.read_ids
+
+
+def _older_than(cursor):
+    if cursor is None:
+        return true()
+    return (Notification.timestamp < cursor.timestamp) | ((Notification.timestamp == cursor.timestamp) & (Notification.id < cursor.id))
+
+
+def _page_statement(columns, user_id, cursor, limit):
+    return (
+        select(*columns)
+        .where(Notification.user_id == user_id, _older_than(cursor))
+        .order_by(Notification.timestamp.desc(), Notification.id.desc())
+        .limit(limit)
+    )
+
+
+def mark_page_read(user_id, *, before=None, per_page=NOTIFICATIONS_PAGE_SIZE) -> frozenset:
+    """Mark the unread notifications on one page read and return their ids.
+
+    Only the rows the page displays change, so opening the inbox costs the
+    same however many notifications are unread. The caller commits.
+    """
+    cursor = NotificationCursor.decode(before) if before else None
+    page_ids = _page_statement([Notification.id], user_id, cursor, per_page).scalar_subquery()
+    read_ids = frozenset(
+        db.session.scalars(
+            update(Notification)
+            .where(Notification.id.in_(page_ids), Notification.read.is_(False))
+            .values(read=True)
+            .returning(Notification.id)
+            .execution_options(synchronize_session=False)
+        )
+    )
+    if read_ids:
+        adjust_user_counters(user_id, unread_notifications=-len(read_ids))
+    return read_ids
+
+
+def notification_page(user_id, *, before=None, per_page=NOTIFICATIONS_PAGE_SIZE, read_ids=frozenset()):
+    """Load one page of ``user_id``'s notifications, newest first.
+
+    ``before`` is an encoded cursor from a previous page; ``ValueError`` is
+    raised when it is malformed. Only ``per_page + 1`` rows are read, walking
+    the ``(user_id, timestamp, id)`` index.
+    """
+    cursor = NotificationCursor.decode(before) if before else None
+    rows = db.session.scalars(_page_statement([Notification], user_id, cursor, per_page + 1).options(joinedload(Notification.tweet))).all()
+    items = rows[:per_page]
+    next_cursor = NotificationCursor.for_notification(items[-1]).encode() if len(rows) > per_page else None
+    return NotificationPage(items=items, cursor=before or None, next_cursor=next_cursor, read_ids=read_ids)
+
+
+__all__ = [
+    "ACTIVITY_MESSAGES",
+    "NOTIFICATIONS_PAGE_SIZE",
+    "NotificationCursor",
+    "NotificationPage",
+    "activity_message",
+    "mark_page_read",
+    "notification_page",
+    "notify_activity",
+]
@@ -38,6 +38,23 @@ class JsonFormatter(logging.Formatter):
             "status",
             "duration_ms",
             "published_count",
+            "author_id",
+            "follower_count",
+            "fanout_threshold",
+            "fanout_strategy",
+            "recipient_count",
+            "merged_author_count",
+            "merged_count",
+            "cache_hits",
+            "cache_misses",
+            "channel",
+            "subscriber_count",
+            "connection_count",
+            "realtime_event",
+            "latency_ms",
+            "hashtag_count",
+            "pruned_count",
+            "retention_mode",
         ):
             if hasattr(record, field):
                 event[field] = getattr(record, field)
@@ -18,13 +18,17 @@ def _utcnow_naive():
 
 @login_required
 def create_poll():
+    # Imported here because the timeline service loads the polls package first.
+    from twitclone.timeline.cache import bump_timeline_generation
+    from twitclone.timeline.home import fan_out_post
+
     form = PollForm()
     if form.validate_on_submit():
         poll = Poll(question=form.question.data, duration_days=form.duration_days.data, duration_hours=form.duration_hours.data, duration_minutes=form.duration_minutes.data, user_id=current_user.id)
         db.session.add(poll); db.session.commit()
         for option in form.options.data:
             db.session.add(PollOption(option_text=option["option_text"], poll_id=poll.id))
-        db.session.commit(); flash("Poll created successfully!", "success"); return redirect(url_for("index"))
+        fan_out_post("poll", poll); db.session.commit(); bump_timeline_generation(); flash("Poll created successfully!", "success"); return redirect(url_for("index"))
     return render_template("create_poll.html", form=form)
 
 
@@ -0,0 +1,21 @@
+"""Poll queries shared by pages that render many polls."""
+
+from twitclone.models import PollVote
+
+
+def viewer_poll_votes(viewer, poll_ids):
+    """Return ``{poll_id: option_id}`` for the viewer's votes among ``poll_ids``.
+
+    One set-based query replaces a per-poll lookup. Anonymous viewers and empty
+    pages cost no query.
+    """
+    poll_ids = set(poll_ids)
+    if viewer is None or not viewer.is_authenticated or not poll_ids:
+        return {}
+    rows = PollVote.query.with_entities(PollVote.poll_id, PollVote.option_id).filter(
+        PollVote.user_id == viewer.id, PollVote.poll_id.in_(poll_ids)
+    )
+    return {poll_id: option_id for poll_id, option_id in rows}
+
+
+__all__ = ["viewer_poll_votes"]
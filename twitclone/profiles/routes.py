@@ -1,15 +1,22 @@
 """Profile and social graph routes."""
 
+from datetime import UTC, datetime
+
 from flask import flash, jsonify, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 
 from twitclone.analytics_tracking import record_profile_visit, snapshot_followers
 from twitclone.creator_analytics import build_creator_dashboard
 from twitclone.extensions import db
-from twitclone.models import Notification, Quote, Retweet, Tweet, User
+from twitclone.models import Quote, Retweet, Tweet, User
 from twitclone.media_storage import get_media_storage
+from twitclone.notifications.service import notify_activity
 from twitclone.profiles import profiles_blueprint
+from twitclone.sidebar import invalidate_sidebar
+from twitclone.timeline.cache import bump_timeline_generation
+from twitclone.timeline.home import backfill_followed_author, remove_followed_author
 from twitclone.timeline.media import store_profile_banner
+from twitclone.username_index import forget_followed_ids, record_username
 
 PROFILE_THEMES = {'ripple':'Ripple Blue','sunset':'Sunset','forest':'Forest','violet':'Violet','slate':'Slate'}
 
@@ -22,7 +29,7 @@ def _store_profile_banner(upload):
 def follow(username):
     user = User.query.filter_by(username=username).first()
     if user and user not in current_user.followed:
-        current_user.followed.append(user); db.session.commit(); snapshot_followers(user); db.session.add(Notification(user_id=user.id, message=f"{current_user.username} followed you")); db.session.commit(); return jsonify({'status':'success','message':f'You are now following {username}.'})
+        current_user.followed.append(user); backfill_followed_author(current_user.id, user.id, now=datetime.now(UTC).replace(tzinfo=None)); db.session.commit(); bump_timeline_generation(); forget_followed_ids(current_user.id); snapshot_followers(user); notify_activity(user.id, 'follow', current_user); db.session.commit(); return jsonify({'status':'success','message':f'You are now following {username}.'})
     if user: return jsonify({'status':'success','message':f'You are now following {username}.'})
     return jsonify({'status':'error','message':'User not found.'})
 
@@ -31,7 +38,7 @@ def follow(username):
 def unfollow(username):
     user = User.query.filter_by(username=username).first()
     if user and user in current_user.followed:
-        current_user.followed.remove(user); db.session.commit(); snapshot_followers(user); db.session.add(Notification(user_id=user.id, message=f"{current_user.username} unfollowed you")); db.session.commit(); return jsonify({'status':'success','message':f'You have unfollowed {username}.'})
+        current_user.followed.remove(user); remove_followed_author(current_user.id, user.id); db.session.commit(); bump_timeline_generation(); forget_followed_ids(current_user.id); snapshot_followers(user); notify_activity(user.id, 'unfollow', current_user); db.session.commit(); return jsonify({'status':'success','message':f'You have unfollowed {username}.'})
     if user: return jsonify({'status':'success','message':f'You have unfollowed {username}.'})
     return jsonify({'status':'error','message':'User not found.'})
 
@@ -69,6 +76,7 @@ def creator_analytics():
 def edit_profile():
     ripple_plus = current_user.has_entitlement('ripple_plus')
     if request.method == 'POST':
+        previous_username=current_user.username
         current_user.username=request.form['username']; current_user.email=request.form['email']; current_user.bio=request.form['bio']
         if ripple_plus:
             requested_theme=(request.form.get('profile_theme') or 'ripple').strip().lower()
@@ -80,7 +88,7 @@ def edit_profile():
                 error,banner_name=_store_profile_banner(banner)
                 if error: flash(error,'danger'); return render_template('edit_profile.html',user=current_user,ripple_plus=True,profile_themes=PROFILE_THEMES)
                 current_user.profile_banner=banner_name
-        db.session.commit(); flash('Your profile has been updated!','success'); return redirect(url_for('profile',username=current_user.username))
+        db.session.commit(); invalidate_sidebar(); record_username(current_user.id,current_user.username,previous=previous_username); flash('Your profile has been updated!','success'); return redirect(url_for('profile',username=current_user.username))
     return render_template('edit_profile.html',user=current_user,ripple_plus=ripple_plus,profile_themes=PROFILE_THEMES)
 
 
@@ -93,7 +101,7 @@ def following(username):
 @login_required
 def unfollow_from_list(user_id):
     user=db.get_or_404(User,user_id)
-    if user in current_user.followed: current_user.followed.remove(user); db.session.commit(); snapshot_followers(user); flash(f'You have unfollowed {user.username}.','success')
+    if user in current_user.followed: current_user.followed.remove(user); remove_followed_author(current_user.id, user.id); db.session.commit(); bump_timeline_generation(); forget_followed_ids(current_user.id); snapshot_followers(user); flash(f'You have unfollowed {user.username}.','success')
     return redirect(url_for('following',username=current_user.username))
 
 
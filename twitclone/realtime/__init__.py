@@ -0,0 +1,9 @@
+"""Realtime Blueprint."""
+
+from flask import Blueprint
+
+realtime_blueprint = Blueprint("realtime", __name__)
+
+from twitclone.realtime import routes  # noqa: E402, F401
+
+__all__ = ["realtime_blueprint"]
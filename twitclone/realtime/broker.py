@@ -0,0 +1,175 @@
+"""Publish/subscribe for live timeline and unread-count updates.
+
+Write paths queue events on the database session with ``announce_*``; they are
+published only after that session commits, so subscribers never hear about
+rows that were rolled back. The broker is chosen by ``REALTIME_BROKER``:
+``memory`` delivers within one process, ``none`` disables streaming, and any
+``module:factory`` path builds a broker implementing ``publish`` and
+``subscribe(channels, *, max_connections)`` for deployments running several
+workers; a ``connection_count`` attribute is optional and only logged.
+"""
+
+from __future__ import annotations
+
+import importlib
+import logging
+import queue
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from twitclone.extensions import db
+
+log = logging.getLogger("twitclone.realtime")
+TIMELINE_CHANNEL = "timeline"
+
+
+def user_channel(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+class RealtimeBrokerFull(RuntimeError):
+    """Raised when a broker already holds ``max_connections`` subscriptions."""
+
+
+class Subscription:
+    """One stream's bounded inbox; slow readers drop events rather than block publishers."""
+
+    def __init__(self, broker, channels, *, max_pending: int) -> None:
+        self.channels = tuple(channels)
+        self._broker = broker
+        self._events: queue.Queue = queue.Queue(maxsize=max_pending)
+
+    def deliver(self, message) -> bool:
+        try:
+            self._events.put_nowait(message)
+        except queue.Full:
+            return False
+        return True
+
+    def get(self, timeout: float):
+        """Return the next ``{"event", "data", "published_at"}`` message, or ``None`` on timeout."""
+        try:
+            return self._events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self) -> None:
+        self._broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Deliver events to streams held by the current process."""
+
+    def __init__(self, *, max_pending: int = 100) -> None:
+        self.max_pending = max_pending
+        self._subscriptions: dict[str, set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._connection_count = 0
+
+    @property
+    def connection_count(self) -> int:
+        return self._connection_count
+
+    def subscribe(self, channels, *, max_connections: int | None = None) -> Subscription:
+        """Subscribe to ``channels``; raise ``RealtimeBrokerFull`` if ``max_connections`` are already open."""
+        subscription = Subscription(self, channels, max_pending=self.max_pending)
+        with self._lock:
+            if max_connections is not None and self._connection_count >= max_connections:
+                raise RealtimeBrokerFull(f"{self._connection_count} realtime connections already open")
+            for channel in subscription.channels:
+                self._subscriptions.setdefault(channel, set()).add(subscription)
+            self._connection_count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            removed = False
+            for channel in subscription.channels:
+                subscribers = self._subscriptions.get(channel)
+                if subscribers and subscription in subscribers:
+                    subscribers.discard(subscription)
+                    removed = True
+                    if not subscribers:
+                        del self._subscriptions[channel]
+            if removed:
+                self._connection_count -= 1
+
+    def publish(self, channel: str, name: str, data: dict) -> int:
+        """Deliver one event to every current subscriber of ``channel``; return the delivery count."""
+        started_at = time.perf_counter()
+        message = {"event": name, "data": data, "published_at": time.time()}
+        with self._lock:
+            subscribers = list(self._subscriptions.get(channel, ()))
+        delivered = sum(subscription.deliver(message) for subscription in subscribers)
+        log.info(
+            "realtime_fanout",
+            extra={"event": "realtime_fanout", "channel": channel, "subscriber_count": delivered, "duration_ms": round((time.perf_counter() - started_at) * 1000, 2)},
+        )
+        return delivered
+
+
+def build_realtime_broker(config):
+    name = config["REALTIME_BROKER"]
+    if name == "none":
+        return None
+    if name == "memory":
+        return InProcessBroker(max_pending=config["REALTIME_MAX_PENDING_EVENTS"])
+    module_name, _, factory_name = name.partition(":")
+    return getattr(importlib.import_module(module_name), factory_name)(config)
+
+
+def init_realtime(app) -> None:
+    app.extensions["realtime_broker"] = build_realtime_broker(app.config)
+
+
+def get_realtime_broker():
+    return current_app.extensions.get("realtime_broker")
+
+
+def _pending():
+    return db.session.info.setdefault("realtime_events", [])
+
+
+def announce_timeline_entry(*, post_type: str, source_id: int, cursor: str) -> None:
+    """Queue a new timeline entry for every stream once the session commits."""
+    _pending().append((TIMELINE_CHANNEL, "timeline", {"type": post_type, "source_id": source_id, "cursor": cursor}))
+
+
+def announce_unread_counts(user_id: int) -> None:
+    """Queue a refresh of ``user_id``'s notification and message counts once the session commits."""
+    _pending().append((user_channel(user_id), "counts", {}))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_after_commit(session) -> None:
+    events = session.info.pop("realtime_events", None)
+    if not events or not has_app_context():
+        return
+    broker = get_realtime_broker()
+    if broker is None:
+        return
+    for channel, name, data in dict.fromkeys((channel, name, tuple(data.items())) for channel, name, data in events):
+        broker.publish(channel, name, dict(data))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session) -> None:
+    session.info.pop("realtime_events", None)
+
+
+__all__ = [
+    "InProcessBroker",
+    "RealtimeBrokerFull",
+    "Subscription",
+    "TIMELINE_CHANNEL",
+    "announce_timeline_entry",
+    "announce_unread_counts",
+    "build_realtime_broker",
+    "get_realtime_broker",
+    "init_realtime",
+    "user_channel",
+]
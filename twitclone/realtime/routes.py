@@ -0,0 +1,73 @@
+"""Server-Sent Events stream of timeline entries and unread counts."""
+
+import json
+import logging
+import time
+
+from flask import Response, abort, current_app, stream_with_context
+from flask_login import current_user, login_required
+
+from twitclone.counters import get_user_counts
+from twitclone.extensions import db
+from twitclone.realtime import realtime_blueprint
+from twitclone.realtime.broker import TIMELINE_CHANNEL, RealtimeBrokerFull, get_realtime_broker, user_channel
+
+log = logging.getLogger("twitclone.realtime")
+
+
+def unread_counts(user_id):
+    counts = get_user_counts(user_id)
+    return {"notifications": counts.unread_notifications, "messages": counts.unread_messages}
+
+
+def _sse(name, data):
+    return f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+@login_required
+def stream():
+    """Stream ``timeline`` and ``counts`` events until the connection's time budget ends.
+
+    Each stream occupies a worker thread, so connections are capped and closed
+    after ``REALTIME_STREAM_SECONDS``; ``EventSource`` reconnects on its own.
+    """
+    broker = get_realtime_broker()
+    if broker is None:
+        abort(404)
+    config = current_app.config
+    user_id = current_user.id
+    initial_counts = unread_counts(user_id)
+    db.session.remove()
+    try:
+        subscription = broker.subscribe([TIMELINE_CHANNEL, user_channel(user_id)], max_connections=config["REALTIME_MAX_CONNECTIONS"])
+    except RealtimeBrokerFull:
+        return Response("retry: 30000\n\n", status=503, mimetype="text/event-stream", headers={"Retry-After": "30"})
+    log.info("realtime_stream_opened", extra={"event": "realtime_stream_opened", "connection_count": getattr(broker, "connection_count", None)})
+    heartbeat_seconds, deadline = config["REALTIME_HEARTBEAT_SECONDS"], time.monotonic() + config["REALTIME_STREAM_SECONDS"]
+
+    def events():
+        try:
+            yield "retry: 5000\n\n" + _sse("counts", initial_counts)
+            while (remaining := deadline - time.monotonic()) > 0:
+                message = subscription.get(timeout=min(heartbeat_seconds, remaining))
+                if message is None:
+                    yield ": heartbeat\n\n"
+                else:
+                    if message["event"] == "counts":
+                        frame = _sse("counts", unread_counts(user_id))
+                        db.session.remove()
+                    else:
+                        frame = _sse(message["event"], message["data"])
+                    latency_ms = round((time.time() - message["published_at"]) * 1000, 2)
+                    log.info("realtime_event_delivered", extra={"event": "realtime_event_delivered", "realtime_event": message["event"], "latency_ms": latency_ms})
+                    yield frame
+        finally:
+            subscription.close()
+            log.info("realtime_stream_closed", extra={"event": "realtime_stream_closed", "connection_count": getattr(broker, "connection_count", None)})
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@realtime_blueprint.record_once
+def register_realtime_routes(state):
+    state.app.add_url_rule("/stream", endpoint="stream", view_func=stream)
@@ -1,12 +1,15 @@
-"""Dedicated scheduled-post worker process."""
+"""Dedicated scheduled-post, trending-refresh, and notification-retention worker process."""
 
 import logging
 import signal
 import threading
+import time
 
 from config import Config
 from twitclone import create_app
+from twitclone.notifications.retention import prune_notifications
 from twitclone.scheduling import publish_due_tweets
+from twitclone.trending import refresh_trending_hashtags
 
 
 log = logging.getLogger("twitclone.worker")
@@ -17,9 +20,17 @@ def main():
     stop = threading.Event()
     signal.signal(signal.SIGTERM, lambda *_: stop.set())
     signal.signal(signal.SIGINT, lambda *_: stop.set())
+    next_trending_refresh = 0.0
+    next_notification_prune = 0.0
     while not stop.is_set():
         with app.app_context():
             published = publish_due_tweets()
+            if time.monotonic() >= next_trending_refresh:
+                refresh_trending_hashtags()
+                next_trending_refresh = time.monotonic() + Config.TRENDING_REFRESH_SECONDS
+            if time.monotonic() >= next_notification_prune:
+                prune_notifications()
+                next_notification_prune = time.monotonic() + Config.NOTIFICATION_RETENTION_INTERVAL_SECONDS
         if published:
             log.info(
                 "scheduled_tweets_published",
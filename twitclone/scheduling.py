@@ -5,6 +5,8 @@ from datetime import UTC, datetime
 from twitclone.extensions import db
 from twitclone.mentions import add_mention_notifications
 from twitclone.models import Tweet
+from twitclone.timeline.cache import bump_timeline_generation
+from twitclone.timeline.home import fan_out_post
 
 
 def publish_due_tweets(*, now=None):
@@ -18,8 +20,10 @@ def publish_due_tweets(*, now=None):
         add_mention_notifications(
             content=tweet.content, author=tweet.user, tweet_id=tweet.id
         )
+        fan_out_post("tweet", tweet)
     if due_tweets:
         db.session.commit()
+        bump_timeline_generation()
     return len(due_tweets)
 
 
@@ -0,0 +1,293 @@
+"""Full-text search over tweets, quotes, and usernames.
+
+Every searchable record is one document in a dialect-specific index: an FTS5
+virtual table on SQLite and a ``tsvector`` column with a GIN index on
+PostgreSQL. Document ids pack the record id with its kind, so maintenance and
+hydration address documents by primary key. Mapper events keep the index in
+step with the records inside the same flush; scheduled tweets join it on
+publication and removed posts leave it. Existing rows are indexed with
+:func:`backfill_search_index`.
+
+Queries are split into lowercase words, and every word must match as a prefix,
+so ``#rv`` finds both ``#rv`` and ``#rvlife``. Results are ranked by the
+backend's relevance score, newest first among equals, and paginated.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+from sqlalchemy import bindparam, event, inspect, select, text
+from sqlalchemy.orm import joinedload
+
+from twitclone.extensions import db
+from twitclone.models import Quote, Tweet, User
+
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_TERMS = 8
+DOCUMENT_KINDS = {"tweet": 1, "quote": 2, "user": 3}
+POST_KINDS = ("tweet", "quote")
+_KIND_BITS = 2
+_KIND_MASK = (1 << _KIND_BITS) - 1
+_WORD_RE = re.compile(r"[^\W_]+")
+_TWEET_INDEXED_ATTRIBUTES = ("content", "scheduled_at", "is_removed")
+_QUOTE_INDEXED_ATTRIBUTES = ("content", "is_removed")
+
+
+def document_id(kind: str, source_id: int) -> int:
+    return (source_id << _KIND_BITS) | DOCUMENT_KINDS[kind]
+
+
+def search_terms(query: str) -> list[str]:
+    """Lowercase words of ``query``, without punctuation, capped at ``MAX_SEARCH_TERMS``."""
+    return _WORD_RE.findall(query.lower())[:MAX_SEARCH_TERMS]
+
+
+class SqliteFtsSearchBackend:
+    """FTS5 virtual table keyed by ``rowid``, ranked with BM25."""
+
+    def create(self, connection) -> None:
+        connection.execute(text("CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(body, tokenize='unicode61')"))
+
+    def drop(self, connection) -> None:
+        connection.execute(text("DROP TABLE IF EXISTS search_index"))
+
+    def upsert(self, connection, documents) -> None:
+        self.delete(connection, [doc_id for doc_id, _body in documents])
+        connection.execute(text("INSERT INTO search_index (rowid, body) VALUES (:doc_id, :body)"), [{"doc_id": doc_id, "body": body} for doc_id, body in documents])
+
+    def delete(self, connection, doc_ids) -> None:
+        connection.execute(text("DELETE FROM search_index WHERE rowid IN :doc_ids").bindparams(bindparam("doc_ids", expanding=True)), {"doc_ids": list(doc_ids)})
+
+    def query(self, connection, terms, kind_codes, *, limit, offset) -> list[int]:
+        match = " AND ".join(f'"{term}"*' for term in terms)
+        statement = text(
+            "SELECT rowid FROM search_index WHERE search_index MATCH :match AND (rowid & 3) IN :kinds "
+            "ORDER BY rank, rowid DESC LIMIT :limit OFFSET :offset"
+        ).bindparams(bindparam("kinds", expanding=True))
+        return list(connection.scalars(statement, {"match": match, "kinds": list(kind_codes), "limit": limit, "offset": offset}))
+
+
+class PostgresSearchBackend:
+    """Generated ``tsvector`` column behind a GIN index, ranked with ``ts_rank``."""
+
+    def create(self, connection) -> None:
+        connection.execute(
+            text(
+                "CREATE TABLE IF NOT EXISTS search_document (doc_id BIGINT PRIMARY KEY, body TEXT NOT NULL, "
+                "document TSVECTOR GENERATED ALWAYS AS (to_tsvector('simple', body)) STORED)"
+            )
+        )
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_search_document_document ON search_document USING GIN (document)"))
+
+    def drop(self, connection) -> None:
+        connection.execute(text("DROP TABLE IF EXISTS search_document"))
+
+    def upsert(self, connection, documents) -> None:
+        connection.execute(
+            text("INSERT INTO search_document (doc_id, body) VALUES (:doc_id, :body) ON CONFLICT (doc_id) DO UPDATE SET body = excluded.body"),
+            [{"doc_id": doc_id, "body": body} for doc_id, body in documents],
+        )
+
+    def delete(self, connection, doc_ids) -> None:
+        connection.execute(text("DELETE FROM search_document WHERE doc_id IN :doc_ids").bindparams(bindparam("doc_ids", expanding=True)), {"doc_ids": list(doc_ids)})
+
+    def query(self, connection, terms, kind_codes, *, limit, offset) -> list[int]:
+        statement = text(
+            "SELECT doc_id FROM search_document, to_tsquery('simple', :tsquery) AS query "
+            "WHERE document @@ query AND (doc_id & 3) IN :kinds "
+            "ORDER BY ts_rank(document, query) DESC, doc_id DESC LIMIT :limit OFFSET :offset"
+        ).bindparams(bindparam("kinds", expanding=True))
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        return list(connection.scalars(statement, {"tsquery": tsquery, "kinds": list(kind_codes), "limit": limit, "offset": offset}))
+
+
+SEARCH_BACKENDS = {"sqlite": SqliteFtsSearchBackend(), "postgresql": PostgresSearchBackend()}
+
+
+def search_backend(connection):
+    backend = SEARCH_BACKENDS.get(connection.dialect.name)
+    if backend is None:
+        raise RuntimeError(f"No search backend is registered for the {connection.dialect.name} database.")
+    return backend
+
+
+@event.listens_for(db.metadata, "after_create")
+def _create_search_index(_metadata, connection, **_kw):
+    search_backend(connection).create(connection)
+
+
+@event.listens_for(db.metadata, "before_drop")
+def _drop_search_index(_metadata, connection, **_kw):
+    search_backend(connection).drop(connection)
+
+
+def _tweet_documents(tweet):
+    if tweet.is_removed or tweet.scheduled_at is not None:
+        return []
+    return [(document_id("tweet", tweet.id), tweet.content)]
+
+
+def _quote_documents(quote):
+    return [] if quote.is_removed else [(document_id("quote", quote.id), quote.content)]
+
+
+def _changed(target, attributes):
+    state = inspect(target)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+
+def _replace(connection, doc_id, documents):
+    backend = search_backend(connection)
+    if documents:
+        backend.upsert(connection, documents)
+    else:
+        backend.delete(connection, [doc_id])
+
+
+@event.listens_for(Tweet, "after_insert")
+def _index_new_tweet(_mapper, connection, tweet):
+    if documents := _tweet_documents(tweet):
+        search_backend(connection).upsert(connection, documents)
+
+
+@event.listens_for(Tweet, "after_update")
+def _reindex_tweet(_mapper, connection, tweet):
+    if not _changed(tweet, _TWEET_INDEXED_ATTRIBUTES):
+        return
+    _replace(connection, document_id("tweet", tweet.id), _tweet_documents(tweet))
+    if tweet.is_removed:
+        # Quotes of a removed tweet are hidden with it.
+        quote_ids = connection.scalars(select(Quote.id).where(Quote.tweet_id == tweet.id)).all()
+        if quote_ids:
+            search_backend(connection).delete(connection, [document_id("quote", quote_id) for quote_id in quote_ids])
+
+
+@event.listens_for(Quote, "after_insert")
+def _index_new_quote(_mapper, connection, quote):
+    if documents := _quote_documents(quote):
+        search_backend(connection).upsert(connection, documents)
+
+
+@event.listens_for(Quote, "after_update")
+def _reindex_quote(_mapper, connection, quote):
+    if _changed(quote, _QUOTE_INDEXED_ATTRIBUTES):
+        _replace(connection, document_id("quote", quote.id), _quote_documents(quote))
+
+
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_update")
+def _index_user(_mapper, connection, user):
+    if _changed(user, ("username",)):
+        search_backend(connection).upsert(connection, [(document_id("user", user.id), user.username)])
+
+
+@dataclass(frozen=True, slots=True)
+class SearchHit:
+    kind: str
+    record: object
+
+
+@dataclass(frozen=True)
+class SearchPage:
+    hits: list
+    page: int
+    has_next: bool
+
+
+def _search(query, kinds, *, page, per_page):
+    terms = search_terms(query)
+    page = max(page, 1)
+    if not terms:
+        return page, [], False
+    connection = db.session.connection()
+    doc_ids = search_backend(connection).query(connection, terms, [DOCUMENT_KINDS[kind] for kind in kinds], limit=per_page + 1, offset=(page - 1) * per_page)
+    return page, doc_ids[:per_page], len(doc_ids) > per_page
+
+
+def _hydrate(doc_ids, loaders):
+    codes = {code: kind for kind, code in DOCUMENT_KINDS.items()}
+    wanted = [(codes[doc_id & _KIND_MASK], doc_id >> _KIND_BITS) for doc_id in doc_ids]
+    records = {}
+    for kind, load in loaders.items():
+        ids = [source_id for hit_kind, source_id in wanted if hit_kind == kind]
+        if ids:
+            records.update(((kind, record.id), record) for record in load(ids))
+    # Records that disappeared since indexing are skipped rather than failing the page.
+    return [SearchHit(kind, records[kind, source_id]) for kind, source_id in wanted if (kind, source_id) in records]
+
+
+def search_posts(query: str, *, page: int = 1, per_page: int = SEARCH_PAGE_SIZE) -> SearchPage:
+    """Rank visible tweets and quotes matching ``query``."""
+    page, doc_ids, has_next = _search(query, POST_KINDS, page=page, per_page=per_page)
+    hits = _hydrate(
+        doc_ids,
+        {
+            "tweet": lambda ids: Tweet.query.options(joinedload(Tweet.user)).filter(Tweet.id.in_(ids), Tweet.is_removed.is_(False)).all(),
+            "quote": lambda ids: Quote.query.options(joinedload(Quote.user)).filter(Quote.id.in_(ids), Quote.is_removed.is_(False)).all(),
+        },
+    )
+    return SearchPage(hits=hits, page=page, has_next=has_next)
+
+
+def search_users(query: str, *, page: int = 1, per_page: int = SEARCH_PAGE_SIZE) -> SearchPage:
+    """Rank users whose username words start with the words of ``query``."""
+    page, doc_ids, has_next = _search(query, ("user",), page=page, per_page=per_page)
+    hits = _hydrate(doc_ids, {"user": lambda ids: User.query.filter(User.id.in_(ids)).all()})
+    return SearchPage(hits=hits, page=page, has_next=has_next)
+
+
+@dataclass(frozen=True)
+class SearchIndexBackfillResult:
+    documents: int = 0
+
+
+def backfill_search_index(*, batch_size=500) -> SearchIndexBackfillResult:
+    """Index every visible tweet and quote and every username, one id range at a time.
+
+    Rerunning is safe: each batch removes the documents of the records it
+    covers before writing the visible ones again.
+    """
+    documents = 0
+    sources = (
+        (Tweet, "tweet", _tweet_documents, ()),
+        (Quote, "quote", _quote_documents, (Quote.tweet.has(Tweet.is_removed.is_(False)),)),
+        (User, "user", lambda user: [(document_id("user", user.id), user.username)], ()),
+    )
+    for model, kind, build_documents, filters in sources:
+        last_id = 0
+        while True:
+            batch = model.query.filter(model.id > last_id).order_by(model.id).limit(batch_size).all()
+            if not batch:
+                break
+            ids = [record.id for record in batch]
+            visible = set(db.session.scalars(select(model.id).where(model.id.in_(ids), *filters))) if filters else set(ids)
+            rows = [row for record in batch if record.id in visible for row in build_documents(record)]
+            connection = db.session.connection()
+            backend = search_backend(connection)
+            backend.delete(connection, [document_id(kind, record_id) for record_id in ids])
+            if rows:
+                backend.upsert(connection, rows)
+            db.session.commit()
+            documents += len(rows)
+            last_id = ids[-1]
+    return SearchIndexBackfillResult(documents=documents)
+
+
+__all__ = [
+    "DOCUMENT_KINDS",
+    "PostgresSearchBackend",
+    "SEARCH_BACKENDS",
+    "SEARCH_PAGE_SIZE",
+    "SearchHit",
+    "SearchIndexBackfillResult",
+    "SearchPage",
+    "SqliteFtsSearchBackend",
+    "backfill_search_index",
+    "document_id",
+    "search_backend",
+    "search_posts",
+    "search_terms",
+    "search_users",
+]
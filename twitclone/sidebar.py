@@ -0,0 +1,97 @@
+"""Process-wide cache of the global sidebar shown on every page.
+
+Trending hashtags and the newest accounts are the same for every viewer, so
+each worker process keeps one copy as plain values rather than ORM objects and
+reuses it until ``SIDEBAR_CACHE_TTL_SECONDS`` pass or a write invalidates it.
+When the copy expires, one thread recomputes it while concurrent requests keep
+serving the previous copy; only a cold cache makes callers wait.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+
+from flask import current_app
+
+from twitclone.utils.hashtags import get_newest_users, get_trending_hashtags
+
+
+@dataclass(frozen=True, slots=True)
+class SidebarUser:
+    id: int
+    username: str
+    email: str
+
+
+@dataclass(frozen=True, slots=True)
+class SidebarData:
+    trending_hashtags: tuple[str, ...]
+    newest_users: tuple[SidebarUser, ...]
+
+
+def load_sidebar_data() -> SidebarData:
+    return SidebarData(
+        trending_hashtags=tuple(get_trending_hashtags()),
+        newest_users=tuple(SidebarUser(user.id, user.username, user.email) for user in get_newest_users()),
+    )
+
+
+class SidebarCache:
+    """Hold one value for ``ttl_seconds``, letting a single thread refresh it."""
+
+    def __init__(self, *, ttl_seconds: int, clock=time.monotonic) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._value = None
+        self._expires_at = float("-inf")
+        self._refresh_lock = threading.Lock()
+
+    def get(self, load):
+        value = self._value
+        if value is not None and self._clock() < self._expires_at:
+            return value
+        # With a stale copy available, threads that lose the race serve it instead of waiting.
+        if not self._refresh_lock.acquire(blocking=value is None):
+            return value
+        try:
+            if self._value is not None and self._clock() < self._expires_at:
+                return self._value
+            self._value = load()
+            self._expires_at = self._clock() + self.ttl_seconds
+            return self._value
+        finally:
+            self._refresh_lock.release()
+
+    def invalidate(self) -> None:
+        """Expire the current copy; the next request recomputes it."""
+        self._expires_at = float("-inf")
+
+
+def init_sidebar_cache(app) -> None:
+    ttl_seconds = app.config["SIDEBAR_CACHE_TTL_SECONDS"]
+    app.extensions["sidebar_cache"] = SidebarCache(ttl_seconds=ttl_seconds) if ttl_seconds else None
+
+
+def get_sidebar_data() -> SidebarData:
+    cache = current_app.extensions.get("sidebar_cache")
+    return cache.get(load_sidebar_data) if cache is not None else load_sidebar_data()
+
+
+def invalidate_sidebar() -> None:
+    """Drop this process's sidebar copy; call after writes that change trending or newest users."""
+    cache = current_app.extensions.get("sidebar_cache")
+    if cache is not None:
+        cache.invalidate()
+
+
+__all__ = [
+    "SidebarCache",
+    "SidebarData",
+    "SidebarUser",
+    "get_sidebar_data",
+    "init_sidebar_cache",
+    "invalidate_sidebar",
+    "load_sidebar_data",
+]
@@ -0,0 +1,204 @@
+"""Per-viewer timeline page cache.
+
+Cached values are the ordered ``(type, source_id, timestamp)`` rows and counts
+that select a page, never rendered posts or ORM objects, so every backend can
+share them and visibility is still checked when the rows are loaded. Keys
+include a generation counter that post writes bump after committing; a bump
+makes every earlier page unreachable, and TTL plus LRU eviction reclaims them.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+from flask import current_app
+
+from twitclone.timeline.service import TimelineRow
+
+
+class InMemoryTimelineCacheBackend:
+    """Process-local LRU store; each gunicorn worker keeps its own pages."""
+
+    def __init__(self, *, max_entries: int, clock=time.monotonic) -> None:
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value, ttl_seconds: int) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generation(self) -> int:
+        return self._generation
+
+    def bump_generation(self) -> int:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            return self._generation
+
+
+class FileSystemTimelineCacheBackend:
+    """Directory-backed store shared by every worker process on one host.
+
+    Values are JSON files replaced atomically; reads refresh a file's mtime so
+    eviction removes the least recently used pages. Each instance tracks an
+    approximate entry count and only scans the directory once it passes
+    ``max_entries``, trimming to ``low_water_entries`` so scans stay rare. The
+    generation counter is incremented under an exclusive ``flock``.
+    """
+
+    def __init__(self, directory: str | Path, *, max_entries: int, clock=time.time) -> None:
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.low_water_entries = max_entries - max_entries // 10
+        self._clock = clock
+        self._approximate_entries: int | None = None
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json"
+
+    def _write(self, path: Path, payload: str) -> None:
+        temporary = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+        temporary.write_text(payload, encoding="utf-8")
+        os.replace(temporary, path)
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if entry["expires_at"] <= self._clock():
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry["value"]
+
+    def set(self, key: str, value, ttl_seconds: int) -> None:
+        self._write(self._path(key), json.dumps({"expires_at": self._clock() + ttl_seconds, "value": value}, separators=(",", ":")))
+        if self._approximate_entries is not None and self._approximate_entries < self.max_entries:
+            self._approximate_entries += 1
+            return
+        self._evict()
+
+    def _evict(self) -> None:
+        """Recount the directory and trim the least recently used files down to ``low_water_entries``."""
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")]
+        if len(entries) > self.low_water_entries:
+            for entry in sorted(entries, key=lambda item: item.stat().st_mtime)[: len(entries) - self.low_water_entries]:
+                Path(entry.path).unlink(missing_ok=True)
+            entries = entries[: self.low_water_entries]
+        self._approximate_entries = len(entries)
+
+    def generation(self) -> int:
+        try:
+            return int((self.directory / "generation").read_text(encoding="ascii"))
+        except (OSError, ValueError):
+            return 0
+
+    def bump_generation(self) -> int:
+        with open(self.directory / "generation.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            generation = self.generation() + 1
+            self._write(self.directory / "generation", str(generation))
+        return generation
+
+
+class TimelinePageCache:
+    """Cache timeline rows per viewer and page position, and counts per position."""
+
+    def __init__(self, backend, *, ttl_seconds: int) -> None:
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+
+    def _key(self, scope, position) -> str:
+        return ":".join(str(part) for part in ("timeline", self.backend.generation(), scope, *position))
+
+    def rows(self, viewer, position, load):
+        """Return cached rows for ``position`` or store the result of ``load()``."""
+        key = self._key(viewer.id if getattr(viewer, "is_authenticated", False) else "anonymous", position)
+        cached = self.backend.get(key)
+        if cached is not None:
+            return [TimelineRow(post_type, source_id, datetime.fromisoformat(timestamp)) for post_type, source_id, timestamp in cached]
+        rows = load()
+        self.backend.set(key, [[row.type, row.source_id, row.timestamp.isoformat()] for row in rows], self.ttl_seconds)
+        return rows
+
+    def count(self, position, load):
+        """Return a count for ``position`` shared by every viewer, or store the result of ``load()``."""
+        key = self._key("shared", position)
+        cached = self.backend.get(key)
+        if cached is not None:
+            return cached
+        total = load()
+        self.backend.set(key, total, self.ttl_seconds)
+        return total
+
+    def bump_generation(self) -> int:
+        return self.backend.bump_generation()
+
+
+def build_timeline_page_cache(config):
+    backend_name = config["TIMELINE_CACHE_BACKEND"]
+    if backend_name == "none":
+        return None
+    if backend_name == "filesystem":
+        backend = FileSystemTimelineCacheBackend(config["TIMELINE_CACHE_DIR"], max_entries=config["TIMELINE_CACHE_MAX_ENTRIES"])
+    else:
+        backend = InMemoryTimelineCacheBackend(max_entries=config["TIMELINE_CACHE_MAX_ENTRIES"])
+    return TimelinePageCache(backend, ttl_seconds=config["TIMELINE_CACHE_TTL_SECONDS"])
+
+
+def init_timeline_cache(app) -> None:
+    app.extensions["timeline_page_cache"] = build_timeline_page_cache(app.config)
+
+
+def get_timeline_page_cache():
+    return current_app.extensions.get("timeline_page_cache")
+
+
+def bump_timeline_generation() -> None:
+    """Make every cached page unreachable; call after committing a timeline write."""
+    cache = get_timeline_page_cache()
+    if cache is not None:
+        cache.bump_generation()
+
+
+__all__ = [
+    "FileSystemTimelineCacheBackend",
+    "InMemoryTimelineCacheBackend",
+    "TimelinePageCache",
+    "build_timeline_page_cache",
+    "bump_timeline_generation",
+    "get_timeline_page_cache",
+    "init_timeline_cache",
+]
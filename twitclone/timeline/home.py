@@ -0,0 +1,353 @@
+"""Materialized per-user home timelines.
+
+Posts are pushed into ``HomeTimelineEntry`` rows for the author, the author's
+followers, and followers of any hashtag the post carries, so reading a home page
+is one range scan over ``(user_id, timestamp, priority, source_id)``. In the
+default ``hybrid`` fan-out mode, authors with more followers than
+``HOME_TIMELINE_FANOUT_MAX_FOLLOWERS`` are recorded as ``FanoutExemptAuthor``
+and their recent posts are merged in when a follower reads, from a small
+per-author cache of recent timeline rows. Each post re-checks the author, so
+one who falls back under the threshold is pushed to again.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import delete, select, true
+
+from twitclone.extensions import db
+from twitclone.models import FanoutExemptAuthor, Follows, HashtagFollow, HomeTimelineEntry, Quote, Tweet, TweetHashtag
+from twitclone.realtime.broker import announce_timeline_entry
+from twitclone.timeline.service import (
+    TIMELINE_PAGE_SIZE,
+    TIMELINE_TYPE_PRIORITY,
+    TimelineCursor,
+    TimelineRow,
+    _tweet_timeline_timestamp,
+    _visible_tweet_filter,
+    cursor_page_from_rows,
+    timeline_row_sort_key,
+    timeline_union_query,
+)
+from twitclone.utils.hashtags import extract_hashtags
+
+log = logging.getLogger("twitclone.timeline")
+
+
+class RecentAuthorPosts:
+    """Bounded, time-limited cache of each exempt author's newest timeline rows.
+
+    Entries expire after ``ttl_seconds`` so every worker process converges on new
+    posts without cross-process invalidation; at most ``max_authors`` authors are
+    kept, evicting the least recently read. A zero TTL disables caching.
+    """
+
+    def __init__(self, *, per_author, ttl_seconds, max_authors=1000, clock=time.monotonic):
+        self.per_author = per_author
+        self.ttl_seconds = ttl_seconds
+        self.max_authors = max_authors
+        self._clock = clock
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, author_id):
+        with self._lock:
+            cached = self._rows.get(author_id)
+            if cached is None:
+                return None
+            expires_at, rows = cached
+            if expires_at <= self._clock():
+                del self._rows[author_id]
+                return None
+            self._rows.move_to_end(author_id)
+            return rows
+
+    def put(self, author_id, rows):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._rows[author_id] = (self._clock() + self.ttl_seconds, tuple(rows))
+            self._rows.move_to_end(author_id)
+            while len(self._rows) > self.max_authors:
+                self._rows.popitem(last=False)
+
+    def discard(self, author_id):
+        with self._lock:
+            self._rows.pop(author_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+
+def get_recent_author_posts(app=None):
+    """Return the application's recent-posts cache, creating it from config on first use."""
+    app = app or current_app
+    cache = app.extensions.get("home_timeline_recent_posts")
+    if cache is None:
+        cache = app.extensions["home_timeline_recent_posts"] = RecentAuthorPosts(per_author=app.config["HOME_TIMELINE_RECENT_POSTS_PER_AUTHOR"], ttl_seconds=app.config["HOME_TIMELINE_RECENT_POSTS_TTL_SECONDS"])
+    return cache
+
+
+def _post_fields(post_type, record):
+    """Return ``(author_id, timestamp, text)`` for one newly visible post."""
+    if post_type == "tweet":
+        return record.user_id, _tweet_timeline_timestamp(record), record.content
+    if post_type == "retweet":
+        return record.user_id, record.timestamp, None
+    if post_type == "quote":
+        return record.user_id, record.timestamp, record.content
+    if post_type == "poll":
+        return record.user_id, record.created_at, record.question
+    raise ValueError(f"Unknown timeline post type: {post_type}")
+
+
+def _entry(user_id, post_type, source_id, author_id, timestamp):
+    return {"user_id": user_id, "post_type": post_type, "source_id": source_id, "author_id": author_id, "timestamp": timestamp, "priority": TIMELINE_TYPE_PRIORITY[post_type]}
+
+
+def _hybrid_fanout():
+    return current_app.config["HOME_TIMELINE_FANOUT_MODE"] == "hybrid"
+
+
+def _restore_author_posts(author_id, follower_ids, *, now, skip):
+    """Copy an author's recent posts, except ``skip``, to followers who read them merged while exempt."""
+    if not follower_ids:
+        return 0
+    limit = current_app.config["HOME_TIMELINE_BACKFILL_LIMIT"]
+    rows = [row for row in db.session.execute(timeline_union_query(now=now, limit=limit, author_ids=[author_id])) if (row.type, row.source_id) != skip]
+    if not rows:
+        return 0
+    existing = set(
+        db.session.execute(
+            select(HomeTimelineEntry.user_id, HomeTimelineEntry.post_type, HomeTimelineEntry.source_id).where(
+                HomeTimelineEntry.user_id.in_(follower_ids), HomeTimelineEntry.source_id.in_({row.source_id for row in rows})
+            )
+        ).tuples()
+    )
+    entries = [_entry(user_id, row.type, row.source_id, author_id, row.timestamp) for user_id in follower_ids for row in rows if (user_id, row.type, row.source_id) not in existing]
+    if entries:
+        db.session.execute(db.insert(HomeTimelineEntry), entries)
+    return len(entries)
+
+
+def _fanout_followers(author_id, *, now, skip):
+    """Return ``(follower_ids, follower_count)``; ids are ``None`` when the author is read-merged.
+
+    An exempt author is re-checked on every post: the stored count is refreshed,
+    and an author back within the threshold is pushed to again, with the recent
+    posts followers used to merge at read time copied into their timelines.
+    """
+    follower_query = select(Follows.follower_id).where(Follows.followed_id == author_id)
+    if not _hybrid_fanout():
+        followers = db.session.scalars(follower_query).all()
+        return followers, len(followers)
+    exemption = db.session.get(FanoutExemptAuthor, author_id)
+    limit = current_app.config["HOME_TIMELINE_FANOUT_MAX_FOLLOWERS"]
+    followers = db.session.scalars(follower_query.limit(limit + 1)).all()
+    if len(followers) <= limit:
+        if exemption is not None:
+            db.session.delete(exemption)
+            _restore_author_posts(author_id, followers, now=now, skip=skip)
+            log.info("home_timeline_author_unexempted", extra={"event": "home_timeline_author_unexempted", "author_id": author_id, "follower_count": len(followers), "fanout_threshold": limit})
+        return followers, len(followers)
+    follower_count = db.session.scalar(select(db.func.count()).select_from(Follows).where(Follows.followed_id == author_id))
+    if exemption is not None:
+        exemption.follower_count = follower_count
+        return None, follower_count
+    db.session.add(FanoutExemptAuthor(user_id=author_id, follower_count=follower_count))
+    log.info("home_timeline_author_exempted", extra={"event": "home_timeline_author_exempted", "author_id": author_id, "follower_count": follower_count, "fanout_threshold": limit})
+    return None, follower_count
+
+
+def fan_out_post(post_type, record):
+    """Push one visible post into every interested home timeline; return the entry count.
+
+    ``record`` must be flushed so its id and timestamp exist. The caller owns the
+    commit, so the entries land atomically with the post itself.
+    """
+    started_at = time.perf_counter()
+    author_id, timestamp, text = _post_fields(post_type, record)
+    recipients = {author_id}
+    followers, follower_count = _fanout_followers(author_id, now=timestamp, skip=(post_type, record.id))
+    if followers is not None:
+        recipients.update(followers)
+    else:
+        get_recent_author_posts().discard(author_id)
+    hashtags = extract_hashtags(text)
+    if hashtags:
+        recipients.update(db.session.scalars(select(HashtagFollow.user_id).where(HashtagFollow.hashtag.in_(hashtags))))
+    db.session.execute(db.insert(HomeTimelineEntry), [_entry(user_id, post_type, record.id, author_id, timestamp) for user_id in recipients])
+    announce_timeline_entry(post_type=post_type, source_id=record.id, cursor=TimelineCursor(timestamp, TIMELINE_TYPE_PRIORITY[post_type], record.id).encode())
+    log.info("home_timeline_fanout", extra={"event": "home_timeline_fanout", "author_id": author_id, "follower_count": follower_count, "recipient_count": len(recipients), "fanout_strategy": "push" if followers is not None else "pull", "duration_ms": round((time.perf_counter() - started_at) * 1000, 2)})
+    return len(recipients)
+
+
+def _insert_missing_entries(user_id, entries):
+    """Insert ``(post_type, source_id, author_id, timestamp)`` entries the user lacks yet."""
+    if not entries:
+        return 0
+    existing = set(db.session.execute(select(HomeTimelineEntry.post_type, HomeTimelineEntry.source_id).where(HomeTimelineEntry.user_id == user_id, HomeTimelineEntry.source_id.in_({entry[1] for entry in entries}))).tuples())
+    missing = {(post_type, source_id): _entry(user_id, post_type, source_id, author_id, timestamp) for post_type, source_id, author_id, timestamp in entries if (post_type, source_id) not in existing}
+    if missing:
+        db.session.execute(db.insert(HomeTimelineEntry), list(missing.values()))
+    return len(missing)
+
+
+def backfill_followed_author(user_id, author_id, *, now):
+    """Copy the followed author's recent posts into the follower's home timeline."""
+    if _hybrid_fanout() and db.session.get(FanoutExemptAuthor, author_id) is not None:
+        return 0
+    limit = current_app.config["HOME_TIMELINE_BACKFILL_LIMIT"]
+    rows = db.session.execute(timeline_union_query(now=now, limit=limit, author_ids=[author_id])).all()
+    return _insert_missing_entries(user_id, [(row.type, row.source_id, author_id, row.timestamp) for row in rows])
+
+
+def _tagged_entry(tags):
+    """Match home entries for tweets or quotes carrying any tag selected by ``tags``."""
+    tagged_tweets = select(TweetHashtag.tweet_id).where(TweetHashtag.tag.in_(tags), TweetHashtag.tweet_id.is_not(None))
+    tagged_quotes = select(TweetHashtag.quote_id).where(TweetHashtag.tag.in_(tags), TweetHashtag.quote_id.is_not(None))
+    return ((HomeTimelineEntry.post_type == "tweet") & HomeTimelineEntry.source_id.in_(tagged_tweets)) | (
+        (HomeTimelineEntry.post_type == "quote") & HomeTimelineEntry.source_id.in_(tagged_quotes)
+    )
+
+
+def _followed_tags(user_id):
+    return select(HashtagFollow.hashtag).where(HashtagFollow.user_id == user_id)
+
+
+def remove_followed_author(user_id, author_id):
+    """Drop an unfollowed author's posts from the former follower's home timeline.
+
+    Posts carrying a hashtag the reader still follows stay.
+    """
+    db.session.execute(
+        delete(HomeTimelineEntry)
+        .where(HomeTimelineEntry.user_id == user_id, HomeTimelineEntry.author_id == author_id, ~_tagged_entry(_followed_tags(user_id)))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def remove_followed_hashtag(user_id, hashtag):
+    """Drop posts carrying an unfollowed ``hashtag`` from the former follower's home timeline.
+
+    Call after deleting the ``HashtagFollow``. The reader's own posts, posts by
+    authors they follow, and posts carrying another followed tag stay.
+    """
+    followed_authors = select(Follows.followed_id).where(Follows.follower_id == user_id)
+    db.session.execute(
+        delete(HomeTimelineEntry)
+        .where(
+            HomeTimelineEntry.user_id == user_id,
+            _tagged_entry([hashtag]),
+            HomeTimelineEntry.author_id != user_id,
+            HomeTimelineEntry.author_id.not_in(followed_authors),
+            ~_tagged_entry(_followed_tags(user_id)),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def backfill_followed_hashtag(user_id, hashtag, *, now):
+    """Copy recent tweets and quotes carrying ``hashtag`` into the follower's home timeline."""
+    limit = current_app.config["HOME_TIMELINE_BACKFILL_LIMIT"]
+    tagged = TweetHashtag.tag == hashtag
+    tweets = db.session.execute(select(Tweet.id, Tweet.user_id, TweetHashtag.timestamp).join(TweetHashtag, TweetHashtag.tweet_id == Tweet.id).where(tagged, _visible_tweet_filter(now)).order_by(TweetHashtag.timestamp.desc()).limit(limit)).all()
+    quotes = db.session.execute(select(Quote.id, Quote.user_id, TweetHashtag.timestamp).join(TweetHashtag, TweetHashtag.quote_id == Quote.id).join(Tweet, Quote.tweet_id == Tweet.id).where(tagged, Quote.is_removed.is_(False), _visible_tweet_filter(now)).order_by(TweetHashtag.timestamp.desc()).limit(limit)).all()
+    return _insert_missing_entries(user_id, [("tweet", *row) for row in tweets] + [("quote", *row) for row in quotes])
+
+
+def _entry_older_than(cursor):
+    if cursor is None:
+        return true()
+    return (HomeTimelineEntry.timestamp < cursor.timestamp) | (
+        (HomeTimelineEntry.timestamp == cursor.timestamp)
+        & ((HomeTimelineEntry.priority > cursor.priority) | ((HomeTimelineEntry.priority == cursor.priority) & (HomeTimelineEntry.source_id < cursor.source_id)))
+    )
+
+
+def followed_exempt_author_ids(user_id):
+    """Return the followed authors whose posts are merged at read time."""
+    if not _hybrid_fanout():
+        return []
+    return db.session.scalars(select(FanoutExemptAuthor.user_id).join(Follows, Follows.followed_id == FanoutExemptAuthor.user_id).where(Follows.follower_id == user_id)).all()
+
+
+def _author_rows(author_id, *, now, before, limit):
+    return [TimelineRow(row.type, row.source_id, row.timestamp) for row in db.session.execute(timeline_union_query(now=now, before=before, limit=limit, author_ids=[author_id]))]
+
+
+def _merge_exempt_authors(author_ids, *, now, before, limit):
+    """Return up to ``limit`` rows per exempt author after ``before``, mostly from the cache.
+
+    A cached window only answers a page it fully covers; cursors reaching past
+    a full window query the author's posts directly.
+    """
+    started_at = time.perf_counter()
+    cache = get_recent_author_posts()
+    boundary = None if before is None else (before.timestamp, -before.priority, before.source_id)
+    merged, hits, misses = [], 0, 0
+    for author_id in author_ids:
+        cached = cache.get(author_id)
+        if cached is None:
+            misses += 1
+            cached = _author_rows(author_id, now=now, before=None, limit=cache.per_author)
+            cache.put(author_id, cached)
+        else:
+            hits += 1
+        rows = [row for row in cached if boundary is None or timeline_row_sort_key(row) < boundary]
+        if len(rows) < limit and len(cached) >= cache.per_author:
+            rows = _author_rows(author_id, now=now, before=before, limit=limit)
+        merged.extend(rows[:limit])
+    log.info("home_timeline_merge", extra={"event": "home_timeline_merge", "merged_author_count": len(author_ids), "merged_count": len(merged), "cache_hits": hits, "cache_misses": misses, "duration_ms": round((time.perf_counter() - started_at) * 1000, 2)})
+    return merged
+
+
+def fetch_home_timeline_rows(user_id, *, now, before=None, limit):
+    """Return at most ``limit`` ordered ``(type, source_id, timestamp)`` rows for one home timeline.
+
+    Materialized entries come from one index range scan; recent posts by
+    followed exempt authors come from the per-author cache and are merged in.
+    """
+    statement = (
+        select(HomeTimelineEntry.post_type.label("type"), HomeTimelineEntry.source_id, HomeTimelineEntry.timestamp)
+        .where(HomeTimelineEntry.user_id == user_id, _entry_older_than(before))
+        .order_by(HomeTimelineEntry.timestamp.desc(), HomeTimelineEntry.priority.asc(), HomeTimelineEntry.source_id.desc())
+        .limit(limit)
+    )
+    rows = db.session.execute(statement).all()
+    exempt_author_ids = followed_exempt_author_ids(user_id)
+    if not exempt_author_ids:
+        return rows
+    merged = {(row.type, row.source_id): row for row in _merge_exempt_authors(exempt_author_ids, now=now, before=before, limit=limit)}
+    merged.update({(row.type, row.source_id): row for row in rows})
+    return sorted(merged.values(), key=timeline_row_sort_key, reverse=True)[:limit]
+
+
+def build_home_timeline_page(user, *, now, before=None, per_page=TIMELINE_PAGE_SIZE, cache=None):
+    """Return one keyset page of ``user``'s home timeline.
+
+    Raises ``ValueError`` for a malformed cursor, like the global timeline.
+    """
+    if per_page < 1: raise ValueError("per_page must be at least 1")
+    cursor = TimelineCursor.decode(before) if before else None
+    load = lambda: fetch_home_timeline_rows(user.id, now=now, before=cursor, limit=per_page + 1)
+    rows = cache.rows(user, ("home", "before", before, per_page), load) if cache else load()
+    return cursor_page_from_rows(rows, now=now, viewer=user, before=before, per_page=per_page)
+
+
+__all__ = [
+    "RecentAuthorPosts",
+    "backfill_followed_author",
+    "backfill_followed_hashtag",
+    "build_home_timeline_page",
+    "fan_out_post",
+    "fetch_home_timeline_rows",
+    "followed_exempt_author_ids",
+    "get_recent_author_posts",
+    "remove_followed_author",
+    "remove_followed_hashtag",
+]
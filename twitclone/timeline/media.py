@@ -1,22 +1,37 @@
-"""Secure image-upload validation and filename generation."""
+"""Secure image-upload validation, filename generation, and media responses."""
 
+import base64
+from datetime import UTC, datetime, timedelta
+from functools import partial
 from io import BytesIO
+import logging
 from pathlib import Path
-from tempfile import TemporaryDirectory
+import shutil
+from tempfile import mkdtemp
 from uuid import uuid4
 
+from flask import Response, current_app, redirect, request, send_file
 from PIL import Image, UnidentifiedImageError
 
-from twitclone.utils.images import resize_image
-from twitclone.media_storage import FileSystemMediaStorage
+from twitclone.extensions import db
+from twitclone.image_pipeline import ImagePipelineBusy, ImagePipelineTimeout
+from twitclone.timeline.renditions import RENDITION_TYPES, record_renditions
+from twitclone.utils.images import render_renditions, render_upload, resize_image
+from twitclone.media_storage import FileSystemMediaStorage, MediaNotModified, MediaRangeNotSatisfiable
 
 IMAGE_UPLOAD_MAX_BYTES = 5 * 1024 * 1024
+# A transparent 1x1 GIF shown while an asynchronous thumbnail is rendered.
+THUMBNAIL_PLACEHOLDER = base64.b64decode("R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7")
 ALLOWED_IMAGE_TYPES = {
     ".gif": ("image/gif", "GIF"),
     ".jpg": ("image/jpeg", "JPEG"),
     ".jpeg": ("image/jpeg", "JPEG"),
     ".png": ("image/png", "PNG"),
 }
+PIPELINE_BUSY_MESSAGE = "Image processing is busy. Please try again in a moment."
+PIPELINE_TIMEOUT_MESSAGE = "Image processing took too long. Please try a smaller image."
+
+log = logging.getLogger("twitclone.media")
 
 
 def prepare_image_upload(upload):
@@ -49,8 +64,28 @@ def _storage_adapter(storage):
     return storage if hasattr(storage, "put") else FileSystemMediaStorage(storage)
 
 
-def store_image_upload(upload, storage):
-    """Validate and store distinct original and thumbnail files."""
+def _render_upload(pipeline, original_path, thumbnail_path, *renditions):
+    if pipeline is not None:
+        return pipeline.run(render_upload, original_path, thumbnail_path, *renditions)
+    resize_image(original_path, thumbnail_path)
+    return render_renditions(original_path, thumbnail_path.parent, *renditions)
+
+
+def _put_renditions(storage, folder, files):
+    for file in files:
+        storage.put(file.name, (folder / file.name).read_bytes(), content_type=RENDITION_TYPES.get(file.format))
+
+
+def store_image_upload(upload, storage, *, pipeline=None, async_thumbnail=False, rendition_widths=(), rendition_formats=()):
+    """Validate and store distinct original and thumbnail files, plus any renditions.
+
+    The thumbnail and the ``rendition_widths`` x ``rendition_formats``
+    renditions are rendered by ``pipeline``, or inline without one, and the
+    renditions are added to the session for the caller to commit. A full or
+    slow pipeline is reported like a validation error. With
+    ``async_thumbnail`` the upload returns once the original is stored and
+    the rest is stored when the pipeline finishes it.
+    """
     error, generated_name = prepare_image_upload(upload)
     if error:
         return error, None, None
@@ -58,21 +93,91 @@ def store_image_upload(upload, storage):
     storage = _storage_adapter(storage)
     original_name = f"original_{generated_name}"
     thumbnail_name = f"thumb_{generated_name}"
-    with TemporaryDirectory() as temporary_folder:
-        original_path = Path(temporary_folder) / original_name
-        thumbnail_path = Path(temporary_folder) / thumbnail_name
+    renditions = (Path(generated_name).stem, tuple(rendition_widths), tuple(rendition_formats))
+    if async_thumbnail and pipeline is not None:
+        error = _store_with_async_thumbnail(upload, storage, pipeline, original_name, thumbnail_name, renditions)
+        return (error, None, None) if error else (None, original_name, thumbnail_name)
+    temporary_folder = Path(mkdtemp())
+    worker_owns_folder = False
+    original_path = temporary_folder / original_name
+    thumbnail_path = temporary_folder / thumbnail_name
+    try:
         upload.save(original_path)
-        resize_image(original_path, thumbnail_path)
+        try:
+            files = _render_upload(pipeline, original_path, thumbnail_path, *renditions)
+        except ImagePipelineBusy:
+            return PIPELINE_BUSY_MESSAGE, None, None
+        except ImagePipelineTimeout as exc:
+            # The worker may still be writing into the folder, so it goes once the job ends.
+            if exc.future is not None:
+                worker_owns_folder = True
+                exc.future.add_done_callback(lambda _future: shutil.rmtree(temporary_folder, ignore_errors=True))
+            return PIPELINE_TIMEOUT_MESSAGE, None, None
         try:
             storage.put(original_name, original_path.read_bytes())
             storage.put(thumbnail_name, thumbnail_path.read_bytes())
+            _put_renditions(storage, temporary_folder, files)
         except Exception:
-            storage.delete(original_name)
-            storage.delete(thumbnail_name)
+            for name in (original_name, thumbnail_name, *(file.name for file in files)):
+                storage.delete(name)
             raise
+    finally:
+        if not worker_owns_folder:
+            shutil.rmtree(temporary_folder, ignore_errors=True)
+    if files:
+        record_renditions(original_name, files)
     return None, original_name, thumbnail_name
 
 
+def _store_with_async_thumbnail(upload, storage, pipeline, original_name, thumbnail_name, renditions):
+    temporary_folder = Path(mkdtemp())
+    original_path = temporary_folder / original_name
+    thumbnail_path = temporary_folder / thumbnail_name
+    try:
+        upload.save(original_path)
+        storage.put(original_name, original_path.read_bytes())
+        future = pipeline.submit(render_upload, original_path, thumbnail_path, *renditions)
+    except ImagePipelineBusy:
+        storage.delete(original_name)
+        shutil.rmtree(temporary_folder, ignore_errors=True)
+        return PIPELINE_BUSY_MESSAGE
+    except Exception:
+        storage.delete(original_name)
+        shutil.rmtree(temporary_folder, ignore_errors=True)
+        raise
+    app = current_app._get_current_object()
+    future.add_done_callback(partial(_store_rendered, app, storage, original_name, thumbnail_name, thumbnail_path))
+    return None
+
+
+def _store_rendered(app, storage, original_name, thumbnail_name, thumbnail_path, future):
+    # Runs on the pipeline's result thread once the worker finishes.
+    try:
+        files = future.result()
+        storage.put(thumbnail_name, thumbnail_path.read_bytes())
+        _put_renditions(storage, thumbnail_path.parent, files)
+        if files:
+            with app.app_context():
+                record_renditions(original_name, files)
+                db.session.commit()
+    except Exception:
+        log.exception("thumbnail_failed", extra={"event": "thumbnail_failed"})
+        # Serve the original in its place, or the placeholder would stand in forever.
+        try:
+            storage.put(thumbnail_name, (thumbnail_path.parent / original_name).read_bytes())
+        except Exception:
+            log.exception("thumbnail_fallback_failed", extra={"event": "thumbnail_fallback_failed"})
+    finally:
+        shutil.rmtree(thumbnail_path.parent, ignore_errors=True)
+
+
+def thumbnail_placeholder():
+    """Stand in for a thumbnail that is still being rendered, without letting anyone cache it."""
+    response = Response(THUMBNAIL_PLACEHOLDER, mimetype="image/gif")
+    response.cache_control.no_store = True
+    return response
+
+
 def store_profile_banner(upload, storage):
     error, generated_name = prepare_image_upload(upload)
     if error:
@@ -84,4 +189,51 @@ def store_profile_banner(upload, storage):
     return None, banner_name
 
 
-__all__ = ["IMAGE_UPLOAD_MAX_BYTES", "prepare_image_upload", "store_image_upload", "store_profile_banner"]
+def _single_range():
+    # Multipart ranges are answered with the whole object, as RFC 9110 allows.
+    requested = request.range
+    return requested.to_header() if requested is not None and len(requested.ranges) == 1 else None
+
+
+def send_media(storage, name, *, max_age):
+    """Stream ``name`` to the client without holding the object in memory.
+
+    Storage in redirect mode answers with a presigned URL, which browsers may
+    reuse for as long as the storage allows. Files on disk go through
+    ``send_file``, which answers ``Range`` and ``If-None-Match`` itself and
+    lets the server send the file directly. Streamed bodies are relayed chunk
+    by chunk with the bucket's answer to those headers. Raises
+    ``MediaNotFound`` like the storage adapters.
+    """
+    signed = storage.delivery_url(name)
+    if signed is not None:
+        response = redirect(signed.url)
+        response.cache_control.private = True
+        response.cache_control.max_age = signed.max_age
+        return response
+    try:
+        media = storage.open(name, byte_range=_single_range(), if_none_match=request.headers.get("If-None-Match"))
+    except MediaNotModified as exc:
+        response = Response(status=304)
+        if exc.etag:
+            response.headers["ETag"] = exc.etag
+        return response
+    except MediaRangeNotSatisfiable:
+        return Response(status=416)
+    if media.path is not None:
+        return send_file(media.path, mimetype=media.content_type, download_name=name, max_age=max_age, conditional=True)
+    response = Response(media.iter_chunks(), status=206 if media.partial else 200, mimetype=media.content_type)
+    response.call_on_close(media.close)
+    response.content_length = media.size
+    response.accept_ranges = "bytes"
+    if media.partial:
+        response.headers["Content-Range"] = media.content_range
+    if media.etag:
+        response.headers["ETag"] = media.etag
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.expires = datetime.now(UTC) + timedelta(seconds=max_age)
+    return response
+
+
+__all__ = ["IMAGE_UPLOAD_MAX_BYTES", "prepare_image_upload", "send_media", "store_image_upload", "store_profile_banner"]
@@ -0,0 +1,71 @@
+"""Responsive renditions of uploaded post images.
+
+Each upload is rendered at ``IMAGE_RENDITION_WIDTHS`` in every
+``IMAGE_RENDITION_FORMATS`` format by the same pipeline job as its thumbnail,
+and every file is recorded in ``media_rendition`` against the original's
+storage name. Templates offer them through ``<picture>`` sources with
+``srcset``, so browsers fetch the smallest modern file that fills the column
+and fall back to the thumbnail.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from itertools import groupby
+
+from sqlalchemy import select
+
+from twitclone.extensions import db
+from twitclone.models import MediaRendition
+
+# Most compact first; browsers take the first source type they support.
+RENDITION_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+
+
+@dataclass(frozen=True)
+class RenditionSource:
+    """One ``<source>`` element: a MIME type and its renditions, narrowest first."""
+
+    type: str
+    renditions: tuple
+
+
+def source_for_thumbnail(thumbnail_name):
+    """Storage name of the original upload behind a ``thumb_`` name."""
+    return f"original_{thumbnail_name.removeprefix('thumb_')}"
+
+
+def record_renditions(source, files) -> None:
+    """Add a ``media_rendition`` row per rendered file; the caller commits."""
+    db.session.add_all(
+        MediaRendition(source=source, name=file.name, width=file.width, height=file.height, format=file.format, size_bytes=file.size)
+        for file in files
+    )
+
+
+def _sources(renditions):
+    ordered = sorted(renditions, key=lambda rendition: (list(RENDITION_TYPES).index(rendition.format), rendition.width))
+    return tuple(RenditionSource(RENDITION_TYPES[image_format], tuple(group)) for image_format, group in groupby(ordered, key=lambda rendition: rendition.format))
+
+
+def rendition_sources(sources) -> dict:
+    """Map each original storage name in ``sources`` to its ``RenditionSource`` tuple with one query."""
+    sources = set(sources)
+    if not sources:
+        return {}
+    renditions = db.session.scalars(
+        select(MediaRendition).where(MediaRendition.source.in_(sources), MediaRendition.format.in_(RENDITION_TYPES))
+    ).all()
+    grouped = {}
+    for rendition in renditions:
+        grouped.setdefault(rendition.source, []).append(rendition)
+    return {source: _sources(group) for source, group in grouped.items()}
+
+
+__all__ = [
+    "RENDITION_TYPES",
+    "RenditionSource",
+    "record_renditions",
+    "rendition_sources",
+    "source_for_thumbnail",
+]
@@ -2,29 +2,88 @@
 
 from datetime import UTC, datetime, timedelta
 
-from flask import abort, flash, redirect, render_template, request, send_file, url_for
-from io import BytesIO
+from flask import abort, current_app, flash, jsonify, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
 from twitclone.analytics_tracking import record_post_impression, record_post_impressions
 from twitclone.extensions import db
+from twitclone.image_pipeline import get_image_pipeline
 from twitclone.mentions import add_mention_notifications
 from twitclone.media_storage import MediaNotFound, get_media_storage
 from twitclone.models import DirectMessage, Notification, Quote, Retweet, Tweet, User
+from twitclone.notifications.service import notify_activity
+from twitclone.realtime.broker import announce_unread_counts
 from twitclone.timeline import timeline_blueprint
-from twitclone.timeline.media import store_image_upload
-from twitclone.timeline.service import build_timeline_posts, paginate_timeline_posts
+from twitclone.timeline.cache import bump_timeline_generation, get_timeline_page_cache
+from twitclone.timeline.home import build_home_timeline_page, fan_out_post
+from twitclone.timeline.media import send_media, store_image_upload, thumbnail_placeholder
+from twitclone.timeline.renditions import rendition_sources
+from twitclone.timeline.service import TimelineCursor, build_timeline_cursor_page, build_timeline_page, count_new_timeline_posts, fetch_timeline_rows, hydrate_timeline_rows
 from twitclone.timeline.validation import validate_post_content
-from twitclone.utils import get_newest_users, get_trending_hashtags
+
+NEW_POSTS_LIMIT = 50
 
 
 def index():
     now = datetime.now(UTC).replace(tzinfo=None)
     current_time = now.strftime("%Y-%m-%d %H:%M:%S")
-    posts = build_timeline_posts(now=now, viewer=current_user)
-    page = request.args.get("page", default=1, type=int) or 1
-    timeline_page = paginate_timeline_posts(posts, page=page)
-    record_post_impressions(timeline_page.items)
-    return render_template("index.html", posts=timeline_page.items, timeline_page=timeline_page, current_time=current_time, trending_hashtags=get_trending_hashtags(), newest_users=get_newest_users())
+    timeline_page = cursor_page = None
+    before = request.args.get("before")
+    if before:
+        try:
+            cursor_page = build_timeline_cursor_page(now=now, viewer=current_user, before=before, cache=get_timeline_page_cache())
+        except ValueError:
+            cursor_page = None
+    if cursor_page is None:
+        page = request.args.get("page", default=1, type=int) or 1
+        timeline_page = build_timeline_page(now=now, viewer=current_user, page=page, cache=get_timeline_page_cache())
+    posts = (cursor_page or timeline_page).items
+    newest_cursor = TimelineCursor.for_post(posts[0]).encode() if posts and timeline_page is not None and timeline_page.page == 1 else None
+    rendered = render_template("index.html", posts=posts, timeline_page=timeline_page, cursor_page=cursor_page, newest_cursor=newest_cursor, current_time=current_time)
+    # Recording commits, which would expire the eager-loaded page before rendering.
+    record_post_impressions(posts)
+    return rendered
+
+
+@login_required
+def home():
+    """Render the signed-in user's materialized timeline of followed accounts and hashtags."""
+    now = datetime.now(UTC).replace(tzinfo=None)
+    cache = get_timeline_page_cache()
+    try:
+        cursor_page = build_home_timeline_page(current_user, now=now, before=request.args.get("before"), cache=cache)
+    except ValueError:
+        cursor_page = build_home_timeline_page(current_user, now=now, cache=cache)
+    rendered = render_template("index.html", posts=cursor_page.items, timeline_page=None, cursor_page=cursor_page, current_time=now.strftime("%Y-%m-%d %H:%M:%S"))
+    record_post_impressions(cursor_page.items)
+    return rendered
+
+
+def _new_post_json(post):
+    return {
+        "type": post.type,
+        "source_id": post.source_id,
+        "content": post.content,
+        "timestamp": post.timestamp.isoformat(),
+        "username": post.user.username,
+        "original_username": post.original_user.username if post.original_user else None,
+        "url": url_for("post_detail", tweet_id=post.action_tweet_id) if post.action_tweet_id else None,
+    }
+
+
+def timeline_updates():
+    """Return timeline entries, or only their count, newer than the client's ``since`` cursor."""
+    try:
+        since = TimelineCursor.decode(request.args.get("since", ""))
+    except ValueError:
+        return jsonify(status="error", message="A valid since cursor is required."), 400
+    now = datetime.now(UTC).replace(tzinfo=None)
+    if request.args.get("format") == "count":
+        total = count_new_timeline_posts(now=now, since=since, cap=NEW_POSTS_LIMIT)
+        return jsonify(status="success", count=min(total, NEW_POSTS_LIMIT), has_more=total > NEW_POSTS_LIMIT)
+    rows = fetch_timeline_rows(now=now, after=since, limit=NEW_POSTS_LIMIT + 1)
+    posts = hydrate_timeline_rows(rows[:NEW_POSTS_LIMIT], now=now, viewer=current_user)
+    newest_cursor = TimelineCursor.for_row(rows[0]).encode() if rows else request.args["since"]
+    return jsonify(status="success", count=len(posts), has_more=len(rows) > NEW_POSTS_LIMIT, newest_cursor=newest_cursor, posts=[_new_post_json(post) for post in posts])
 
 
 def post_detail(tweet_id):
@@ -33,7 +92,8 @@ def post_detail(tweet_id):
     if tweet.is_removed or (tweet.scheduled_at is not None and tweet.scheduled_at > now):
         abort(404)
     record_post_impression(tweet)
-    return render_template("post_detail.html", tweet=tweet)
+    image_sources = rendition_sources([tweet.original_image]).get(tweet.original_image, ()) if tweet.original_image else ()
+    return render_template("post_detail.html", tweet=tweet, image_sources=image_sources)
 
 
 def _scheduled_at_from_form():
@@ -66,7 +126,14 @@ def tweet():
         flash(validation_error, "danger"); return redirect(url_for("index"))
     image = request.files.get("image"); image_filename = None; original_image_filename = None
     if image and image.filename:
-        image_error, original_image_filename, image_filename = store_image_upload(image, get_media_storage())
+        image_error, original_image_filename, image_filename = store_image_upload(
+            image,
+            get_media_storage(),
+            pipeline=get_image_pipeline(),
+            async_thumbnail=current_app.config["IMAGE_THUMBNAIL_ASYNC"],
+            rendition_widths=current_app.config["IMAGE_RENDITION_WIDTHS"],
+            rendition_formats=current_app.config["IMAGE_RENDITION_FORMATS"],
+        )
         if image_error:
             flash(image_error, "danger"); return redirect(url_for("index"))
     scheduled_at, schedule_error = _scheduled_at_from_form()
@@ -77,24 +144,28 @@ def tweet():
         if len(dm_parts) == 3:
             username, message = dm_parts[1], dm_parts[2]; user = User.query.filter_by(username=username).first()
             if user:
-                db.session.add_all([DirectMessage(content=message, sender_id=current_user.id, receiver_id=user.id), Notification(user_id=user.id, message=f"{current_user.username} sent you a message")]); db.session.commit(); flash("Your direct message has been sent!", "success")
+                db.session.add_all([DirectMessage(content=message, sender_id=current_user.id, receiver_id=user.id), Notification(user_id=user.id, message=f"{current_user.username} sent you a message")]); announce_unread_counts(user.id); db.session.commit(); flash("Your direct message has been sent!", "success")
             else: flash("User not found.", "danger")
     else:
         new_tweet = Tweet(content=content, user_id=current_user.id, image=image_filename, original_image=original_image_filename, scheduled_at=scheduled_at)
         db.session.add(new_tweet); db.session.flush()
-        if scheduled_at is None: add_mention_notifications(content=content, author=current_user, tweet_id=new_tweet.id)
-        db.session.commit(); flash("Your tweet has been scheduled!" if scheduled_at else "Your tweet has been posted!", "success")
+        if scheduled_at is None: add_mention_notifications(content=content, author=current_user, tweet_id=new_tweet.id); fan_out_post("tweet", new_tweet)
+        db.session.commit(); bump_timeline_generation(); flash("Your tweet has been scheduled!" if scheduled_at else "Your tweet has been posted!", "success")
     return redirect(url_for("index"))
 
 
 def uploaded_file(filename):
-    if not filename.startswith(("thumb_", "banner_")):
+    if not filename.startswith(("thumb_", "banner_", "rend_")):
         abort(404)
     try:
-        media = get_media_storage().get(filename)
-    except (MediaNotFound, ValueError):
+        return send_media(get_media_storage(), filename, max_age=31536000)
+    except MediaNotFound:
+        # Thumbnail names are unguessable, so a missing one is almost always still rendering.
+        if filename.startswith("thumb_") and current_app.config["IMAGE_THUMBNAIL_ASYNC"]:
+            return thumbnail_placeholder()
+        abort(404)
+    except ValueError:
         abort(404)
-    return send_file(BytesIO(media.content), mimetype=media.content_type, download_name=filename, max_age=31536000)
 
 
 @login_required
@@ -103,10 +174,11 @@ def retweet(tweet_id):
     if original_tweet.is_removed: abort(404)
     existing = Retweet.query.filter_by(user_id=current_user.id, tweet_id=original_tweet.id).first()
     if existing is None:
-        db.session.add(Retweet(user_id=current_user.id, tweet_id=original_tweet.id))
+        new_retweet = Retweet(user_id=current_user.id, tweet_id=original_tweet.id)
+        db.session.add(new_retweet); db.session.flush(); fan_out_post("retweet", new_retweet)
         if original_tweet.user_id != current_user.id:
-            db.session.add(Notification(user_id=original_tweet.user_id, message=f"{current_user.username} reposted your post", tweet_id=original_tweet.id))
-        db.session.commit()
+            notify_activity(original_tweet.user_id, "repost", current_user, tweet_id=original_tweet.id); announce_unread_counts(original_tweet.user_id)
+        db.session.commit(); bump_timeline_generation()
     flash("You have retweeted this tweet!", "success"); return redirect(url_for("index"))
 
 
@@ -118,16 +190,19 @@ def quote(tweet_id):
         content = request.form.get("content"); validation_error = validate_post_content(content, post_type="Quote")
         if validation_error:
             flash(validation_error, "danger"); return render_template("quote.html", tweet=original_tweet)
-        db.session.add(Quote(user_id=current_user.id, tweet_id=original_tweet.id, content=content))
+        new_quote = Quote(user_id=current_user.id, tweet_id=original_tweet.id, content=content)
+        db.session.add(new_quote); db.session.flush(); fan_out_post("quote", new_quote)
         if original_tweet.user_id != current_user.id:
-            db.session.add(Notification(user_id=original_tweet.user_id, message=f"{current_user.username} quoted your post", tweet_id=original_tweet.id))
-        db.session.commit(); flash("You have quoted this tweet!", "success"); return redirect(url_for("index"))
+            notify_activity(original_tweet.user_id, "quote", current_user, tweet_id=original_tweet.id); announce_unread_counts(original_tweet.user_id)
+        db.session.commit(); bump_timeline_generation(); flash("You have quoted this tweet!", "success"); return redirect(url_for("index"))
     return render_template("quote.html", tweet=original_tweet)
 
 
 @timeline_blueprint.record_once
 def register_timeline_routes(state):
     state.app.add_url_rule("/", endpoint="index", view_func=index)
+    state.app.add_url_rule("/home", endpoint="home", view_func=home)
+    state.app.add_url_rule("/timeline/updates", endpoint="timeline_updates", view_func=timeline_updates)
     state.app.add_url_rule("/post/<int:tweet_id>", endpoint="post_detail", view_func=post_detail)
     state.app.add_url_rule("/tweet", endpoint="tweet", view_func=tweet, methods=["POST"])
     state.app.add_url_rule("/uploads/<filename>", endpoint="uploaded_file", view_func=uploaded_file)
@@ -1,12 +1,30 @@
 """Normalized timeline data assembly."""
 
-from dataclasses import dataclass
+import base64
+import binascii
+from collections import namedtuple
+from dataclasses import dataclass, replace
+from datetime import datetime
 from math import ceil
 
-from twitclone.models import Poll, PollVote, Quote, Retweet, Tweet
+from sqlalchemy import Integer, String, func, literal_column, select, true, union_all
+from sqlalchemy.orm import joinedload, selectinload
+
+from twitclone.extensions import db
+from twitclone.models import Poll, Quote, Retweet, Tweet
+from twitclone.polls.service import viewer_poll_votes
+from twitclone.timeline.renditions import rendition_sources, source_for_thumbnail
 
 TIMELINE_TYPE_PRIORITY = {"tweet": 0, "retweet": 1, "quote": 2, "poll": 3}
 TIMELINE_PAGE_SIZE = 20
+TimelineRow = namedtuple("TimelineRow", ["type", "source_id", "timestamp"])
+# Relationships each entry type renders, loaded with the page instead of per row.
+TIMELINE_LOAD_OPTIONS = {
+    "tweet": (joinedload(Tweet.user),),
+    "retweet": (joinedload(Retweet.user), joinedload(Retweet.tweet).joinedload(Tweet.user)),
+    "quote": (joinedload(Quote.user), joinedload(Quote.tweet).joinedload(Tweet.user)),
+    "poll": (joinedload(Poll.user), selectinload(Poll.options)),
+}
 
 
 @dataclass(frozen=True)
@@ -27,6 +45,99 @@ class TimelinePage:
     def next_page(self): return self.page + 1 if self.has_next else None
 
 
+@dataclass(frozen=True, slots=True)
+class TimelineEntry:
+    """One rendered timeline item.
+
+    Only the fields that differ between entry types are stored; the remaining
+    template names are derived, so a page of entries costs a fixed handful of
+    slots each instead of a dict per post. Item access (``entry["type"]``,
+    ``entry.get("poll_id")``) is kept for callers written against the dicts.
+    """
+
+    type: str
+    source_id: int
+    timestamp: datetime
+    user: object
+    content: str
+    action_tweet_id: int | None
+    image: str | None = None
+    image_sources: tuple = ()
+    original_tweet: object = None
+    poll: object = None
+    has_voted: bool = False
+    poll_is_active: bool = False
+
+    @property
+    def id(self): return self.source_id
+    @property
+    def original_user(self): return self.original_tweet.user if self.original_tweet is not None else None
+    @property
+    def poll_id(self): return self.poll.id if self.poll is not None else None
+    @property
+    def report_type(self): return "tweet" if self.type in ("tweet", "retweet") else self.type
+    @property
+    def report_id(self): return self.action_tweet_id if self.report_type == "tweet" else self.source_id
+    @property
+    def report_author_id(self): return self.original_tweet.user_id if self.type == "retweet" else self.user.id
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+@dataclass(frozen=True)
+class TimelineCursor:
+    """Position of one timeline item in the ``(timestamp, priority, source_id)`` order."""
+
+    timestamp: datetime
+    priority: int
+    source_id: int
+
+    def encode(self):
+        raw = f"{self.timestamp.isoformat()}|{self.priority}|{self.source_id}".encode("ascii")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    @classmethod
+    def decode(cls, token):
+        """Parse an opaque cursor, raising ``ValueError`` for anything malformed."""
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("ascii")
+            timestamp, priority, source_id = raw.split("|")
+            cursor = cls(datetime.fromisoformat(timestamp), int(priority), int(source_id))
+        except (binascii.Error, UnicodeError, TypeError, ValueError) as exc:
+            raise ValueError("Invalid timeline cursor") from exc
+        if cursor.priority not in TIMELINE_TYPE_PRIORITY.values():
+            raise ValueError("Invalid timeline cursor")
+        return cursor
+
+    @classmethod
+    def for_post(cls, post):
+        return cls(post.timestamp, TIMELINE_TYPE_PRIORITY[post.type], post.source_id)
+
+    @classmethod
+    def for_row(cls, row):
+        return cls(row.timestamp, TIMELINE_TYPE_PRIORITY[row.type], row.source_id)
+
+
+@dataclass(frozen=True)
+class TimelineCursorPage:
+    """One keyset page: items strictly older than ``cursor`` and the next position."""
+
+    items: list
+    per_page: int
+    cursor: str | None
+    next_cursor: str | None
+
+    @property
+    def has_next(self): return self.next_cursor is not None
+
+
 def _visible_tweet_filter(now):
     return ((Tweet.scheduled_at == None) | (Tweet.scheduled_at <= now)) & (Tweet.is_removed.is_(False))
 
@@ -35,21 +146,201 @@ def _tweet_timeline_timestamp(tweet):
     return tweet.scheduled_at if tweet.scheduled_at is not None else tweet.timestamp
 
 
+def _tweet_timeline_timestamp_column():
+    return db.func.coalesce(Tweet.scheduled_at, Tweet.timestamp)
+
+
+def _older_than(cursor, post_type, timestamp_column, id_column):
+    """Keyset predicate selecting one source's rows that sort after ``cursor``."""
+    if cursor is None:
+        return true()
+    priority = TIMELINE_TYPE_PRIORITY[post_type]
+    if priority > cursor.priority:
+        return timestamp_column <= cursor.timestamp
+    if priority < cursor.priority:
+        return timestamp_column < cursor.timestamp
+    return (timestamp_column < cursor.timestamp) | ((timestamp_column == cursor.timestamp) & (id_column < cursor.source_id))
+
+
+def _newer_than(cursor, post_type, timestamp_column, id_column):
+    """Keyset predicate selecting one source's rows that sort before ``cursor``."""
+    if cursor is None:
+        return true()
+    priority = TIMELINE_TYPE_PRIORITY[post_type]
+    if priority < cursor.priority:
+        return timestamp_column >= cursor.timestamp
+    if priority > cursor.priority:
+        return timestamp_column > cursor.timestamp
+    return (timestamp_column > cursor.timestamp) | ((timestamp_column == cursor.timestamp) & (id_column > cursor.source_id))
+
+
+def _tweet_post(tweet):
+    return TimelineEntry("tweet", tweet.id, _tweet_timeline_timestamp(tweet), tweet.user, tweet.content, tweet.id, image=tweet.image)
+
+
+def _retweet_post(retweet):
+    return TimelineEntry("retweet", retweet.id, retweet.timestamp, retweet.user, retweet.tweet.content, retweet.tweet_id, image=retweet.tweet.image, original_tweet=retweet.tweet)
+
+
+def _quote_post(quote):
+    return TimelineEntry("quote", quote.id, quote.timestamp, quote.user, quote.content, quote.tweet_id, original_tweet=quote.tweet)
+
+
+def _poll_post(poll, *, now, has_voted):
+    return TimelineEntry("poll", poll.id, poll.created_at, poll.user, poll.question, None, poll=poll, has_voted=has_voted, poll_is_active=poll.is_active_at(now))
+
+
+def _timeline_sources(now, author_ids=None):
+    """Project every timeline source onto ``(type, source_id, timestamp)`` plus its visibility rule."""
+    tweet_timestamp = _tweet_timeline_timestamp_column()
+    sources = (
+        ("tweet", Tweet.id, tweet_timestamp, Tweet.user_id, select(Tweet.id).where(_visible_tweet_filter(now))),
+        ("retweet", Retweet.id, Retweet.timestamp, Retweet.user_id, select(Retweet.id).join(Tweet, Retweet.tweet_id == Tweet.id).where(_visible_tweet_filter(now))),
+        ("quote", Quote.id, Quote.timestamp, Quote.user_id, select(Quote.id).join(Tweet, Quote.tweet_id == Tweet.id).where(_visible_tweet_filter(now), Quote.is_removed.is_(False))),
+        ("poll", Poll.id, Poll.created_at, Poll.user_id, select(Poll.id).where(Poll.is_removed.is_(False))),
+    )
+    if author_ids is None:
+        return tuple((post_type, id_column, timestamp_column, base) for post_type, id_column, timestamp_column, _author, base in sources)
+    return tuple((post_type, id_column, timestamp_column, base.where(author.in_(author_ids))) for post_type, id_column, timestamp_column, author, base in sources)
+
+
+def timeline_union_query(*, now, before=None, after=None, limit=None, author_ids=None):
+    """Build one ``UNION ALL`` statement returning ordered ``(type, source_id, timestamp)`` rows.
+
+    Every branch shares one column shape, applies its visibility rule and keyset
+    predicate, and is individually ordered and limited so each source is a
+    bounded index range scan. The database merges the branches with the
+    ADR-0018 tuple, so one round trip yields the page on SQLite and PostgreSQL.
+    ``after`` keeps only rows newer than that cursor, and ``author_ids``
+    optionally restricts every source to those authors.
+    """
+    branches = []
+    for post_type, id_column, timestamp_column, base in _timeline_sources(now, author_ids):
+        branch = base.with_only_columns(
+            literal_column(f"'{post_type}'", String).label("type"),
+            id_column.label("source_id"),
+            timestamp_column.label("timestamp"),
+            literal_column(str(TIMELINE_TYPE_PRIORITY[post_type]), Integer).label("priority"),
+        ).where(_older_than(before, post_type, timestamp_column, id_column), _newer_than(after, post_type, timestamp_column, id_column))
+        if limit is not None:
+            branch = select(branch.order_by(timestamp_column.desc(), id_column.desc()).limit(limit).subquery())
+        branches.append(branch)
+    timeline = union_all(*branches).subquery("timeline")
+    statement = select(timeline.c.type, timeline.c.source_id, timeline.c.timestamp).order_by(timeline.c.timestamp.desc(), timeline.c.priority.asc(), timeline.c.source_id.desc())
+    return statement.limit(limit) if limit is not None else statement
+
+
+def timeline_row_sort_key(row):
+    """ADR-0018 ordering for ``(type, source_id, timestamp)`` rows merged in Python."""
+    return (row.timestamp, -TIMELINE_TYPE_PRIORITY[row.type], row.source_id)
+
+
+def _hydration_filters(now):
+    return {
+        "tweet": (_visible_tweet_filter(now),),
+        "retweet": (Retweet.tweet.has(_visible_tweet_filter(now)),),
+        "quote": (Quote.is_removed.is_(False), Quote.tweet.has(_visible_tweet_filter(now))),
+        "poll": (Poll.is_removed.is_(False),),
+    }
+
+
+def hydrate_timeline_rows(rows, *, now, viewer):
+    """Load ordered timeline rows with one eager-loaded query per entry type present.
+
+    Visibility is re-checked while loading, so rows that became hidden after
+    they were selected or materialized are dropped rather than rendered.
+    """
+    votes = viewer_poll_votes(viewer, (row.source_id for row in rows if row.type == "poll"))
+    builders = {"tweet": _tweet_post, "retweet": _retweet_post, "quote": _quote_post, "poll": lambda poll: _poll_post(poll, now=now, has_voted=poll.id in votes)}
+    filters = _hydration_filters(now)
+    loaded = {}
+    for post_type, model in (("tweet", Tweet), ("retweet", Retweet), ("quote", Quote), ("poll", Poll)):
+        ids = [row.source_id for row in rows if row.type == post_type]
+        records = model.query.options(*TIMELINE_LOAD_OPTIONS[post_type]).filter(model.id.in_(ids), *filters[post_type]).all() if ids else []
+        loaded[post_type] = {record.id: builders[post_type](record) for record in records}
+    entries = [loaded[row.type][row.source_id] for row in rows if row.source_id in loaded[row.type]]
+    sources = rendition_sources(source_for_thumbnail(entry.image) for entry in entries if entry.image)
+    if not sources:
+        return entries
+    return [replace(entry, image_sources=sources.get(source_for_thumbnail(entry.image), ())) if entry.image else entry for entry in entries]
+
+
 def build_timeline_posts(*, now, viewer=None):
-    posts = []
-    for tweet in Tweet.query.filter(_visible_tweet_filter(now)).all():
-        posts.append({"id": tweet.id, "source_id": tweet.id, "action_tweet_id": tweet.id, "content": tweet.content, "timestamp": _tweet_timeline_timestamp(tweet), "type": "tweet", "user": tweet.user, "image": tweet.image, "original_tweet": None, "original_user": None, "poll": None, "poll_id": None, "has_voted": False, "report_type": "tweet", "report_id": tweet.id, "report_author_id": tweet.user_id})
-    for retweet in Retweet.query.join(Retweet.tweet).filter(_visible_tweet_filter(now)).all():
-        posts.append({"id": retweet.id, "source_id": retweet.id, "action_tweet_id": retweet.tweet_id, "content": retweet.tweet.content, "timestamp": retweet.timestamp, "type": "retweet", "user": retweet.user, "image": retweet.tweet.image, "original_tweet": retweet.tweet, "original_user": retweet.tweet.user, "poll": None, "poll_id": None, "has_voted": False, "report_type": "tweet", "report_id": retweet.tweet_id, "report_author_id": retweet.tweet.user_id})
-    for quote in Quote.query.join(Quote.tweet).filter(_visible_tweet_filter(now), Quote.is_removed.is_(False)).all():
-        posts.append({"id": quote.id, "source_id": quote.id, "action_tweet_id": quote.tweet_id, "content": quote.content, "timestamp": quote.timestamp, "type": "quote", "user": quote.user, "image": None, "original_tweet": quote.tweet, "original_user": quote.tweet.user, "poll": None, "poll_id": None, "has_voted": False, "report_type": "quote", "report_id": quote.id, "report_author_id": quote.user_id})
-    for poll in Poll.query.filter_by(is_removed=False).all():
-        has_voted = False
-        if viewer is not None and viewer.is_authenticated:
-            has_voted = PollVote.query.filter_by(poll_id=poll.id, user_id=viewer.id).first() is not None
-        posts.append({"id": poll.id, "source_id": poll.id, "action_tweet_id": None, "content": poll.question, "timestamp": poll.created_at, "type": "poll", "user": poll.user, "image": None, "original_tweet": None, "original_user": None, "poll": poll, "poll_id": poll.id, "has_voted": has_voted, "poll_is_active": poll.is_active_at(now), "report_type": "poll", "report_id": poll.id, "report_author_id": poll.user_id})
-    posts.sort(key=lambda post: (post["timestamp"], -TIMELINE_TYPE_PRIORITY[post["type"]], post["source_id"]), reverse=True)
-    return posts
+    rows = db.session.execute(timeline_union_query(now=now)).all()
+    return hydrate_timeline_rows(rows, now=now, viewer=viewer)
+
+
+def fetch_timeline_rows(*, now, before=None, after=None, limit):
+    """Return at most ``limit`` ordered ``(type, source_id, timestamp)`` rows between the cursors."""
+    return db.session.execute(timeline_union_query(now=now, before=before, after=after, limit=limit)).all()
+
+
+def fetch_timeline_posts(*, now, viewer=None, before=None, limit):
+    """Return at most ``limit`` visible posts ordered after the ``before`` cursor.
+
+    Ordering and limiting happen in one ``UNION ALL`` query; only the returned
+    rows are then loaded by primary key for rendering.
+    """
+    return hydrate_timeline_rows(fetch_timeline_rows(now=now, before=before, limit=limit), now=now, viewer=viewer)
+
+
+def count_timeline_posts(*, now):
+    """Count visible timeline items in the database without loading any rows."""
+    timeline = union_all(*(base for _type, _id, _timestamp, base in _timeline_sources(now))).subquery()
+    return db.session.execute(select(func.count()).select_from(timeline)).scalar_one()
+
+
+def count_new_timeline_posts(*, now, since, cap):
+    """Count visible items newer than the ``since`` cursor, stopping after ``cap + 1``.
+
+    Every branch is an index range scan above the cursor, so polling clients
+    pay for at most ``cap + 1`` rows however stale their cursor is.
+    """
+    timeline = timeline_union_query(now=now, after=since, limit=cap + 1).subquery()
+    return db.session.execute(select(func.count()).select_from(timeline)).scalar_one()
+
+
+def cursor_page_from_rows(rows, *, now, viewer, before, per_page):
+    """Hydrate up to ``per_page`` of ``per_page + 1`` ordered rows into a ``TimelineCursorPage``.
+
+    The next cursor is taken from the last selected row rather than the last
+    rendered item, so rows dropped during hydration cannot repeat or stall paging.
+    """
+    selected = rows[:per_page]
+    next_cursor = TimelineCursor.for_row(selected[-1]).encode() if len(rows) > per_page else None
+    items = hydrate_timeline_rows(selected, now=now, viewer=viewer)
+    return TimelineCursorPage(items=items, per_page=per_page, cursor=before or None, next_cursor=next_cursor)
+
+
+def build_timeline_cursor_page(*, now, viewer=None, before=None, per_page=TIMELINE_PAGE_SIZE, cache=None):
+    """Return one keyset page older than the opaque ``before`` cursor.
+
+    Only ``per_page + 1`` rows are requested; the extra row decides whether an
+    older page exists. With a ``TimelinePageCache`` the rows are reused per
+    viewer and cursor. Raises ``ValueError`` for a malformed cursor.
+    """
+    if per_page < 1: raise ValueError("per_page must be at least 1")
+    cursor = TimelineCursor.decode(before) if before else None
+    load = lambda: fetch_timeline_rows(now=now, before=cursor, limit=per_page + 1)
+    rows = cache.rows(viewer, ("index", "before", before, per_page), load) if cache else load()
+    return cursor_page_from_rows(rows, now=now, viewer=viewer, before=before, per_page=per_page)
+
+
+def build_timeline_page(*, now, viewer=None, page, per_page=TIMELINE_PAGE_SIZE, cache=None):
+    """Return a page-number ``TimelinePage`` without assembling the full history.
+
+    Totals come from database counts and only the rows up to the end of the
+    requested page are selected, preserving ADR-0019 bounds and navigation.
+    Only the requested page's rows are loaded for rendering.
+    """
+    if per_page < 1: raise ValueError("per_page must be at least 1")
+    count = lambda: count_timeline_posts(now=now)
+    total_items = cache.count(("index", "count"), count) if cache else count()
+    total_pages = max(1, ceil(total_items / per_page)); bounded_page = min(max(page, 1), total_pages)
+    start = (bounded_page - 1) * per_page
+    load = lambda: fetch_timeline_rows(now=now, limit=start + per_page)[start:]
+    rows = cache.rows(viewer, ("index", "page", bounded_page, per_page), load) if cache else load()
+    return TimelinePage(items=hydrate_timeline_rows(rows, now=now, viewer=viewer), page=bounded_page, per_page=per_page, total_items=total_items, total_pages=total_pages)
 
 
 def paginate_timeline_posts(posts, *, page, per_page=TIMELINE_PAGE_SIZE):
@@ -59,4 +350,25 @@ def paginate_timeline_posts(posts, *, page, per_page=TIMELINE_PAGE_SIZE):
     return TimelinePage(items=posts[start:end], page=bounded_page, per_page=per_page, total_items=total_items, total_pages=total_pages)
 
 
-__all__ = ["TIMELINE_PAGE_SIZE", "TIMELINE_TYPE_PRIORITY", "TimelinePage", "build_timeline_posts", "paginate_timeline_posts"]
+__all__ = [
+    "TIMELINE_LOAD_OPTIONS",
+    "TIMELINE_PAGE_SIZE",
+    "TIMELINE_TYPE_PRIORITY",
+    "TimelineCursor",
+    "TimelineCursorPage",
+    "TimelineEntry",
+    "TimelinePage",
+    "TimelineRow",
+    "build_timeline_cursor_page",
+    "build_timeline_page",
+    "build_timeline_posts",
+    "count_new_timeline_posts",
+    "count_timeline_posts",
+    "cursor_page_from_rows",
+    "fetch_timeline_posts",
+    "fetch_timeline_rows",
+    "hydrate_timeline_rows",
+    "paginate_timeline_posts",
+    "timeline_row_sort_key",
+    "timeline_union_query",
+]
@@ -0,0 +1,145 @@
+"""Time-decayed hashtag trending.
+
+Hashtag index writes adjust per-tag hourly buckets as posts are published or
+removed. The scheduled worker, or the in-app scheduler, periodically scores
+the buckets inside ``TRENDING_WINDOW_HOURS`` with exponential decay, stores the
+top ``TRENDING_SIZE`` tags, and prunes older buckets, so rendering the sidebar
+only reads that stored ranking. A ranking that is missing or a bucket old is
+refreshed by the reader, so new deployments show trends before the first
+scheduled run.
+"""
+
+from __future__ import annotations
+
+import heapq
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import UTC, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, insert, select, true
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from twitclone.extensions import db
+from twitclone.models import HashtagTrendBucket, TrendingHashtag, TweetHashtag
+
+log = logging.getLogger("twitclone.trending")
+BUCKET_INTERVAL = timedelta(hours=1)
+_stale_refresh_lock = threading.Lock()
+
+
+def bucket_start(timestamp: datetime) -> datetime:
+    """Start of the ``BUCKET_INTERVAL`` bucket holding ``timestamp``."""
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def record_hashtag_uses(connection, uses, delta: int) -> None:
+    """Add ``delta`` to the hourly bucket of every ``(tag, timestamp)`` use."""
+    counts = Counter((tag, bucket_start(timestamp)) for tag, timestamp in uses)
+    if not counts:
+        return
+    dialect_insert = postgresql.insert if connection.dialect.name == "postgresql" else sqlite.insert
+    statement = dialect_insert(HashtagTrendBucket).values([{"tag": tag, "bucket_start": start, "count": count * delta} for (tag, start), count in counts.items()])
+    connection.execute(statement.on_conflict_do_update(index_elements=["tag", "bucket_start"], set_={"count": HashtagTrendBucket.count + statement.excluded["count"]}))
+
+
+def decayed_scores(buckets, *, now: datetime, half_life_hours: float) -> dict[str, float]:
+    """Sum ``(tag, bucket_start, count)`` buckets, halving each bucket's weight every half-life."""
+    scores: Counter = Counter()
+    for tag, start, count in buckets:
+        if count > 0:
+            age_hours = max((now - start).total_seconds() / 3600, 0)
+            scores[tag] += count * 0.5 ** (age_hours / half_life_hours)
+    return dict(scores)
+
+
+def _window_start(now):
+    return bucket_start(now - timedelta(hours=current_app.config["TRENDING_WINDOW_HOURS"]))
+
+
+def score_trending_hashtags(*, now, session=None):
+    """Return ``(tag, score)`` pairs for the top ``TRENDING_SIZE`` tags in the window, best first."""
+    config = current_app.config
+    session = session or db.session
+    buckets = session.execute(select(HashtagTrendBucket.tag, HashtagTrendBucket.bucket_start, HashtagTrendBucket.count).where(HashtagTrendBucket.bucket_start >= _window_start(now))).all()
+    scores = decayed_scores(buckets, now=now, half_life_hours=config["TRENDING_HALF_LIFE_HOURS"])
+    return heapq.nsmallest(config["TRENDING_SIZE"], scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def refresh_trending_hashtags(*, now=None, session=None) -> list[str]:
+    """Recompute and store the top trending tags, dropping buckets outside the window."""
+    from twitclone.sidebar import invalidate_sidebar  # the sidebar reads trending through utils.hashtags
+
+    started_at = time.perf_counter()
+    now = now or datetime.now(UTC).replace(tzinfo=None)
+    session = session or db.session
+    session.execute(delete(HashtagTrendBucket).where(HashtagTrendBucket.bucket_start < _window_start(now)))
+    top = score_trending_hashtags(now=now, session=session)
+    session.execute(delete(TrendingHashtag))
+    if top:
+        session.execute(insert(TrendingHashtag), [{"rank": rank, "tag": tag, "score": score, "computed_at": now} for rank, (tag, score) in enumerate(top, start=1)])
+    session.commit()
+    invalidate_sidebar()
+    log.info(
+        "trending_hashtags_refreshed",
+        extra={"event": "trending_hashtags_refreshed", "hashtag_count": len(top), "duration_ms": round((time.perf_counter() - started_at) * 1000, 2)},
+    )
+    return [tag for tag, _score in top]
+
+
+def _stored_ranking(limit, now):
+    # One row even when the ranking is empty, carrying whether the window has uses to rank.
+    unranked = select(HashtagTrendBucket.tag).where(HashtagTrendBucket.bucket_start >= _window_start(now), HashtagTrendBucket.count > 0).exists()
+    anchor = select(unranked.label("has_uses")).subquery()
+    return db.session.execute(
+        select(TrendingHashtag.tag, TrendingHashtag.computed_at, anchor.c.has_uses)
+        .select_from(anchor)
+        .outerjoin(TrendingHashtag, true())
+        .order_by(TrendingHashtag.rank)
+        .limit(limit)
+    ).all()
+
+
+def stored_trending_hashtags(limit: int, *, now=None) -> list[str]:
+    """Return the stored ranking, refreshing it first when it is missing or a bucket old.
+
+    Covers processes without the worker and new deployments before its first
+    run. One thread per process refreshes, in its own session so the caller's
+    session is not committed; concurrent callers read the stored ranking.
+    """
+    now = now or datetime.now(UTC).replace(tzinfo=None)
+    rows = _stored_ranking(limit, now)
+    computed_at = rows[0].computed_at
+    stale = now - computed_at >= BUCKET_INTERVAL if computed_at is not None else rows[0].has_uses
+    if stale and _stale_refresh_lock.acquire(blocking=False):
+        try:
+            with Session(db.engine) as session:
+                refresh_trending_hashtags(now=now, session=session)
+        finally:
+            _stale_refresh_lock.release()
+        rows = _stored_ranking(limit, now)
+    return [row.tag for row in rows if row.tag is not None]
+
+
+def rebuild_trend_buckets(*, now=None) -> None:
+    """Recount the buckets inside the window from the hashtag index."""
+    now = now or datetime.now(UTC).replace(tzinfo=None)
+    connection = db.session.connection()
+    connection.execute(delete(HashtagTrendBucket))
+    record_hashtag_uses(connection, connection.execute(select(TweetHashtag.tag, TweetHashtag.timestamp).where(TweetHashtag.timestamp >= _window_start(now))).all(), 1)
+    db.session.commit()
+
+
+__all__ = [
+    "BUCKET_INTERVAL",
+    "bucket_start",
+    "decayed_scores",
+    "rebuild_trend_buckets",
+    "record_hashtag_uses",
+    "refresh_trending_hashtags",
+    "score_trending_hashtags",
+    "stored_trending_hashtags",
+]
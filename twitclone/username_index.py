@@ -0,0 +1,245 @@
+"""Process-wide sorted index of usernames for prefix autocomplete.
+
+Each worker process loads every ``(lowercase username, username, id)`` into
+parallel sorted arrays on the first lookup, then answers prefixes with two
+binary searches. Registration and profile renames update the arrays after
+their commits, but only in the process that served them: accounts created or
+renamed by other web processes, the scheduled worker, or CLI commands reach
+this process's index only when it restarts. ``USERNAME_INDEX_MAX_ENTRIES``
+bounds the memory used: ``0`` disables the index, and a site with more users
+than the bound leaves it unloaded. Both cases fall back to database prefix
+queries.
+
+With the index loaded, a keystroke touches the database at most once: the
+viewer's followed ids are cached for ``FOLLOWED_IDS_TTL_SECONDS`` and
+intersected with the prefix range in memory. Follows made in this process
+drop the viewer's entry at once; other processes see them within the TTL.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from twitclone.extensions import db
+from twitclone.models import Follows, User
+
+AUTOCOMPLETE_LIMIT = 8
+FOLLOWED_IDS_CACHE_SIZE = 1024
+FOLLOWED_IDS_TTL_SECONDS = 60
+# Sorts after every character that can follow the prefix in a username.
+_PREFIX_END = "\U0010ffff"
+
+log = logging.getLogger("twitclone.username_index")
+
+
+def normalize_prefix(value: str) -> str:
+    return value.strip().lstrip("@").lower()
+
+
+class UsernameIndex:
+    """Sorted lowercase usernames with their display names and ids."""
+
+    def __init__(self, *, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.loaded = False
+        self.overflowed = False
+        self._keys: list[str] = []
+        self._names: list[str] = []
+        self._ids = array("q")
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def ensure_loaded(self, load) -> bool:
+        """Load ``(id, username)`` rows once; return whether lookups can use the index."""
+        if self.loaded:
+            return True
+        with self._lock:
+            if not self.loaded and not self.overflowed:
+                rows = sorted(((username.lower(), username, user_id) for user_id, username in load(self.max_entries + 1)))
+                if len(rows) > self.max_entries:
+                    self._reset(overflowed=True)
+                else:
+                    # Most usernames are already lowercase; reuse that string as the key.
+                    self._keys = [name if key == name else key for key, name, _user_id in rows]
+                    self._names = [name for _key, name, _user_id in rows]
+                    self._ids = array("q", (user_id for _key, _name, user_id in rows))
+                    self.loaded = True
+        return self.loaded
+
+    def _position(self, key: str, user_id: int):
+        position = bisect_left(self._keys, key)
+        while position < len(self._keys) and self._keys[position] == key:
+            if self._ids[position] == user_id:
+                return position
+            position += 1
+        return None
+
+    def add(self, user_id: int, username: str) -> None:
+        with self._lock:
+            if not self.loaded:
+                return
+            key = username.lower()
+            if self._position(key, user_id) is not None:
+                return
+            if len(self._keys) >= self.max_entries:
+                self._reset(overflowed=True)
+                return
+            position = bisect_left(self._keys, key)
+            self._keys.insert(position, username if key == username else key)
+            self._names.insert(position, username)
+            self._ids.insert(position, user_id)
+
+    def remove(self, user_id: int, username: str) -> None:
+        with self._lock:
+            position = self._position(username.lower(), user_id) if self.loaded else None
+            if position is not None:
+                del self._keys[position], self._names[position], self._ids[position]
+
+    def _reset(self, *, overflowed: bool) -> None:
+        self._keys, self._names, self._ids = [], [], array("q")
+        self.loaded, self.overflowed = False, overflowed
+        if overflowed:
+            log.warning("username_index_overflow", extra={"event": "username_index_overflow"})
+
+    def lookup(self, prefix: str, limit: int) -> list[tuple[int, str]]:
+        """Return up to ``limit`` ``(id, username)`` pairs whose lowercase username starts with ``prefix``."""
+        with self._lock:
+            start = bisect_left(self._keys, prefix)
+            end = min(bisect_left(self._keys, prefix + _PREFIX_END, start), start + limit)
+            return [(self._ids[position], self._names[position]) for position in range(start, end)]
+
+    def lookup_among(self, prefix: str, user_ids, limit: int) -> list[tuple[int, str]]:
+        """Like ``lookup``, keeping only users in ``user_ids``; walks the prefix range until ``limit`` match."""
+        matches = []
+        if not user_ids:
+            return matches
+        with self._lock:
+            start = bisect_left(self._keys, prefix)
+            for position in range(start, bisect_left(self._keys, prefix + _PREFIX_END, start)):
+                if self._ids[position] in user_ids:
+                    matches.append((self._ids[position], self._names[position]))
+                    if len(matches) == limit:
+                        break
+        return matches
+
+
+class FollowedIdsCache:
+    """The followed ids of recently active viewers, each kept for ``ttl_seconds``."""
+
+    def __init__(self, *, max_entries: int, ttl_seconds: float, clock=time.monotonic) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[int, tuple[float, frozenset]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, viewer_id: int, load) -> frozenset:
+        with self._lock:
+            entry = self._entries.get(viewer_id)
+            if entry is not None and self._clock() < entry[0]:
+                self._entries.move_to_end(viewer_id)
+                return entry[1]
+        followed_ids = frozenset(load(viewer_id))
+        with self._lock:
+            self._entries[viewer_id] = (self._clock() + self.ttl_seconds, followed_ids)
+            self._entries.move_to_end(viewer_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return followed_ids
+
+    def forget(self, viewer_id: int) -> None:
+        with self._lock:
+            self._entries.pop(viewer_id, None)
+
+
+def init_username_index(app) -> None:
+    max_entries = app.config["USERNAME_INDEX_MAX_ENTRIES"]
+    app.extensions["username_index"] = UsernameIndex(max_entries=max_entries) if max_entries else None
+    app.extensions["followed_ids_cache"] = FollowedIdsCache(max_entries=FOLLOWED_IDS_CACHE_SIZE, ttl_seconds=FOLLOWED_IDS_TTL_SECONDS) if max_entries else None
+
+
+def _load_usernames(limit):
+    return db.session.execute(select(User.id, User.username).limit(limit)).all()
+
+
+def _prefix_filter(prefix):
+    return func.lower(User.username).startswith(prefix, autoescape=True)
+
+
+def _database_lookup(prefix, limit):
+    statement = select(User.id, User.username).where(_prefix_filter(prefix)).order_by(func.lower(User.username)).limit(limit)
+    return [tuple(row) for row in db.session.execute(statement)]
+
+
+def _database_followed_lookup(prefix, viewer_id, limit):
+    statement = (
+        select(User.id, User.username)
+        .join(Follows, Follows.followed_id == User.id)
+        .where(Follows.follower_id == viewer_id, _prefix_filter(prefix))
+        .order_by(func.lower(User.username))
+        .limit(limit)
+    )
+    return [tuple(row) for row in db.session.execute(statement)]
+
+
+def _load_followed_ids(viewer_id):
+    return db.session.scalars(select(Follows.followed_id).where(Follows.follower_id == viewer_id))
+
+
+def suggest_usernames(prefix: str, *, viewer_id: int, limit: int = AUTOCOMPLETE_LIMIT) -> list[dict]:
+    """Suggest usernames starting with ``prefix``, accounts ``viewer_id`` follows first."""
+    prefix = normalize_prefix(prefix)
+    if not prefix:
+        return []
+    index = current_app.extensions.get("username_index")
+    if index is not None and index.ensure_loaded(_load_usernames):
+        followed_ids = current_app.extensions["followed_ids_cache"].get(viewer_id, _load_followed_ids)
+        followed = index.lookup_among(prefix, followed_ids, limit)
+        others = index.lookup(prefix, limit)
+    else:
+        followed = _database_followed_lookup(prefix, viewer_id, limit)
+        followed_ids = {user_id for user_id, _username in followed}
+        others = _database_lookup(prefix, limit)
+    # ``limit`` candidates always leave enough after skipping the followed accounts.
+    suggestions = [{"username": username, "following": True} for _user_id, username in followed]
+    suggestions += [{"username": username, "following": False} for user_id, username in others if user_id not in followed_ids]
+    return suggestions[:limit]
+
+
+def forget_followed_ids(viewer_id: int) -> None:
+    """Drop ``viewer_id``'s cached followed ids after a committed follow or unfollow."""
+    cache = current_app.extensions.get("followed_ids_cache")
+    if cache is not None:
+        cache.forget(viewer_id)
+
+
+def record_username(user_id: int, username: str, *, previous: str | None = None) -> None:
+    """Reflect a committed registration or rename in this process's index."""
+    index = current_app.extensions.get("username_index")
+    if index is None or previous == username:
+        return
+    if previous is not None:
+        index.remove(user_id, previous)
+    index.add(user_id, username)
+
+
+__all__ = [
+    "AUTOCOMPLETE_LIMIT",
+    "FollowedIdsCache",
+    "UsernameIndex",
+    "forget_followed_ids",
+    "init_username_index",
+    "normalize_prefix",
+    "record_username",
+    "suggest_usernames",
+]
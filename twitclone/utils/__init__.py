@@ -5,7 +5,7 @@ from __future__ import annotations
 from types import ModuleType
 
 from twitclone.utils.gravatar import gravatar
-from twitclone.utils.hashtags import get_newest_users, get_trending_hashtags
+from twitclone.utils.hashtags import extract_hashtags, get_newest_users, get_trending_hashtags
 from twitclone.utils.images import resize_image
 from twitclone.utils.text import make_clickable_links
 
@@ -26,6 +26,7 @@ def bind_legacy_module(module: ModuleType) -> None:
 
 __all__ = [
     "bind_legacy_module",
+    "extract_hashtags",
     "get_newest_users",
     "get_trending_hashtags",
     "gravatar",
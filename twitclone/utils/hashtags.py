@@ -4,7 +4,15 @@ from __future__ import annotations
 
 import re
 
-from twitclone.models import Tweet, User
+from twitclone.models import User
+from twitclone.trending import stored_trending_hashtags
+
+HASHTAG_RE = re.compile(r"(?<!\w)#([A-Za-z0-9_]+)")
+
+
+def extract_hashtags(text: str | None) -> list[str]:
+    """Return the distinct lowercase hashtags in ``text`` in first-seen order."""
+    return list(dict.fromkeys(tag.lower() for tag in HASHTAG_RE.findall(text or "")))
 
 
 def get_newest_users(limit: int = 5):
@@ -13,11 +21,5 @@ def get_newest_users(limit: int = 5):
 
 
 def get_trending_hashtags(limit: int = 5) -> list[str]:
-    """Return hashtag names ordered by descending occurrence count."""
-    hashtags: dict[str, int] = {}
-    for tweet in Tweet.query.filter_by(is_removed=False).all():
-        for tag in re.findall(r"#(\w+)", tweet.content):
-            hashtags[tag] = hashtags.get(tag, 0) + 1
-
-    sorted_hashtags = sorted(hashtags.items(), key=lambda item: item[1], reverse=True)
-    return [tag for tag, _count in sorted_hashtags[:limit]]
+    """Return the time-decayed ranking stored by ``refresh_trending_hashtags``, refreshing it when missing or stale."""
+    return stored_trending_hashtags(limit)
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 from pathlib import Path
+from typing import NamedTuple
 
 from PIL import Image
 
@@ -16,3 +17,56 @@ def resize_image(
     with Image.open(image_path) as image:
         image.thumbnail(size)
         image.save(output_path)
+
+
+class RenditionFile(NamedTuple):
+    name: str
+    width: int
+    height: int
+    format: str
+    size: int
+
+
+_RENDITION_SAVE_OPTIONS = {"avif": {"quality": 60}, "webp": {"quality": 80, "method": 4}}
+
+
+def render_renditions(
+    image_path: str | Path,
+    output_dir: str | Path,
+    stem: str,
+    widths: tuple[int, ...],
+    formats: tuple[str, ...],
+) -> list[RenditionFile]:
+    """Write ``rend_<stem>_<width>w.<format>`` for each width and format, decoding the image once.
+
+    Widths above the image's own collapse to its width, so nothing is
+    upscaled. Animated images are left alone, since one frame would drop the
+    animation.
+    """
+    output_dir = Path(output_dir)
+    renditions = []
+    with Image.open(image_path) as image:
+        if getattr(image, "is_animated", False):
+            return renditions
+        source = image if image.mode in {"RGB", "RGBA"} else image.convert("RGBA" if image.has_transparency_data else "RGB")
+        for width in sorted({min(width, source.width) for width in widths}):
+            height = max(1, round(source.height * width / source.width))
+            resized = source if width == source.width else source.resize((width, height), Image.Resampling.LANCZOS)
+            for image_format in formats:
+                name = f"rend_{stem}_{width}w.{image_format}"
+                path = output_dir / name
+                resized.save(path, format=image_format.upper(), **_RENDITION_SAVE_OPTIONS.get(image_format, {}))
+                renditions.append(RenditionFile(name, width, height, image_format, path.stat().st_size))
+    return renditions
+
+
+def render_upload(
+    image_path: str | Path,
+    thumbnail_path: str | Path,
+    stem: str,
+    widths: tuple[int, ...],
+    formats: tuple[str, ...],
+) -> list[RenditionFile]:
+    """Pipeline job: the thumbnail beside ``thumbnail_path`` plus every rendition in its directory."""
+    resize_image(image_path, thumbnail_path)
+    return render_renditions(image_path, Path(thumbnail_path).parent, stem, widths, formats)